@@ -0,0 +1,217 @@
+import time
+import numpy as np
+from Route import Route
+
+
+# find profitable cycles of pools: a cycle whose spot rates multiply to more than 1 is a negative cycle of -log(rate),
+# found by Bellman-Ford rounds over all pools at once, then sized with the constant product output formula
+class ArbitrageDetector:
+
+    def __init__(self) -> None:
+        self.__stocks = np.zeros(0)  # reserve of every (pool, currency)
+        self.__indStock = {}  # reserve key -> position in stocks
+        self.__stockCopies = None  # (k, i) of GraphManager -> positions of the copies of stock i of its edges, None for ExchangeManager
+        self.__edges = []  # (i, j, k) of every directed pool
+        self.__currencies = {}  # currency -> index
+        self.__edgeI, self.__edgeJ = np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        self.__posIn, self.__posOut = np.zeros(0, dtype=int), np.zeros(0, dtype=int)  # stock positions sold into and bought from
+        self.__weights = np.zeros(0)  # -log(spot rate), inf if a reserve is empty
+        self.__potentials = None  # distances of last scan without cycles, None: next scan starts from scratch
+        self.__changed = np.zeros(0, dtype=int)  # edges repriced since last scan without cycles
+        self.__minGain = 0.0
+        self.__maxCycles = 10
+        self.__tolerance = 1e-12  # smaller improvements of -log(rate) are rounding noise
+        self.__timeScan = None
+
+    # report cycles whose spot rates multiply to more than 1 + minGain only
+    def SetMinGain(self, minGain: float) -> None:
+        self.__minGain = minGain
+
+    # cycles found by one scan are excluded and the scan repeated until no cycle is left or maxCycles are found
+    def SetMaxCycles(self, maxCycles: int) -> None:
+        self.__maxCycles = maxCycles
+
+    def __Reset(self) -> None:
+        self.__stocks, self.__indStock, self.__edges, self.__currencies = [], {}, [], {}
+        self.__stockCopies = None
+        self.__posIn, self.__posOut = [], []
+        self.__potentials = None
+
+    def __GetStockPosition(self, key: tuple, stock: float) -> int:
+        if key not in self.__indStock:
+            self.__indStock[key] = len(self.__stocks)
+            self.__stocks.append(stock)
+        return self.__indStock[key]
+
+    def __AddPool(self, i: str, j: str, k: str, keyIn: tuple, keyOut: tuple, stockIn: float, stockOut: float) -> None:
+        if i == j: return
+        self.__edges.append((i, j, k))
+        self.__posIn.append(self.__GetStockPosition(keyIn, stockIn))
+        self.__posOut.append(self.__GetStockPosition(keyOut, stockOut))
+        for currency in (i, j): self.__currencies.setdefault(currency, len(self.__currencies))
+
+    def __Finalize(self) -> None:
+        self.__stocks = np.array(self.__stocks, dtype=float)
+        self.__posIn, self.__posOut = np.array(self.__posIn, dtype=int), np.array(self.__posOut, dtype=int)
+        self.__edgeI = np.array([self.__currencies[i] for i, _, _ in self.__edges], dtype=int)
+        self.__edgeJ = np.array([self.__currencies[j] for _, j, _ in self.__edges], dtype=int)
+        self.__weights = np.zeros(len(self.__edges))
+        self.__UpdateWeights(np.arange(len(self.__edges)))
+
+    # like ExactModelSolver and HeuristicRouter, every edge (i, j, k) of GraphManager trades on its own copy of the stocks of exchange k
+    def LoadGraphManager(self, graphManager) -> None:
+        self.__Reset()
+        stockCopies = {}
+        for i, j, k in graphManager.GetEdges():
+            self.__AddPool(i, j, k, (k, i, j, i), (k, i, j, j), graphManager.GetStock(k, i), graphManager.GetStock(k, j))
+            for currency in (i, j): stockCopies.setdefault((k, currency), []).append(self.__indStock[k, i, j, currency])
+        self.__stockCopies = stockCopies
+        self.__Finalize()
+
+    # every (exchange, currency1, currency2) row of ExchangeManager is a separate pool
+    def LoadExchangeManager(self, exchangeManager) -> None:
+        self.__Reset()
+        for k, i, j, stockI, stockJ in zip(*(array.tolist() for array in exchangeManager.GetPoolArrays())):
+            self.__AddPool(i, j, k, (k, i, j), (k, j, i), stockI, stockJ)
+        self.__Finalize()
+
+    def __UpdateWeights(self, edges: np.array) -> None:
+        a, b = self.__stocks[self.__posIn[edges]], self.__stocks[self.__posOut[edges]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.__weights[edges] = np.where((a > 0) & (b > 0), np.log(a) - np.log(b), np.inf)
+
+    # overwrite reserves of loaded pools, patches: (exchange, currency1, currency2, stock1, stock2); the next scan only revisits repriced pools;
+    # a GraphManager patch sets the stocks of both currencies of the exchange, i.e. their copies on every edge of the exchange
+    def ApplyPatches(self, patches) -> None:
+        positions = []
+        for exchange, currency1, currency2, stock1, stock2 in patches:
+            if self.__stockCopies is None:
+                keys = ((exchange, currency1, currency2), (exchange, currency2, currency1))
+                copies = [[self.__indStock[key]] if key in self.__indStock else None for key in keys]
+            else:
+                copies = [self.__stockCopies.get((exchange, currency)) for currency in (currency1, currency2)]
+            if copies[0] is None or copies[1] is None:
+                raise Exception("Pool ({}, {}, {}) is not loaded, load the market again.".format(exchange, currency1, currency2))
+            for copy, stock in zip(copies, (stock1, stock2)):
+                self.__stocks[copy] = float(stock)
+                positions.extend(copy)
+
+        edges = np.flatnonzero(np.isin(self.__posIn, positions) | np.isin(self.__posOut, positions))
+        self.__UpdateWeights(edges)
+        self.__changed = np.union1d(self.__changed, edges)
+
+    # Bellman-Ford from a virtual source linked to every currency, each round relaxes the pools leaving currencies improved in the last round;
+    # after a scan without cycles, distances stay valid potentials and only repriced pools need to be relaxed again
+    def __Relax(self, weights: np.array, warmStart: bool) -> tuple:
+        N = len(self.__currencies)
+        edgeI, edgeJ = self.__edgeI, self.__edgeJ
+        pred = np.full(N, -1)
+        if not warmStart or self.__potentials is None:
+            dist, active = np.zeros(N), np.ones(N, dtype=bool)
+        else:
+            dist, active = self.__potentials.copy(), np.zeros(N, dtype=bool)
+            active[edgeI[self.__changed]] = True
+
+        for _ in range(N):
+            edges = np.flatnonzero(active[edgeI])
+            candidates = dist[edgeI[edges]] + weights[edges]
+            newDist = dist.copy()
+            np.minimum.at(newDist, edgeJ[edges], candidates)
+            active = newDist < dist - self.__tolerance
+            if not active.any(): return dist, pred, active
+
+            best = edges[(candidates <= newDist[edgeJ[edges]]) & active[edgeJ[edges]]]
+            pred[edgeJ[best]] = best
+            dist = np.where(active, newDist, dist)
+
+        return dist, pred, active  # still improving after N rounds: predecessors of active currencies lead into negative cycles
+
+    # follow predecessors of currencies still improving into cycles, each cycle once as edges in trading order
+    def __ExtractCycles(self, pred: np.array, active: np.array) -> list:
+        N, cycles = len(self.__currencies), {}
+        for v in np.flatnonzero(active).tolist():
+            for _ in range(N):
+                if pred[v] < 0: break
+                v = self.__edgeI[pred[v]]
+            if pred[v] < 0: continue
+
+            cycle, u = [], v
+            while len(cycle) <= N:
+                cycle.append(pred[u])
+                u = self.__edgeI[pred[u]]
+                if u == v: break
+            if u != v: continue
+            cycle.reverse()
+            start = cycle.index(min(cycle))
+            cycles.setdefault(tuple(cycle[start:] + cycle[:start]), None)
+        return list(cycles)
+
+    # trade x around cycle on current reserves, return output and amounts in and out of every hop
+    def __Simulate(self, cycle: tuple, x: float) -> tuple:
+        stocks, amounts = {}, []
+        for e in cycle:
+            posIn, posOut = self.__posIn[e], self.__posOut[e]
+            a, b = stocks.get(posIn, self.__stocks[posIn]), stocks.get(posOut, self.__stocks[posOut])
+            y = b * x / (a + x)
+            stocks[posIn], stocks[posOut] = a + x, b - y
+            amounts.append((x, y))
+            x = y
+        return x, amounts
+
+    # input maximizing output - input: pools with distinct reserves compose to A x / (B + x), optimal at sqrt(A B) - B;
+    # cycles reusing a reserve, i.e. both directions of one ExchangeManager pool, are sized by golden section search
+    def __GetOptimalInput(self, cycle: tuple, gain: float) -> float:
+        posIn, posOut = self.__posIn[list(cycle)], self.__posOut[list(cycle)]
+        if len(set(posIn.tolist()).union(posOut.tolist())) == 2 * len(cycle):
+            A, B = self.__stocks[posOut[0]], self.__stocks[posIn[0]]
+            for a, b in zip(self.__stocks[posIn[1:]], self.__stocks[posOut[1:]]):
+                A, B = A * b / (a + A), B * a / (a + A)
+            return max(np.sqrt(A * B) - B, 0.0)
+
+        Profit = lambda x: self.__Simulate(cycle, x)[0] - x
+        lo, hi = 0.0, self.__stocks[posIn[0]] * max(gain, 1.0)
+        ratio = (np.sqrt(5) - 1) / 2
+        for _ in range(100):
+            x1, x2 = hi - ratio * (hi - lo), lo + ratio * (hi - lo)
+            if Profit(x1) < Profit(x2): lo = x1
+            else: hi = x2
+        return (lo + hi) / 2
+
+    # profitable cycles on current reserves, most profitable rate first; route objective is the profit in its first currency
+    def Scan(self) -> list:
+        timeStart = time.time()
+        dist, pred, active = self.__Relax(self.__weights, True)
+        self.__potentials = None if active.any() else dist
+        self.__changed = np.zeros(0, dtype=int)
+
+        # each pass blocks the first pool of every cycle found, so the next pass turns up other cycles
+        cycles, weights = [], self.__weights.copy()
+        while active.any() and len(cycles) < self.__maxCycles:
+            found = [cycle for cycle in self.__ExtractCycles(pred, active) if cycle not in cycles]
+            if not found: break
+            cycles.extend(found)
+            weights[[cycle[0] for cycle in found]] = np.inf
+            dist, pred, active = self.__Relax(weights, False)
+
+        routes = []
+        for cycle in cycles:
+            gain = np.exp(-np.sum(self.__weights[list(cycle)]))
+            if not gain > 1 + self.__minGain: continue
+            x = self.__GetOptimalInput(cycle, gain)
+            output, amounts = self.__Simulate(cycle, x)
+            if not output > x: continue
+
+            start = self.__edges[cycle[0]][0]
+            route = Route(start, start, x)
+            route.SetObjective(output - x)
+            for e, (amountIn, amountOut) in zip(cycle, amounts):
+                i, j, k = self.__edges[e]
+                route.AddHop(i, j, k, amountIn, amountOut)
+            routes.append((gain, route))
+
+        routes.sort(key=lambda item: -item[0])
+        self.__timeScan = time.time() - timeStart
+        return [route for _, route in routes]
+
+    def GetScanTime(self) -> float:
+        return self.__timeScan
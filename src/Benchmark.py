@@ -0,0 +1,221 @@
+import os
+import sys
+import csv
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from GraphManager import GraphManager
+from SampleDataGenerator import SampleDataGenerator
+
+try:
+    import resource  # peak memory is only reported where getrusage is available
+except ImportError:
+    resource = None
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Model2'))
+
+
+# write pools of a GraphManager market as Model2 csv, each listed pair of an exchange trades at that exchange's stocks
+def DumpPools(graphManager: GraphManager, pathPools: str) -> None:
+    with open(pathPools, 'w', newline='') as poolFile:
+        writer = csv.writer(poolFile)
+        writer.writerow(['Exchange', 'Currency1', 'Currency2', 'Stock1', 'Stock2'])
+        for i, j, k in graphManager.GetEdges():
+            if graphManager.Currency2Index(i) > graphManager.Currency2Index(j): continue
+            writer.writerow([k, i, j, graphManager.GetStock(k, i), graphManager.GetStock(k, j)])
+
+
+def GetPeakMemory() -> float:
+    if resource is None: return float('nan')
+    maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxRSS / 1024 ** 2 if sys.platform == 'darwin' else maxRSS / 1024  # MB, darwin reports bytes
+
+
+def RunExactModelSolver(pathMarket: str, T0: float, timeLimit: float) -> dict:
+    from ExactModelSolver import ExactModelSolver
+
+    GM = GraphManager()
+    GM.LoadData(pathMarket)
+    GM.SetInitCurrency('o')
+    GM.SetTermCurrency('d')
+    GM.SetInitCurrencyQuantity(T0)
+
+    EMS = ExactModelSolver(GM, verbose=False)
+    EMS.SetTimeLimit(timeLimit)
+    EMS.Update()
+    EMS.Optimize()
+
+    hasSolution = EMS.HasSolution()
+    return {'numVars': EMS.GetNumVars(), 'numConstrs': EMS.GetNumConstrs(),
+            'setupTime': EMS.GetSetupTime(), 'solveTime': EMS.GetOptTime(),
+            'objective': EMS.GetObjective() if hasSolution else float('nan'),
+            'MIPGap': EMS.GetMIPGap() if hasSolution else float('nan'), 'status': EMS.GetStatus()}
+
+
+def RunSLSQPManager(pathMarket: str, T0: float, timeLimit: float) -> dict:
+    from SLSQP import SLSQPManager
+
+    GM = GraphManager()
+    GM.LoadData(pathMarket)
+    GM.SetInitCurrency('o')
+    GM.SetTermCurrency('d')
+    GM.SetInitCurrencyQuantity(T0)
+
+    timeStart = time.time()
+    SM = SLSQPManager(GM)
+    SM.AddInitPoint()
+    timeSetup = time.time() - timeStart
+    success = SM.Optimize(verbose=False)
+
+    return {'numVars': SM.GetNumVars(), 'numConstrs': SM.GetNumConstrs(),
+            'setupTime': timeSetup, 'solveTime': SM.GetOptTime(),
+            'objective': SM.GetObjective(), 'MIPGap': float('nan'), 'status': 'success' if success else 'failure'}
+
+
+def RunModelSolver(pathPools: str, T0: float, timeLimit: float) -> dict:
+    from ModelSolver import ModelSolver
+    from ExchangeManager import ExchangeManager
+
+    EM = ExchangeManager()
+    EM.ImportData(pathPools)
+    EM.SetInitCurrency('o')
+    EM.SetTermCurrency('d')
+    EM.SetInitCurrencyQuantity(T0)
+
+    MS = ModelSolver(EM, verbose=False)
+    MS.SetTimeLimit(timeLimit)
+    MS.Update()
+    MS.Optimize()
+
+    hasSolution = MS.HasSolution()
+    return {'numVars': MS.GetNumVars(), 'numConstrs': MS.GetNumConstrs(),
+            'setupTime': MS.GetSetupTime(), 'solveTime': MS.GetOptTime(),
+            'objective': MS.GetObjective() if hasSolution else float('nan'),
+            'MIPGap': MS.GetMIPGap() if hasSolution else float('nan'), 'status': MS.GetStatus()}
+
+
+# run one solver in the current process and attach its peak memory, errors are recorded instead of raised
+def RunSolver(nameSolver: str, pathMarket: str, pathPools: str, T0: float, timeLimit: float) -> dict:
+    try:
+        if nameSolver == 'ExactModelSolver': record = RunExactModelSolver(pathMarket, T0, timeLimit)
+        elif nameSolver == 'SLSQPManager': record = RunSLSQPManager(pathMarket, T0, timeLimit)
+        elif nameSolver == 'ModelSolver': record = RunModelSolver(pathPools, T0, timeLimit)
+        else: raise Exception('Unknown solver: {}'.format(nameSolver))
+    except Exception as e:
+        record = {'status': 'error: {}'.format(e)}
+
+    record['peakMemory'] = GetPeakMemory()
+    return record
+
+
+class Benchmark:
+
+    def __init__(self, pathTemp: str) -> None:
+        self.__pathTemp = pathTemp
+        self.__cases = []
+        self.__solvers = ['ExactModelSolver', 'SLSQPManager', 'ModelSolver']
+        self.__T0 = 1.0
+        self.__timeLimit = 60.0
+        self.__records = []
+        self.__fields = ('case', 'solver', 'numCurrencies', 'numExchanges', 'degree', 'seed', 'numVars', 'numConstrs',
+                         'setupTime', 'solveTime', 'objective', 'MIPGap', 'status', 'peakMemory')
+
+    # add seeded synthetic case, degree: currencies listed per exchange (None: all)
+    def AddCase(self, label: str, numCurrencies: int, numExchanges: int, degree: int = None, seed: int = 0) -> None:
+        self.__cases.append({'case': label, 'numCurrencies': numCurrencies, 'numExchanges': numExchanges, 'degree': degree, 'seed': seed})
+
+    # from tiny markets over DataCase4 size (4 currencies, 7 exchanges) to sparse markets beyond it
+    def AddDefaultCases(self) -> None:
+        self.AddCase('Tiny', 2, 1)
+        self.AddCase('Small', 3, 2)
+        self.AddCase('Case3Size', 4, 2)
+        self.AddCase('Case4Size', 4, 7)
+        self.AddCase('Medium', 6, 8, degree=4)
+        self.AddCase('Large', 12, 20, degree=5)
+        self.AddCase('Huge', 50, 40, degree=6)
+
+    def SetSolvers(self, solvers: list) -> None:
+        self.__solvers = list(solvers)
+
+    def SetInitCurrencyQuantity(self, T0: float) -> None:
+        self.__T0 = T0
+
+    def SetTimeLimit(self, timeLimit: float) -> None:
+        self.__timeLimit = timeLimit
+
+    def __PrepareCase(self, case: dict) -> tuple:
+        pathMarket = os.path.join(self.__pathTemp, 'Data' + case['case'] + '.yaml')
+        pathPools = os.path.join(self.__pathTemp, 'Data' + case['case'] + '.csv')
+
+        SDG = SampleDataGenerator()
+        SDG.SetNumCurrencies(case['numCurrencies'])
+        SDG.SetNumExchanges(case['numExchanges'])
+        SDG.SetDegree(case['degree'])
+        SDG.SetSeed(case['seed'])
+        SDG.DumpMarket(pathMarket)
+
+        GM = GraphManager()
+        GM.LoadData(pathMarket)
+        DumpPools(GM, pathPools)
+
+        return pathMarket, pathPools
+
+    # every solve runs in a fresh process, so peak memory belongs to that solve only
+    def Run(self) -> list:
+        os.makedirs(self.__pathTemp, exist_ok=True)
+        self.__records = []
+
+        for case in self.__cases:
+            pathMarket, pathPools = self.__PrepareCase(case)
+            for nameSolver in self.__solvers:
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    record = executor.submit(RunSolver, nameSolver, pathMarket, pathPools, self.__T0, self.__timeLimit).result()
+                record.update(case)
+                record['solver'] = nameSolver
+                self.__records.append(record)
+                print('{case} {solver}: status {status}, solve time {solveTime}'.format(**{'solveTime': None, **record}))
+
+        return self.__records
+
+    def ExportResult(self, pathResult: str) -> None:
+        with open(pathResult, 'w', newline='') as resultFile:
+            writer = csv.DictWriter(resultFile, fieldnames=self.__fields, restval='')
+            writer.writeheader()
+            writer.writerows(self.__records)
+
+    # read records of a stored result file in place of a run, e.g. to compare two stored runs; empty fields are left out
+    def ImportResult(self, pathResult: str) -> None:
+        types = {'numVars': int, 'numConstrs': int, 'setupTime': float, 'solveTime': float, 'objective': float, 'MIPGap': float, 'peakMemory': float}
+        with open(pathResult, 'r', newline='') as resultFile:
+            self.__records = [{name: types.get(name, str)(value) for name, value in row.items() if value != ''} for row in csv.DictReader(resultFile)]
+
+    def GetRecords(self) -> list:
+        return self.__records
+
+    # compare records with a stored result file, return descriptions of regressions
+    def Compare(self, pathBaseline: str, timeTolerance: float = 0.5, objTolerance: float = 1e-4) -> list:
+        with open(pathBaseline, 'r', newline='') as baselineFile:
+            baseline = {(row['case'], row['solver']): row for row in csv.DictReader(baselineFile)}
+
+        regressions = []
+        for record in self.__records:
+            key = (record['case'], record['solver'])
+            if key not in baseline: continue
+            base = baseline[key]
+
+            if str(record['status']) != base['status']:
+                regressions.append('{} {}: status {} -> {}'.format(*key, base['status'], record['status']))
+            if 'numVars' in record and base['numVars'] and record['numVars'] != int(base['numVars']):
+                regressions.append('{} {}: number of variables {} -> {}'.format(*key, base['numVars'], record['numVars']))
+            # records without both times, e.g. of errors, are only compared by status
+            times = (record.get('setupTime'), record.get('solveTime'), base.get('setupTime'), base.get('solveTime'))
+            if all(value not in (None, '') for value in times):
+                timeBase, timeNew = float(base['setupTime']) + float(base['solveTime']), record['setupTime'] + record['solveTime']
+                if timeNew > timeBase * (1 + timeTolerance):
+                    regressions.append('{} {}: time {:.4f} -> {:.4f} seconds'.format(*key, timeBase, timeNew))
+            # a missing objective counts as nan, losing or gaining an objective is a regression as well
+            objBase, objNew = float(base['objective']) if base.get('objective') else float('nan'), float(record.get('objective', float('nan')))
+            if math.isnan(objBase) != math.isnan(objNew) or abs(objNew - objBase) > objTolerance * max(1.0, abs(objBase)):
+                regressions.append('{} {}: objective {} -> {}'.format(*key, objBase, objNew))
+
+        return regressions
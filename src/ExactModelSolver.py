@@ -1,94 +1,353 @@
 import time
+import numpy as np
 import gurobipy as gp
+from scipy.sparse import csr_matrix
 from gurobipy import GRB
 from GraphManager import GraphManager
+from Route import Route
+from Profiler import Profiled, Traced, OptionalSpan, OptionalCount
+from SolverCallback import AddLazyCycleCuts, IncumbentCallback
+from PiecewiseLinear import GetTangents, GetRefinementTangents, PropagateFlows
 
 
-class ExactModelSolver:
+class ExactModelSolver(Profiled):
 
     def __init__(self, graphManager: GraphManager, verbose=True) -> None:
+        super().__init__(graphManager.GetProfiler())
         self.__G = graphManager
         self.__model = gp.Model("Exact Model Solver")
         self.__model.Params.NonConvex = 2
         self.__model.Params.OutputFlag = verbose
-        self.__M = 1e2
+        self.__M = 1e2  # a used edge trades at least 1/M, also every big-M if bounds are not derived
+        self.__tightBigM = True  # derive big-M of each constraint from T0 and stocks
+        self.__bigM = None
+        self.__numPatches = None  # patches of graph manager the model was built on
         self.__timeSetup = None
         self.__timeOptimization = None
+        self.__timeFirstIncumbent = None
+        self.__objFirstIncumbent = None
+        self.__start = None
+        self.__startComparison = None  # run -> time to first incumbent, solve time and objective of CompareMIPStart
+        self.__incumbentCallback = None
+        self.__objIncumbent = None
+        self.__callback = IncumbentCallback(self.__OnIncumbent)
+        self.__matrixBuild = False  # build model with gurobi matrix API
+        self.__lazyCycleElimination = False  # cut cycles of incumbents in callback instead of MTZ constraints
+        self.__varNames = True  # name variables, e.g. X(i,j,k), for exported models and result files
+        self.__numBreakpoints = 0  # tangents bounding each edge output from above, 0: exact bilinear fraction constraint
+        self.__numRefinements = 0
+        self.__refinementTolerance = 1e-6  # relative overestimate of an edge output that gets another tangent
         self.__verbose = verbose
 
     def SetBigM(self, M: float) -> None:
         self.__M = M
 
+    def SetTightBigM(self, tightBigM: bool) -> None:
+        self.__tightBigM = tightBigM
+
     def SetMIPGap(self, MIPGap: float) -> None:
         self.__model.Params.MIPGap = MIPGap
 
-    # declare gurobi decision variables based on model size: (#currency, #exchange)
+    def SetTimeLimit(self, timeLimit: float) -> None:
+        self.__model.Params.TimeLimit = timeLimit
+
+    # callback(route, gap, runtime) receives every improving incumbent, e.g. to serve the best route within a time limit
+    def SetIncumbentCallback(self, incumbentCallback) -> None:
+        self.__incumbentCallback = incumbentCallback
+
+    def SetMatrixBuild(self, matrixBuild: bool) -> None:
+        self.__matrixBuild = matrixBuild
+
+    # omit MTZ order U and its constraints, forbid cycles of used pairs by lazy cuts only when an incumbent contains one
+    def SetLazyCycleElimination(self, lazyCycleElimination: bool) -> None:
+        self.__lazyCycleElimination = lazyCycleElimination
+        self.__model.Params.LazyConstraints = int(lazyCycleElimination)
+
+    # replace the bilinear fraction constraint by tangents of the concave edge output at numBreakpoints inputs, which gives a MILP;
+    # each refinement adds tangents at the inputs of the last solution and solves again, routes are re-evaluated with exact outputs
+    def SetPiecewiseLinear(self, numBreakpoints: int, numRefinements: int = 0) -> None:
+        self.__numBreakpoints = numBreakpoints
+        self.__numRefinements = numRefinements
+
+    def SetVarNames(self, varNames: bool) -> None:
+        self.__varNames = varNames
+
+    # supply starting assignment, X: (i, j, k) -> quantity; Y, Z and U are derived from X if not given
+    def SetMIPStart(self, X: dict, Y: dict = None, Z: dict = None, U: dict = None) -> None:
+        X = {(i, j, k): X.get((i, j, k), 0.0) for i, j, k in self.__G.GetEdges()}
+        if Y is None:
+            X = {edge: x if x * self.__M >= 1 else 0.0 for edge, x in X.items()}  # Y <= M * X: a used edge trades at least 1/M
+            Y = {edge: float(x > 0) for edge, x in X.items()}
+        if Z is None: Z = {(i, j): float(any(Y[i, j, k] > 0 for k in self.__G.GetExchanges() if (i, j, k) in Y)) for i, j in self.__G.GetPairs()}
+        if U is None: U = self.__GetStartOrder(Z)
+        edges = list(X.keys())
+        X, F = self.__PropagateFlows(edges, [X[edge] for edge in edges])
+        self.__start = {'X': dict(zip(edges, X)), 'F': dict(zip(edges, F)), 'Y': Y, 'Z': Z, 'U': U}
+
+    # keep split fractions of X but recompute quantities with fraction constraint, so that flows are conserved: (X, F) as lists
+    def __PropagateFlows(self, edges: list, X: list) -> tuple:
+        stockI, stockJ = [self.__G.GetStock(k, i) for i, _, k in edges], [self.__G.GetStock(k, j) for _, j, k in edges]
+        return PropagateFlows([(i, j) for i, j, _ in edges], X, stockI, stockJ, self.__G.GetInitCurrency(), self.__G.GetTermCurrency(), self.__G.GetT0())
+
+    # MTZ needs U(j) >= U(i) + 1 on every used pair: take longest path depth, empty if used pairs contain a cycle
+    def __GetStartOrder(self, Z: dict) -> dict:
+        successors = {i: [] for i in self.__G.GetCurrencies()}
+        inDegree = {i: 0 for i in self.__G.GetCurrencies()}
+        for (i, j), z in Z.items():
+            if z < 0.5: continue
+            successors[i].append(j)
+            inDegree[j] += 1
+
+        U = {i: 0.0 for i in inDegree}
+        queue = [i for i, degree in inDegree.items() if degree == 0]
+        numVisited = 0
+        while queue:
+            i = queue.pop()
+            numVisited += 1
+            for j in successors[i]:
+                U[j] = max(U[j], U[i] + 1)
+                inDegree[j] -= 1
+                if inDegree[j] == 0: queue.append(j)
+
+        return U if numVisited == len(U) else {}
+
+    # objective value of the MIP start
+    def GetStartObjective(self) -> float:
+        if self.__start is None: return None
+        return sum(f for (i, j, k), f in self.__start['F'].items() if j == self.__G.GetTermCurrency())
+
+    # solve the updated model twice, without and with the MIP start, to measure what the start saves; the second solve is kept
+    @Traced('compare MIP start')
+    def CompareMIPStart(self) -> dict:
+        if self.__start is None:
+            raise Exception("No MIP start set, call SetMIPStart first")
+        if self.__numBreakpoints > 0 and self.__numRefinements > 0:
+            raise Exception("Refinement tangents of the first solve would carry over to the second, turn refinement off to compare")
+
+        self.__startComparison = {}
+        start = self.__start
+        for name in ('without start', 'with start'):
+            self.__start = start if name == 'with start' else None
+            self.__model.reset(1)  # discard solution, bounds and MIP start of the previous solve
+            self.Optimize()
+            self.__startComparison[name] = {'timeFirstIncumbent': self.__timeFirstIncumbent, 'solveTime': self.__timeOptimization,
+                                            'objective': self.__model.objVal if self.HasSolution() else None}
+        return self.__startComparison
+
+    def __ApplyMIPStart(self) -> None:
+        if self.__start is None: return
+        for name, variables in (('X', self.__X), ('F', self.__F), ('Y', self.__Y), ('Z', self.__Z), ('U', self.__U)):
+            for key, value in self.__start[name].items():
+                if key in variables: variables[key].Start = value
+
+    # cut cyclic incumbents, record when the first incumbent is found, pass improving incumbents to incumbent callback
+    @Traced('incumbent')
+    def __OnIncumbent(self, model: gp.Model) -> None:
+        if self.__lazyCycleElimination and AddLazyCycleCuts(model, self.__Y, self.__Z, self.GetProfiler()): return
+        runtime, obj = model.cbGet(GRB.Callback.RUNTIME), model.cbGet(GRB.Callback.MIPSOL_OBJ)
+        if self.__timeFirstIncumbent is None:
+            self.__timeFirstIncumbent, self.__objFirstIncumbent = runtime, obj
+
+        if self.__incumbentCallback is None or (self.__objIncumbent is not None and obj <= self.__objIncumbent): return
+        self.__objIncumbent = obj
+        bound = model.cbGet(GRB.Callback.MIPSOL_OBJBND)
+        gap = abs(bound - obj) / abs(obj) if obj != 0 else float('inf')
+        edges = list(self.__X.keys())
+        values = (model.cbGetSolution([variables[edge] for edge in edges]) for variables in (self.__X, self.__F, self.__Y))
+        self.__incumbentCallback(self.__BuildRoute(edges, *values, obj), gap, runtime)
+
+    # big-M of every constraint family: flow bound of each sold currency (X <= M Y and pair flow),
+    # edges per pair (sum Y <= M Z) and number of currencies (MTZ, U <= N - 1)
+    @Traced('big-M')
+    def __DeriveBigM(self) -> None:
+        currencies, pairs = list(self.__G.indCurrency), self.__G.GetPairs()
+        if not self.__tightBigM:
+            self.__bigM = {'flow': dict.fromkeys(currencies, self.__M), 'pair': dict.fromkeys(pairs, self.__M), 'link': self.__M, 'MTZ': self.__M}
+            return
+
+        numEdges = {pair: 0 for pair in pairs}
+        for i, j, _ in self.__G.GetEdges(): numEdges[i, j] += 1
+        self.__bigM = {'flow': dict(zip(currencies, self.__G.GetFlowBounds().tolist())), 'pair': numEdges, 'link': 1.0, 'MTZ': float(len(currencies))}
+
+    # report big-M values chosen by last update
+    def GetBigM(self) -> dict:
+        return self.__bigM
+
+    # declare gurobi decision variables on tradeable edges only: (#edge, #pair, #currency)
+    @Traced('variables')
     def __DeclareDecisionVariables(self) -> None:
-        self.__X, self.__Y, self.__F, self.__U, self.__Z = {}, {}, {}, {}, {}
+        self.__X, self.__Y, self.__F, self.__U, self.__Z = gp.tupledict(), gp.tupledict(), gp.tupledict(), {}, gp.tupledict()
         
-        for i in self.__G.GetCurrencies():
-            self.__U[i] = self.__model.addVar(vtype=GRB.CONTINUOUS, lb=0, name="U(%s)" % (i))
-            for j in self.__G.GetCurrencies():
-                self.__Z[i, j] = self.__model.addVar(vtype=GRB.BINARY, name="Z(%s,%s)" % (i, j))
-                for k in self.__G.GetExchanges():
-                    self.__X[i, j, k] = self.__model.addVar(vtype=GRB.CONTINUOUS, lb=0, name="X(%s,%s,%s)" % (i, j, k))
-                    self.__F[i, j, k] = self.__model.addVar(vtype=GRB.CONTINUOUS, lb=0, name="F(%s,%s,%s)" % (i, j, k))  # value of fraction
-                    self.__Y[i, j, k] = self.__model.addVar(vtype=GRB.BINARY,           name="Y(%s,%s,%s)" % (i, j, k))
+        for i in self.__G.GetCurrencies() if not self.__lazyCycleElimination else []:  # lazy cuts need no MTZ order
+            self.__U[i] = self.__model.addVar(vtype=GRB.CONTINUOUS, lb=0, ub=self.__GetMaxU(), name="U(%s)" % (i) if self.__varNames else "")
+
+        for i, j in self.__G.GetPairs():
+            self.__Z[i, j] = self.__model.addVar(vtype=GRB.BINARY, name="Z(%s,%s)" % (i, j) if self.__varNames else "")
+
+        for i, j, k in self.__G.GetEdges():
+            self.__X[i, j, k] = self.__model.addVar(vtype=GRB.CONTINUOUS, lb=0, name="X(%s,%s,%s)" % (i, j, k) if self.__varNames else "")
+            self.__F[i, j, k] = self.__model.addVar(vtype=GRB.CONTINUOUS, lb=0, name="F(%s,%s,%s)" % (i, j, k) if self.__varNames else "")  # value of fraction
+            self.__Y[i, j, k] = self.__model.addVar(vtype=GRB.BINARY,           name="Y(%s,%s,%s)" % (i, j, k) if self.__varNames else "")
+
+    # MTZ order only needs values 0 .. N-1 if the big-M is the number of currencies
+    def __GetMaxU(self) -> float:
+        return self.__bigM['MTZ'] - 1 if self.__tightBigM else GRB.INFINITY
 
     # add upper bound constraint to improve solving time
+    @Traced('upper bound')
     def __AddUpperBound(self) -> None:
-        exchanges = self.__G.GetExchanges()
-        midCurrencies = self.__G.GetMidCurrencies()
-        self.__model.addConstrs(gp.quicksum(self.__X[i, j, k] for j in midCurrencies for k in exchanges) <= gp.quicksum(self.__G.GetStock(k, i) for k in exchanges) for i in midCurrencies)
+        midCurrencies = set(self.__G.GetMidCurrencies())
+        stocks = {i: sum(exchange.GetStocks().get(i, 0) for exchange in self.__G.GetExchanges().values()) for i in midCurrencies}  # total stock over exchanges listing i
+        edges = gp.tuplelist(self.__G.GetEdges())
+        self.__model.addConstrs(gp.quicksum(self.__X[i, j, k] for i, j, k in edges.select(i, '*', '*') if j in midCurrencies) <= stocks[i] for i in midCurrencies)
 
     # set objective function
+    @Traced('objective')
     def __SetObjective(self) -> None:
-        obj = gp.quicksum(self.__F[i, self.__G.GetTermCurrency(), k] for i in self.__G.GetCurrencies() for k in self.__G.GetExchanges())
+        obj = self.__F.sum('*', self.__G.GetTermCurrency(), '*')
         self.__model.setObjective(obj, sense=GRB.MAXIMIZE)
 
-    # replace value of fraction with F
+    # replace value of fraction with F, bounded by tangents in piecewise linear mode
+    @Traced('fraction')
     def __SetFractionConstraint(self) -> None:
-        self.__model.addConstrs(self.__F[i, j, k] * (self.__G.GetStock(k, i) + self.__X[i, j, k]) == self.__G.GetStock(k, j) * self.__X[i, j, k] for i in self.__G.GetCurrencies() for j in self.__G.GetCurrencies() for k in self.__G.GetExchanges())
+        if self.__numBreakpoints > 0:
+            edges = self.__G.GetEdges()
+            edgeI, edgeJ, edgeK = self.__G.GetEdgeArrays()
+            S = self.__G.GetStockMatrix()
+            slopes, intercepts = GetTangents(S[edgeK, edgeI], S[edgeK, edgeJ], self.__G.GetFlowBounds()[edgeI], self.__numBreakpoints)
+            for slope, intercept in zip(slopes.tolist(), intercepts.tolist()):
+                self.__model.addConstrs(self.__F[edge] <= a * self.__X[edge] + c for edge, a, c in zip(edges, slope, intercept))
+            return
+
+        self.__model.addConstrs(self.__F[i, j, k] * (self.__G.GetStock(k, i) + self.__X[i, j, k]) == self.__G.GetStock(k, j) * self.__X[i, j, k] for i, j, k in self.__G.GetEdges())
 
     # flow into initial currency shoule be 0, flow out of initial currency should be same as quantity of initial currency
+    @Traced('init currency')
     def __SetInitCurrencyConstraint(self) -> None:
-        initInFlow = gp.quicksum(self.__X[i, self.__G.GetInitCurrency(), k] for i in self.__G.GetCurrencies() for k in self.__G.GetExchanges())
+        initInFlow = self.__X.sum('*', self.__G.GetInitCurrency(), '*')
         self.__model.addConstr(initInFlow == 0)
-        initOutFlow = gp.quicksum(self.__X[self.__G.GetInitCurrency(), j, k] for j in self.__G.GetCurrencies() for k in self.__G.GetExchanges())
+        initOutFlow = self.__X.sum(self.__G.GetInitCurrency(), '*', '*')
         self.__model.addConstr(initOutFlow == self.__G.GetT0())
 
     # flow out of terminal currency should be 0
+    @Traced('term currency')
     def __SetTermCurrencyConstraint(self) -> None:
-        termOutFlow = gp.quicksum(self.__X[self.__G.GetTermCurrency(), j, k] for j in self.__G.GetCurrencies() for k in self.__G.GetExchanges())
+        termOutFlow = self.__X.sum(self.__G.GetTermCurrency(), '*', '*')
         self.__model.addConstr(termOutFlow == 0)
 
     # linear big-M expression of binary variable Y
+    @Traced('Y')
     def __SetYConstraint(self) -> None:
-        self.__model.addConstrs(self.__Y[i, j, k] <= self.__X[i, j, k] * self.__M for i in self.__G.GetCurrencies() for j in self.__G.GetCurrencies() for k in self.__G.GetExchanges())
-        self.__model.addConstrs(self.__X[i, j, k] <= self.__M * self.__Y[i, j, k] for i in self.__G.GetCurrencies() for j in self.__G.GetCurrencies() for k in self.__G.GetExchanges())
+        self.__model.addConstrs(self.__Y[i, j, k] <= self.__X[i, j, k] * self.__M for i, j, k in self.__G.GetEdges())
+        self.__model.addConstrs(self.__X[i, j, k] <= self.__bigM['flow'][i] * self.__Y[i, j, k] for i, j, k in self.__G.GetEdges())
 
-    # flow into a currency must be the same as flow out of it
+    # flow into a currency must be the same as flow out of it, self exchange has no edge
+    @Traced('conservation')
     def __SetConservationConstraint(self) -> None:
         midCurrencies = self.__G.GetMidCurrencies()
-        self.__model.addConstrs(gp.quicksum(self.__F[i, j, k] for i in self.__G.GetCurrencies() for k in self.__G.GetExchanges()) ==
-                                gp.quicksum(self.__X[j, i, k] for i in self.__G.GetCurrencies() for k in self.__G.GetExchanges()) for j in midCurrencies)
-        self.__model.addConstrs(gp.quicksum(self.__X[j, j, k] for k in self.__G.GetExchanges()) == 0 for j in self.__G.GetCurrencies())
+        self.__model.addConstrs(self.__F.sum('*', j, '*') == self.__X.sum(j, '*', '*') for j in midCurrencies)
 
     # limit total processing fee
+    @Traced('processing fee')
     def __SetProcessingFeeConstraint(self) -> None:
         fee = gp.quicksum(self.__G.GetB1(i, j, k) * self.__Y[i, j, k] +
-                          self.__G.GetB2(i, j, k) * self.__X[i, j, k] for i in self.__G.GetCurrencies() for j in self.__G.GetCurrencies() for k in self.__G.GetExchanges())
+                          self.__G.GetB2(i, j, k) * self.__X[i, j, k] for i, j, k in self.__G.GetEdges())
         self.__model.addConstr(fee <= self.__G.GetFeeLimit())
 
-    # eliminate cycles inside currency-exchange graph
+    # eliminate cycles inside currency-exchange graph, pairs without edge can never be on a cycle
+    # lazy cycle elimination only needs Z to be on for used pairs, cycles are cut in callback
+    @Traced('cycle elimination')
     def __SetCycleEliminationConstraint(self) -> None:
-        self.__model.addConstrs(self.__U[i] - self.__U[j] + self.__Z[i, j] * self.__M <= self.__M - 1 for i in self.__G.GetCurrencies() for j in self.__G.GetCurrencies())
-        self.__model.addConstrs(self.__Z[i, j] <= gp.quicksum(self.__Y[i ,j, k] * self.__M for k in self.__G.GetExchanges()) for i in self.__G.GetCurrencies() for j in self.__G.GetCurrencies())
-        self.__model.addConstrs(gp.quicksum(self.__Y[i ,j, k] for k in self.__G.GetExchanges()) <= self.__Z[i, j] * self.__M  for i in self.__G.GetCurrencies() for j in self.__G.GetCurrencies())
+        MTZ, link, pairM = self.__bigM['MTZ'], self.__bigM['link'], self.__bigM['pair']
+        self.__model.addConstrs(self.__Y.sum(i, j, '*') <= self.__Z[i, j] * pairM[i, j] for i, j in self.__G.GetPairs())
+        if self.__lazyCycleElimination: return
+        self.__model.addConstrs(self.__U[i] - self.__U[j] + self.__Z[i, j] * MTZ <= MTZ - 1 for i, j in self.__G.GetPairs())
+        self.__model.addConstrs(self.__Z[i, j] <= self.__Y.sum(i, j, '*') * link for i, j in self.__G.GetPairs())
         
+    # sparse 0/1 matrix with ones at (rows[n], cols[n])
+    def __Incidence(self, rows: np.array, cols: np.array, shape: tuple) -> csr_matrix:
+        return csr_matrix((np.ones(len(rows)), (rows, cols)), shape=shape)
+
+    # declare X, F, Y as edge vectors and add every constraint family in bulk from reserve arrays
+    @Traced('matrix')
+    def __UpdateMatrix(self) -> None:
+        m, G, M = self.__model, self.__G, self.__M
+        edges, pairs, currencies = G.GetEdges(), G.GetPairs(), list(G.indCurrency)
+        numEdges, numPairs, N = len(edges), len(pairs), len(currencies)
+
+        edgeI, edgeJ, edgeK = G.GetEdgeArrays()
+        S = G.GetStockMatrix()
+        stockI, stockJ = S[edgeK, edgeI], S[edgeK, edgeJ]
+        indPair = {pair: p for p, pair in enumerate(pairs)}
+        edgePair = np.array([indPair[i, j] for i, j, _ in edges], dtype=int)
+        pairI = np.array([G.Currency2Index(i) for i, _ in pairs], dtype=int)
+        pairJ = np.array([G.Currency2Index(j) for _, j in pairs], dtype=int)
+        o, d = G.Currency2Index(G.GetInitCurrency()), G.Currency2Index(G.GetTermCurrency())
+        mid = np.array([G.Currency2Index(j) for j in G.GetMidCurrencies()], dtype=int)
+        rowMid = np.full(N, -1)
+        rowMid[mid] = np.arange(len(mid))
+
+        names, lazy, span = self.__varNames, self.__lazyCycleElimination, lambda name: OptionalSpan(self.GetProfiler(), name)
+        with span('variables'):
+            Z = m.addMVar(numPairs, vtype=GRB.BINARY, name=["Z(%s,%s)" % pair for pair in pairs] if names else "")
+            X = m.addMVar(numEdges, lb=0, name=["X(%s,%s,%s)" % edge for edge in edges] if names else "")
+            F = m.addMVar(numEdges, lb=0, name=["F(%s,%s,%s)" % edge for edge in edges] if names else "")  # value of fraction
+            Y = m.addMVar(numEdges, vtype=GRB.BINARY, name=["Y(%s,%s,%s)" % edge for edge in edges] if names else "")
+
+        # upper bound on flow between mid currencies
+        with span('upper bound'):
+            edgeUB = np.flatnonzero((rowMid[edgeI] >= 0) & (rowMid[edgeJ] >= 0))
+            m.addConstr(self.__Incidence(rowMid[edgeI[edgeUB]], edgeUB, (len(mid), numEdges)) @ X <= S[:, mid].sum(axis=0))
+
+        with span('fraction'):
+            if self.__numBreakpoints > 0:
+                slopes, intercepts = GetTangents(stockI, stockJ, G.GetFlowBounds()[edgeI], self.__numBreakpoints)
+                for slope, intercept in zip(slopes, intercepts): m.addConstr(F <= slope * X + intercept)
+            else:
+                m.addConstr(F * X + stockI * F - stockJ * X == 0)
+        with span('objective'): m.setObjective(F[np.flatnonzero(edgeJ == d)].sum(), sense=GRB.MAXIMIZE)
+        with span('init currency'):
+            m.addConstr(X[np.flatnonzero(edgeJ == o)].sum() == 0)
+            m.addConstr(X[np.flatnonzero(edgeI == o)].sum() == G.GetT0())
+        with span('term currency'): m.addConstr(X[np.flatnonzero(edgeI == d)].sum() == 0)
+
+        # conservation of mid currencies
+        with span('conservation'):
+            edgeIn, edgeOut = np.flatnonzero(rowMid[edgeJ] >= 0), np.flatnonzero(rowMid[edgeI] >= 0)
+            m.addConstr(self.__Incidence(rowMid[edgeJ[edgeIn]], edgeIn, (len(mid), numEdges)) @ F ==
+                        self.__Incidence(rowMid[edgeI[edgeOut]], edgeOut, (len(mid), numEdges)) @ X)
+
+        with span('Y'):
+            m.addConstr(Y <= M * X)
+            m.addConstr(X <= np.array([self.__bigM['flow'][i] for i in currencies])[edgeI] * Y)
+
+        # cycle elimination on pairs, lazy cycle elimination keeps Z on for used pairs only
+        with span('cycle elimination'):
+            pairEdges = self.__Incidence(edgePair, np.arange(numEdges), (numPairs, numEdges))
+            MTZ, link, pairM = self.__bigM['MTZ'], self.__bigM['link'], np.array([self.__bigM['pair'][pair] for pair in pairs])
+            m.addConstr(pairEdges @ Y <= pairM * Z)
+            if not lazy:
+                U = m.addMVar(N, lb=0, ub=self.__GetMaxU(), name=["U(%s)" % i for i in currencies] if names else "")
+                direction = csr_matrix((np.concatenate((np.ones(numPairs), -np.ones(numPairs))),
+                                        (np.tile(np.arange(numPairs), 2), np.concatenate((pairI, pairJ)))), shape=(numPairs, N))
+                m.addConstr(direction @ U + MTZ * Z <= MTZ - 1)
+                m.addConstr(Z <= link * (pairEdges @ Y))
+
+        # keyed views shared with the rest of the solver
+        self.__X, self.__F, self.__Y = gp.tupledict(zip(edges, X.tolist())), gp.tupledict(zip(edges, F.tolist())), gp.tupledict(zip(edges, Y.tolist()))
+        self.__Z, self.__U = gp.tupledict(zip(pairs, Z.tolist())), dict(zip(currencies, U.tolist())) if not lazy else {}
+
     # update all constraints to model
+    @Traced('update')
     def Update(self) -> None:
         timeStart = time.time()
+        self.__numPatches = self.__G.GetNumPatches()
+        self.__DeriveBigM()
+        if self.__matrixBuild:
+            self.__UpdateMatrix()
+            self.__timeSetup = time.time() - timeStart
+            return
+
         self.__DeclareDecisionVariables()
         self.__AddUpperBound()
         self.__SetFractionConstraint()
@@ -102,33 +361,124 @@ class ExactModelSolver:
         self.__timeSetup = time.time() - timeStart
 
     # start solving optimization
+    @Traced('optimize')
     def Optimize(self) -> None:
+        if self.__numPatches != self.__G.GetNumPatches():
+            raise Exception("Stocks were patched after Update(), build a new ExactModelSolver.")
+        self.__ApplyMIPStart()
+        self.__timeFirstIncumbent, self.__objFirstIncumbent, self.__objIncumbent = None, None, None
         timeStart = time.time()
-        self.__model.optimize()
+        self.__model.optimize(self.__callback)
+        self.__callback.RaiseError()
+        for _ in range(self.__numRefinements if self.__numBreakpoints > 0 else 0):
+            if not self.HasSolution() or not self.__Refine(): break
+            self.__model.optimize(self.__callback)
+            self.__callback.RaiseError()
         self.__timeOptimization = time.time() - timeStart
 
+    # add tangents at inputs of the current solution where F overestimates the edge output, return whether any was added
+    @Traced('refine')
+    def __Refine(self) -> bool:
+        edges = list(self.__X.keys())
+        edgeI, edgeJ, edgeK = self.__G.GetEdgeArrays()
+        S = self.__G.GetStockMatrix()
+        valuesX, valuesF = (np.array(self.__model.getAttr('X', [variables[edge] for edge in edges])) for variables in (self.__X, self.__F))
+        refine, slopes, intercepts = GetRefinementTangents(S[edgeK, edgeI], S[edgeK, edgeJ], valuesX, valuesF, self.__refinementTolerance)
+        for n, slope, intercept in zip(refine.tolist(), slopes.tolist(), intercepts.tolist()):
+            self.__model.addConstr(self.__F[edges[n]] <= slope * self.__X[edges[n]] + intercept)
+        OptionalCount(self.GetProfiler(), 'tangent cuts', len(refine))
+        return len(refine) > 0
+
+    # get (i, j, k) -> quantity of current solution, e.g. to start another solve
+    def GetX(self) -> dict:
+        return dict(zip(self.__X.keys(), self.__model.getAttr('X', list(self.__X.values()))))
+
+    # piecewise linear F overestimates outputs: keep split fractions of X and recompute every output, so that the route is feasible
+    def __BuildRoute(self, edges: list, X: list, F: list, Y: list, objective: float) -> Route:
+        if self.__numBreakpoints > 0:
+            X, F = self.__PropagateFlows(edges, X)
+            objective = sum(f for (_, j, _), f in zip(edges, F) if j == self.__G.GetTermCurrency())
+
+        route = Route(self.__G.GetInitCurrency(), self.__G.GetTermCurrency(), self.__G.GetT0())
+        route.SetObjective(objective)
+        for (i, j, k), x, f, y in zip(edges, X, F, Y):
+            if x == 0: continue
+            route.AddHop(i, j, k, x, f, self.__G.GetB1(i, j, k) * round(y) + self.__G.GetB2(i, j, k) * x)
+        return route
+
+    # get traded edges of best solution found, solution values are fetched once per variable family
+    @Traced('route')
+    def GetRoute(self) -> Route:
+        edges = list(self.__X.keys())
+        values = (self.__model.getAttr('X', [variables[edge] for edge in edges]) for variables in (self.__X, self.__F, self.__Y))
+        return self.__BuildRoute(edges, *values, self.__model.objVal)
+
+    # a feasible solution exists, e.g. after time limit was reached
+    def HasSolution(self) -> bool:
+        return self.__model.SolCount > 0
+
+    def GetFirstIncumbentTime(self) -> float:
+        return self.__timeFirstIncumbent
+
+    def GetObjective(self) -> float:
+        return self.__model.objVal
+
+    def GetSetupTime(self) -> float:
+        return self.__timeSetup
+
+    def GetOptTime(self) -> float:
+        return self.__timeOptimization
+
+    def GetStatus(self) -> int:
+        return self.__model.status
+
+    def GetMIPGap(self) -> float:
+        return self.__model.MIPGap
+
+    def GetNumVars(self) -> int:
+        return self.__model.NumVars
+
+    # linear and quadratic constraints
+    def GetNumConstrs(self) -> int:
+        return self.__model.NumConstrs + self.__model.NumQConstrs
+
     # export model information
     def OutputModel(self, pathExport: str) -> None:
         self.__model.write(pathExport)
 
-    # output optimization result
-    def OutputResult(self, pathResult: str) -> float:
-        if self.__model.status != GRB.OPTIMAL:
+    # output optimization result, values of all decision variables are only written if dumpVariables
+    @Traced('export')
+    def OutputResult(self, pathResult: str, dumpVariables: bool = False) -> float:
+        if not self.HasSolution():
             raise Exception("No feasible solution")
 
+        route = self.GetRoute()
+
         with open(pathResult, 'w') as f:
-            f.write('Optimal objective: {} {}\n'.format(self.__model.objVal, self.__G.GetTermCurrency()))
-            f.write('Modeling time: {} seconds\n'.format(self.__timeSetup))
+            if self.__model.status == GRB.OPTIMAL:
+                f.write('Optimal objective: {} {}\n'.format(self.__model.objVal, self.__G.GetTermCurrency()))
+            else:
+                f.write('Best objective: {} {} (status {}, MIP gap {})\n'.format(self.__model.objVal, self.__G.GetTermCurrency(), self.__model.status, self.__model.MIPGap))
+            if self.__numBreakpoints > 0:
+                f.write('Objective of the piecewise linear model with {} breakpoints is an upper bound, exact route objective: {} {}\n'.format(self.__numBreakpoints, route.GetObjective(), self.__G.GetTermCurrency()))
+            f.write('Modeling time: {} seconds ({} build)\n'.format(self.__timeSetup, 'matrix' if self.__matrixBuild else 'constraint-wise'))
             f.write('Solving time: {} seconds\n'.format(self.__timeOptimization))
-            f.write('Number of decision variables: {}\n'.format(len(self.__model.getVars())))
+            f.write('Time to first incumbent: {} seconds (objective {})\n'.format(self.__timeFirstIncumbent, self.__objFirstIncumbent))
+            if self.__start is not None:
+                f.write('MIP start objective: {} {}, final objective improved it by {}\n'.format(self.GetStartObjective(), self.__G.GetTermCurrency(), self.__model.objVal - self.GetStartObjective()))
+            for name, run in (self.__startComparison or {}).items():
+                f.write('Solve {}: first incumbent after {} seconds, solved in {} seconds, objective {}\n'.format(name, run['timeFirstIncumbent'], run['solveTime'], run['objective']))
+            f.write('Number of decision variables: {}\n'.format(self.__model.NumVars))
+
+            f.write('\nTransaction Strategy\n{}\n'.format(route))
+            if not dumpVariables: return self.__timeOptimization
 
+            variables = self.__model.getVars()
+            names, values = self.__model.getAttr('VarName', variables), self.__model.getAttr('X', variables)
             f.write('\nValues of non-zero decision variables:\n')
-            for var in self.__model.getVars():
-                if var.x == 0 : continue
-                f.write('%s = %g\n' % (var.varName, var.x))
-            
+            f.writelines('%s = %g\n' % (name, value) for name, value in zip(names, values) if value != 0)
+
             f.write('\nValues of all decision variables:\n')
-            for var in self.__model.getVars():
-                f.write('%s = %g\n' % (var.varName, var.x))
-        
+            f.writelines('%s = %g\n' % (name, value) for name, value in zip(names, values))
+
         return self.__timeOptimization
@@ -1,4 +1,7 @@
+import numpy as np
 from yaml import load, Loader
+import Presolve
+from Profiler import Profiled, Traced, OptionalSpan
 
 
 class Exchange:
@@ -22,11 +25,23 @@ class Exchange:
     def SetB2s(self, B2s: dict) -> None:
         self.__B2s = B2s
 
+    # pairs of listed currencies without recorded fee are free, other pairs raise KeyError
     def GetB1(self, initCurrency: str, termCurrency: str) -> float:
-        return self.__B1s[(initCurrency, termCurrency)]
+        self.__CheckPair(initCurrency, termCurrency)
+        return self.__B1s.get((initCurrency, termCurrency), 0.0)
 
     def GetB2(self, initCurrency: str, termCurrency: str) -> float:
-        return self.__B2s[(initCurrency, termCurrency)]
+        self.__CheckPair(initCurrency, termCurrency)
+        return self.__B2s.get((initCurrency, termCurrency), 0.0)
+
+    def __CheckPair(self, initCurrency: str, termCurrency: str) -> None:
+        if initCurrency not in self.__stocks or termCurrency not in self.__stocks: raise KeyError((initCurrency, termCurrency))
+
+    def GetB1s(self) -> dict:
+        return self.__B1s
+
+    def GetB2s(self) -> dict:
+        return self.__B2s
 
     # get "currency - stock" dictionary
     def GetStocks(self) -> dict:
@@ -36,9 +51,10 @@ class Exchange:
     def GetStock(self, currency: str) -> float:
         return self.__stocks[currency]
 
-class GraphManager:
+class GraphManager(Profiled):
 
     def __init__(self) -> None:
+        super().__init__()
         self.__numCurrencies = None
         self.__numExchanges = None
         self.__initCurrency = None
@@ -47,6 +63,10 @@ class GraphManager:
         self.__exchanges = {}
         self.__currencies = set()
         self.__T0 = None
+        self.__edges = []
+        self.__pairs = []
+        self.__stockMatrix = None
+        self.__numPatches = 0
         self.indExchange = {}
         self.indCurrency = {}
 
@@ -74,9 +94,18 @@ class GraphManager:
     def GetT0(self) -> float:
         return self.__T0
 
+    # get tradeable (initCurrency, termCurrency, exchange) triples
+    def GetEdges(self) -> list:
+        return self.__edges
+
+    # get (initCurrency, termCurrency) pairs tradeable in at least one exchange
+    def GetPairs(self) -> list:
+        return self.__pairs
+
     def __AddExchange(self, exchange: Exchange) -> None:
         self.__exchanges[exchange.GetName()] = exchange
 
+    @Traced('load')
     def LoadData(self, pathData: str) -> None:
         with open(pathData, 'r') as dataFile:
             data = load(dataFile, Loader=Loader)
@@ -87,14 +116,72 @@ class GraphManager:
             for currency in exchange['stocks']:
                 self.__currencies.add(currency)  # keep record of currency kinds
                 currExchange.AddStock(currency, exchange['stocks'][currency])
-            currExchange.SetB1s({(i, j): exchange['B1'][i][j] for i in currExchange.GetStocks() for j in exchange['B1'][i]})
-            currExchange.SetB2s({(i, j): exchange['B2'][i][j] for i in currExchange.GetStocks() for j in exchange['B2'][i]})
+            B1, B2 = exchange.get('B1', {}), exchange.get('B2', {})  # compact data omits zero processing fees
+            currExchange.SetB1s({(i, j): fee for i in currExchange.GetStocks() for j, fee in B1.get(i, {}).items()})
+            currExchange.SetB2s({(i, j): fee for i in currExchange.GetStocks() for j, fee in B2.get(i, {}).items()})
             self.__AddExchange(currExchange)  # keep record of exchange kinds
 
         self.__numExchanges = len(self.__exchanges)
         self.__numCurrencies = len(self.__currencies)
 
-        self.__AssignIndices()
+        with OptionalSpan(self.GetProfiler(), 'index'):
+            self.__AssignIndices()
+            self.__BuildEdges()
+
+    # save market as uncompressed npz: name tables in index order, listed stocks and non-zero fees as index triples
+    def SaveSnapshot(self, pathSnapshot: str) -> None:
+        stockExchange, stockCurrency, stocks = [], [], []
+        feeExchange, feeInit, feeTerm, B1s, B2s = [], [], [], [], []
+
+        for nameExchange, k in self.indExchange.items():
+            exchange = self.GetExchange(nameExchange)
+            for currency, stock in exchange.GetStocks().items():
+                stockExchange.append(k)
+                stockCurrency.append(self.indCurrency[currency])
+                stocks.append(stock)
+            for i, j in set(exchange.GetB1s()).union(exchange.GetB2s()):
+                B1, B2 = exchange.GetB1(i, j), exchange.GetB2(i, j)
+                if B1 == 0 and B2 == 0: continue
+                feeExchange.append(k)
+                feeInit.append(self.indCurrency[i])
+                feeTerm.append(self.indCurrency[j])
+                B1s.append(B1)
+                B2s.append(B2)
+
+        np.savez(pathSnapshot,
+                 currencies=np.array(list(self.indCurrency), dtype=str), exchanges=np.array(list(self.indExchange), dtype=str),
+                 stockExchange=np.array(stockExchange, dtype=np.int32), stockCurrency=np.array(stockCurrency, dtype=np.int32), stocks=np.array(stocks, dtype=float),
+                 feeExchange=np.array(feeExchange, dtype=np.int32), feeInit=np.array(feeInit, dtype=np.int32), feeTerm=np.array(feeTerm, dtype=np.int32),
+                 B1=np.array(B1s, dtype=float), B2=np.array(B2s, dtype=float))
+
+    # load market saved by SaveSnapshot, replacing any loaded data
+    @Traced('load')
+    def LoadSnapshot(self, pathSnapshot: str) -> None:
+        with np.load(pathSnapshot, allow_pickle=False) as snapshot:
+            data = {key: snapshot[key] for key in snapshot.files}
+
+        currencies, exchanges = data['currencies'].tolist(), data['exchanges'].tolist()
+        self.__exchanges = {nameExchange: Exchange(nameExchange) for nameExchange in exchanges}
+        self.__currencies = set(currencies)
+        self.__numExchanges = len(self.__exchanges)
+        self.__numCurrencies = len(self.__currencies)
+        self.indCurrency = {currency: i for i, currency in enumerate(currencies)}
+        self.indExchange = {nameExchange: k for k, nameExchange in enumerate(exchanges)}
+
+        for k, i, stock in zip(data['stockExchange'].tolist(), data['stockCurrency'].tolist(), data['stocks'].tolist()):
+            self.__exchanges[exchanges[k]].AddStock(currencies[i], stock)
+
+        B1s, B2s = {nameExchange: {} for nameExchange in exchanges}, {nameExchange: {} for nameExchange in exchanges}
+        for k, i, j, B1, B2 in zip(data['feeExchange'].tolist(), data['feeInit'].tolist(), data['feeTerm'].tolist(), data['B1'].tolist(), data['B2'].tolist()):
+            B1s[exchanges[k]][currencies[i], currencies[j]] = B1
+            B2s[exchanges[k]][currencies[i], currencies[j]] = B2
+        for nameExchange, exchange in self.__exchanges.items():
+            exchange.SetB1s(B1s[nameExchange])
+            exchange.SetB2s(B2s[nameExchange])
+
+        self.__stockMatrix = np.zeros((self.__numExchanges, self.__numCurrencies))
+        self.__stockMatrix[data['stockExchange'], data['stockCurrency']] = data['stocks']
+        self.__BuildEdges()
 
     def SetInitCurrency(self, initCurrency: str) -> None:
         self.__initCurrency = initCurrency
@@ -117,6 +204,19 @@ class GraphManager:
 
         return self.__exchanges[nameExchange].GetStock(currency)
 
+    # overwrite stocks of two currencies an exchange already lists, edges and indices stay unchanged;
+    # solvers copy stocks when they are built and refuse to solve after a patch, build them again
+    def ApplyPatch(self, nameExchange: str, currency1: str, currency2: str, stock1: float, stock2: float) -> None:
+        for currency in (currency1, currency2): self.GetStock(nameExchange, currency)  # raise if not listed
+        for currency, stock in ((currency1, stock1), (currency2, stock2)):
+            self.__exchanges[nameExchange].AddStock(currency, float(stock))
+            if self.__stockMatrix is not None: self.__stockMatrix[self.indExchange[nameExchange], self.indCurrency[currency]] = stock
+        self.__numPatches += 1
+
+    # number of patches applied so far, tells whether a solver was built on current stocks
+    def GetNumPatches(self) -> int:
+        return self.__numPatches
+
     def GetB1(self, initCurrency: str, termCurrency: str, exchange: str) -> float:
         return self.__exchanges[exchange].GetB1(initCurrency, termCurrency)
 
@@ -137,8 +237,82 @@ class GraphManager:
         for indExchange, exchange in enumerate(self.GetExchanges()):
             self.indExchange[exchange] = indExchange
 
+    # an exchange can only trade between two different currencies it lists in stocks
+    def __BuildEdges(self) -> None:
+        self.__edges = [(i, j, k) for k, exchange in self.__exchanges.items() for i in exchange.GetStocks() for j in exchange.GetStocks() if i != j]
+        self.__pairs = list(dict.fromkeys((i, j) for i, j, _ in self.__edges))
+
+    # get edge endpoints as index arrays: (currency index of i, currency index of j, exchange index of k)
+    def GetEdgeArrays(self) -> tuple:
+        indI = np.array([self.indCurrency[i] for i, _, _ in self.__edges], dtype=int)
+        indJ = np.array([self.indCurrency[j] for _, j, _ in self.__edges], dtype=int)
+        indK = np.array([self.indExchange[k] for _, _, k in self.__edges], dtype=int)
+        return indI, indJ, indK
+
     def Currency2Index(self, currency: str) -> int:
         return self.indCurrency[currency]
 
     def Exchange2Index(self, exchange: str) -> int:
         return self.indExchange[exchange]
+
+    # upper bound on total quantity of each currency sold by any route, indexed by currency index,
+    # every edge trades on its own copy of the stocks, so a currency may receive more than its total stock
+    @Traced('flow bounds')
+    def GetFlowBounds(self) -> np.array:
+        if self.__initCurrency is None or self.__termCurrency is None or self.__T0 is None:
+            raise Exception("Initial currency, terminal currency and its quantity must be set")
+
+        S = self.GetStockMatrix()
+        indI, indJ, indK = self.GetEdgeArrays()
+        o, d = self.Currency2Index(self.__initCurrency), self.Currency2Index(self.__termCurrency)
+        return Presolve.GetFlowBounds(indI, indJ, S[indK, indI], S[indK, indJ], o, d, self.__T0, self.GetNumCurrencies())
+
+    # copy of the market reduced to currencies Presolve.GetRouteCurrencies keeps and edges a route can use,
+    # dropDominated also drops edges dominated by a parallel edge at the flow bounds, which leaves the optimum unchanged
+    @Traced('prune')
+    def GetPrunedGraph(self, dropDominated: bool = False) -> 'GraphManager':
+        routeCurrencies = Presolve.GetRouteCurrencies(((i, j) for i, j, _ in self.__edges), self.__initCurrency, self.__termCurrency)
+        pruned = GraphManager()
+        pruned.SetProfiler(self.GetProfiler())
+        pruned.__initCurrency, pruned.__termCurrency, pruned.__T0, pruned.__feeLimit = self.__initCurrency, self.__termCurrency, self.__T0, self.__feeLimit
+
+        for nameExchange, exchange in self.__exchanges.items():
+            stocks = {i: stock for i, stock in exchange.GetStocks().items() if i in routeCurrencies}
+            if len(stocks) < 2: continue
+            prunedExchange = Exchange(nameExchange)
+            for currency, stock in stocks.items(): prunedExchange.AddStock(currency, stock)
+            prunedExchange.SetB1s({pair: B1 for pair, B1 in exchange.GetB1s().items() if pair[0] in stocks and pair[1] in stocks})
+            prunedExchange.SetB2s({pair: B2 for pair, B2 in exchange.GetB2s().items() if pair[0] in stocks and pair[1] in stocks})
+            pruned.__AddExchange(prunedExchange)
+            pruned.__currencies.update(stocks)
+
+        pruned.__numExchanges, pruned.__numCurrencies = len(pruned.__exchanges), len(pruned.__currencies)
+        pruned.__AssignIndices()
+        pruned.__BuildEdges()
+
+        # flow into o and out of d is zero in every solver
+        edges = [(i, j, k) for i, j, k in pruned.__edges if j != pruned.__initCurrency and i != pruned.__termCurrency]
+        if dropDominated and edges:
+            bounds, pairs = pruned.GetFlowBounds(), {}
+            indPair = np.array([pairs.setdefault((i, j), len(pairs)) for i, j, _ in edges], dtype=int)
+            indI = np.array([pruned.indCurrency[i] for i, _, _ in edges], dtype=int)
+            stockI = np.array([pruned.GetStock(k, i) for i, _, k in edges], dtype=float)
+            stockJ = np.array([pruned.GetStock(k, j) for _, j, k in edges], dtype=float)
+            dominated = Presolve.GetDominatedEdges(indPair, indI, stockI, stockJ, bounds)
+            edges = [edge for edge, isDominated in zip(edges, dominated.tolist()) if not isDominated]
+        pruned.__edges = edges
+        pruned.__pairs = list(dict.fromkeys((i, j) for i, j, _ in edges))
+
+        return pruned
+
+    # get dense stock matrix, row: exchange index; col: currency index; 0 if exchange does not list currency
+    def GetStockMatrix(self) -> np.array:
+        if self.__stockMatrix is not None: return self.__stockMatrix.copy()
+
+        stockMatrix = np.zeros((self.GetNumExchanges(), self.GetNumCurrencies()))
+
+        for exchange, k in self.indExchange.items():
+            for currency, stock in self.GetExchange(exchange).GetStocks().items():
+                stockMatrix[k, self.indCurrency[currency]] = stock
+
+        return stockMatrix
@@ -0,0 +1,240 @@
+import time
+import numpy as np
+from Route import Route
+
+
+class HeuristicRouter:
+
+    def __init__(self) -> None:
+        self.__stocks = np.zeros(0)  # reserve of every (pool, currency), shared by both trading directions
+        self.__indStock = {}  # reserve key -> position in stocks
+        self.__pools = {}  # (i, j) -> (exchanges, positions of stock i, positions of stock j) of pools trading i into j
+        self.__adjacency = {}  # i -> currencies reachable from i in one hop
+        self.__poolFees = {}  # (i, j, k) -> (fee per used pool, fee per unit of i sold), processing fees B1, B2 of GraphManager
+        self.__EM = None  # ExchangeManager whose pools are loaded, gas fees G2 are converted into d by its rates
+        self.__GM = None  # GraphManager whose edges are loaded
+        self.__loadedState = None  # patch count of GraphManager or snapshot hash of ExchangeManager when loaded
+        self.__G1 = 43
+        self.__G2 = 0.003
+        self.__feesInObjective = False  # ModelSolver subtracts gas fees from output, ExactModelSolver only reports processing fees
+        self.__maxHops = 3
+        self.__maxPaths = 10
+        self.__numChunks = 20
+        self.__objective = None
+        self.__flows = {}
+        self.__order = None  # (initial currency, terminal currency, quantity) of last route
+        self.__fees = {}  # (i, j, k) -> (fee per used pool, fee per unit sold) of last route
+        self.__timeOptimization = None
+
+    def SetMaxHops(self, maxHops: int) -> None:
+        self.__maxHops = maxHops
+
+    # keep only the best single paths as candidates for splitting
+    def SetMaxPaths(self, maxPaths: int) -> None:
+        self.__maxPaths = maxPaths
+
+    # quantity of initial currency is routed in this many greedy chunks
+    def SetNumChunks(self, numChunks: int) -> None:
+        self.__numChunks = numChunks
+
+    # gas fees of pools loaded from ExchangeManager, same defaults as ModelSolver
+    def SetG1(self, G1: float) -> None:
+        self.__G1 = G1
+
+    def SetG2(self, G2: float) -> None:
+        self.__G2 = G2
+
+    def __Reset(self) -> None:
+        self.__stocks, self.__indStock, self.__pools, self.__adjacency, self.__poolFees = [], {}, {}, {}, {}
+        self.__EM, self.__GM = None, None
+
+    def __GetStockPosition(self, key: tuple, stock: float) -> int:
+        if key not in self.__indStock:
+            self.__indStock[key] = len(self.__stocks)
+            self.__stocks.append(stock)
+        return self.__indStock[key]
+
+    # register pool of exchange k trading i into j, keyIn/keyOut identify the reserves it moves
+    def __AddPool(self, i: str, j: str, k: str, keyIn: tuple, keyOut: tuple, stockIn: float, stockOut: float) -> None:
+        if i == j or not (stockIn > 0 and stockOut > 0): return
+        exchanges, posIn, posOut = self.__pools.setdefault((i, j), ([], [], []))
+        exchanges.append(k)
+        posIn.append(self.__GetStockPosition(keyIn, stockIn))
+        posOut.append(self.__GetStockPosition(keyOut, stockOut))
+        self.__adjacency.setdefault(i, []).append(j)
+
+    def __Finalize(self) -> None:
+        self.__stocks = np.array(self.__stocks, dtype=float)
+        self.__pools = {pair: (exchanges, np.array(posIn), np.array(posOut)) for pair, (exchanges, posIn, posOut) in self.__pools.items()}
+        self.__adjacency = {i: list(dict.fromkeys(js)) for i, js in self.__adjacency.items()}
+        self.__loadedState = self.__GetMarketState()
+
+    # reserves are copied when loaded, patches of the market reach the router only by loading it again
+    def __GetMarketState(self) -> object:
+        if self.__GM is not None: return self.__GM.GetNumPatches()
+        return self.__EM.GetSnapshotHash() if self.__EM is not None else None
+
+    # like ExactModelSolver, every edge (i, j, k) of GraphManager trades on its own copy of the stocks of i and j in exchange k
+    # and is charged processing fees B1 if used plus B2 per unit sold, which are reported but not subtracted from output
+    def LoadGraphManager(self, graphManager) -> None:
+        self.__Reset()
+        self.__feesInObjective = False
+        self.__GM = graphManager
+        for i, j, k in graphManager.GetEdges():
+            self.__AddPool(i, j, k, (k, i, j, i), (k, i, j, j), graphManager.GetStock(k, i), graphManager.GetStock(k, j))
+            self.__poolFees[i, j, k] = (graphManager.GetB1(i, j, k), graphManager.GetB2(i, j, k))
+        self.__Finalize()
+
+    # every (exchange, currency1, currency2) row of ExchangeManager is a separate pool,
+    # like ModelSolver, gas fees G1 per used pool plus G2 per unit sold, converted into d, are subtracted from output
+    def LoadExchangeManager(self, exchangeManager) -> None:
+        self.__Reset()
+        self.__feesInObjective = True
+        self.__EM = exchangeManager
+        for k, i, j, stockI, stockJ in zip(*(array.tolist() for array in exchangeManager.GetPoolArrays())):
+            self.__AddPool(i, j, k, (k, i, j), (k, j, i), stockI, stockJ)
+        self.__Finalize()
+
+    # (fee per used pool, fee per unit sold) of every loaded pool for routes into termCurrency
+    def __GetPoolFees(self, termCurrency: str) -> dict:
+        if self.__EM is None: return self.__poolFees
+        rates = self.__EM.GetRatesTo(termCurrency)
+        return {(i, j, k): (self.__G1, self.__G2 * rates[i]) for (i, j), (exchanges, _, _) in self.__pools.items() for k in exchanges}
+
+    # fees trades add to a route that already trades flows, a pool is charged its fixed fee once
+    def __GetFee(self, trades: list, flows: dict, fees: dict) -> float:
+        fee = 0.0
+        for (i, j), x, _ in trades:
+            for k, amountIn in zip(self.__pools[i, j][0], x.tolist()):
+                if amountIn == 0: continue
+                fixed, unit = fees[i, j, k]
+                fee += unit * amountIn + (fixed if (i, j, k) not in flows else 0.0)
+        return fee
+
+    # optimal split of quantity T over parallel constant product pools, a: stocks sold into, b: stocks bought from
+    # maximize sum b*x/(a+x) s.t. sum x = T: active pools share marginal rate a*b/(a+x)^2, filled by descending spot rate b/a
+    def __Split(self, T: float, a: np.array, b: np.array) -> np.array:
+        if not T > 0: return np.zeros(len(a))
+
+        order = np.argsort(a / b)
+        sa, sb = a[order], b[order]
+        root = np.sqrt(sa * sb)
+        scale = (T + np.cumsum(sa)) / np.cumsum(root)  # 1/sqrt(marginal rate) if the first m pools are active
+        numActive = np.flatnonzero(scale * root > sa)[-1] + 1
+
+        x = np.zeros(len(a))
+        x[order[:numActive]] = root[:numActive] * scale[numActive-1] - sa[:numActive]
+        return np.maximum(x, 0)
+
+    # trade quantity T along path on given reserves, return output and (pair, amounts in, amounts out) per hop
+    def __Traverse(self, path: list, T: float, stocks: np.array) -> tuple:
+        trades = []
+        for pair in zip(path[:-1], path[1:]):
+            _, posIn, posOut = self.__pools[pair]
+            a, b = stocks[posIn], stocks[posOut]
+            x = self.__Split(T, a, b)
+            y = b * x / (a + x)
+            trades.append((pair, x, y))
+            T = np.sum(y)
+        return T, trades
+
+    # simple paths from o to d with at most maxHops hops
+    def __EnumeratePaths(self, o: str, d: str) -> list:
+        paths, stack = [], [[o]]
+        while stack:
+            path = stack.pop()
+            for j in self.__adjacency.get(path[-1], []):
+                if j == d: paths.append(path + [j])
+                elif j not in path and len(path) < self.__maxHops: stack.append(path + [j])
+        return paths
+
+    # solvers eliminate cycles, so the currency pairs used by a route must stay acyclic
+    def __IsAcyclic(self, pairs: set) -> bool:
+        inDegree, successors = {}, {}
+        for i, j in pairs:
+            successors.setdefault(i, []).append(j)
+            inDegree[j] = inDegree.get(j, 0) + 1
+            inDegree.setdefault(i, 0)
+
+        queue = [i for i, degree in inDegree.items() if degree == 0]
+        numVisited = 0
+        while queue:
+            i = queue.pop()
+            numVisited += 1
+            for j in successors.get(i, []):
+                inDegree[j] -= 1
+                if inDegree[j] == 0: queue.append(j)
+
+        return numVisited == len(inDegree)
+
+    def __ApplyTrades(self, trades: list, stocks: np.array, flows: dict) -> None:
+        for (i, j), x, y in trades:
+            exchanges, posIn, posOut = self.__pools[i, j]
+            np.add.at(stocks, posIn, x)
+            np.subtract.at(stocks, posOut, y)
+            for k, amountIn, amountOut in zip(exchanges, x, y):
+                if amountIn == 0: continue
+                prevIn, prevOut = flows.get((i, j, k), (0, 0))
+                flows[i, j, k] = (prevIn + amountIn, prevOut + amountOut)
+
+    # route quantity T0 of o into d: best single path vs. greedy chunks over the best paths, reserves move after each chunk;
+    # paths and chunks are ranked by output net of the fees the objective subtracts
+    def Route(self, initCurrency: str, termCurrency: str, T0: float) -> float:
+        timeStart = time.time()
+        if self.__GetMarketState() != self.__loadedState:
+            raise Exception("Market was patched after it was loaded, load it again.")
+
+        paths = self.__EnumeratePaths(initCurrency, termCurrency)
+        if not paths:
+            raise Exception("No path from {} to {} found".format(initCurrency, termCurrency))
+
+        fees = self.__GetPoolFees(termCurrency)
+        Net = lambda output, trades, flows: output - self.__GetFee(trades, flows, fees) if self.__feesInObjective else output
+
+        singles = [self.__Traverse(path, T0, self.__stocks) for path in paths]
+        ranking = np.argsort([-Net(output, trades, {}) for output, trades in singles])[:self.__maxPaths]
+        bestSingle = Net(*singles[ranking[0]], {})
+        singleFlows = {}
+        self.__ApplyTrades(singles[ranking[0]][1], self.__stocks.copy(), singleFlows)
+
+        stocks, splitFlows, splitObjective, usedPairs = self.__stocks.copy(), {}, 0, set()
+        for _ in range(self.__numChunks):
+            candidates = [self.__Traverse(paths[n], T0 / self.__numChunks, stocks) for n in ranking
+                          if self.__IsAcyclic(usedPairs.union(zip(paths[n][:-1], paths[n][1:])))]
+            output, trades = max(candidates, key=lambda candidate: Net(*candidate, splitFlows))
+            splitObjective += Net(output, trades, splitFlows)
+            self.__ApplyTrades(trades, stocks, splitFlows)
+            usedPairs.update(pair for pair, _, _ in trades)
+
+        if splitObjective > bestSingle:
+            self.__objective, self.__flows = splitObjective, splitFlows
+        else:
+            self.__objective, self.__flows = bestSingle, singleFlows
+
+        self.__order = (initCurrency, termCurrency, T0)
+        self.__fees = fees
+        self.__timeOptimization = time.time() - timeStart
+        return self.__objective
+
+    def GetObjective(self) -> float:
+        return self.__objective
+
+    # get (i, j, k) -> (quantity of i sold, quantity of j bought) of last route
+    def GetFlows(self) -> dict:
+        return self.__flows
+
+    # get (i, j, k) -> quantity of i sold of last route, e.g. to start ExactModelSolver with SetMIPStart
+    def GetX(self) -> dict:
+        return {edge: amountIn for edge, (amountIn, _) in self.__flows.items()}
+
+    # get traded pools of last route, amounts of pools traded by several chunks are summed
+    def GetRoute(self) -> Route:
+        route = Route(*self.__order)
+        route.SetObjective(self.__objective)
+        for (i, j, k), (amountIn, amountOut) in self.__flows.items():
+            fixed, unit = self.__fees[i, j, k]
+            route.AddHop(i, j, k, amountIn, amountOut, fixed + unit * amountIn)
+        return route
+
+    def GetOptTime(self) -> float:
+        return self.__timeOptimization
@@ -0,0 +1,222 @@
+import os
+import sys
+import time
+import gurobipy as gp
+from gurobipy import GRB
+from ExchangeManager import ExchangeManager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Route import Route
+from Profiler import Profiled, Traced
+
+
+# route a basket of orders in one model against shared pools, orders are filled one after another in the order they were added:
+# the reserves an order trades on include what earlier orders paid into and took out of each pool
+class BatchModelSolver(Profiled):
+
+    def __init__(self, exchangeManager: ExchangeManager, verbose=True) -> None:
+        super().__init__(exchangeManager.GetProfiler())
+        self.__EM = exchangeManager
+        self.__m = gp.Model("Batch Model Solver")
+        self.__m.Params.NonConvex = 2
+        self.__m.Params.OutputFlag = verbose
+        self.__M = 1e4  # a used pool trades at least 1/M
+        self.__orders = []  # (initCurrency, termCurrency, T0, weight)
+        self.__flowBounds = None
+        self.__P = 1
+        self.__verbose = verbose
+        self.__G1 = 43
+        self.__G2 = 0.003
+        self.__timeSetup = None
+        self.__timeOptimization = None
+
+    # objective adds up weight times net output of every order, e.g. a rate into a common currency if terminal currencies differ
+    def AddOrder(self, initCurrency: str, termCurrency: str, T0: float, weight: float = 1.0) -> None:
+        if initCurrency == termCurrency:
+            raise Exception("Order from {} into itself.".format(initCurrency))
+        for currency in (initCurrency, termCurrency):
+            if currency not in self.__EM.GetCurr(): raise Exception("No pool trades {}.".format(currency))
+        self.__orders.append((initCurrency, termCurrency, T0, weight))
+
+    def GetOrders(self) -> list:
+        return self.__orders
+
+    # gas fees are charged per order in its terminal currency
+    def SetG1(self, G1: float) -> None:
+        self.__G1 = G1
+
+    def SetG2(self, G2: float) -> None:
+        self.__G2 = G2
+
+    def SetNumDivision(self, numDivision: int) -> None:
+        self.__P = numDivision
+
+    def SetBigM(self, M: float) -> None:
+        self.__M = M
+
+    def SetMIPGap(self, MIPGap: float) -> None:
+        self.__m.Params.MIPGap = MIPGap
+
+    def SetThreads(self, numThreads: int) -> None:
+        self.__m.Params.Threads = numThreads
+
+    def SetTimeLimit(self, timeLimit: float) -> None:
+        self.__m.Params.TimeLimit = timeLimit
+
+    # an order receives at most the pooled stock of a currency plus what earlier orders may have paid into pools, once per division,
+    # it sells at most that much, T0 of its initial currency and nothing of its terminal currency
+    @Traced('big-M')
+    def __DeriveBigM(self) -> None:
+        stocks, paidIn = {}, {}
+        for i, stock in zip(self.__curr1, self.__stocks1):
+            stocks[i] = stocks.get(i, 0.0) + stock
+            paidIn[i] = 0.0
+
+        self.__outputBounds, self.__flowBounds = [], []
+        for o, d, T0, _ in self.__orders:
+            outputs = {i: self.__P * (stocks[i] + paidIn[i]) for i in stocks}
+            bounds = dict(outputs)
+            bounds[o], bounds[d] = T0, 0.0
+            for i, bound in bounds.items(): paidIn[i] += bound
+            self.__outputBounds.append(outputs)
+            self.__flowBounds.append(bounds)
+
+    # only existing pools get variables: X, F, Y keyed (order, i, j, k, p), Z keyed (order, i, j), U keyed (order, i)
+    @Traced('variables')
+    def __DeclareDecisionVariables(self) -> None:
+        m, orders, div = self.__m, range(len(self.__orders)), range(self.__P)
+        edges, pairs = self.__edges, sorted(set((i, j) for i, j, _ in self.__edges))
+
+        keys = [(q, i, j, k, p) for q in orders for i, j, k in edges for p in div]
+        self.__X = m.addVars(keys, lb=0, ub=[self.__flowBounds[q][i] for q, i, _, _, _ in keys], name="X")
+        self.__F = m.addVars(keys, lb=0, ub=[self.__outputBounds[q][j] for q, _, j, _, _ in keys], name="F")  # value of fraction
+        self.__Y = m.addVars(keys, vtype=GRB.BINARY, name="Y")
+        self.__Z = m.addVars([(q, i, j) for q in orders for i, j in pairs], vtype=GRB.BINARY, name="Z")
+        self.__U = m.addVars([(q, i) for q in orders for i in self.__curr], lb=0, ub=len(self.__curr) - 1, name="U")
+        self.__G = m.addVars(orders, lb=0, name="G")
+
+    # replace value of fraction with F on reserves left by earlier orders,
+    # shift[i, j, k]: net quantity of i paid into pool k of (i, j) so far
+    @Traced('fraction')
+    def __SetFractionConstraint(self) -> None:
+        m, X, F, V = self.__m, self.__X, self.__F, self.__EM.GetV
+        shift = {edge: gp.LinExpr() for edge in self.__edges}
+
+        for q in range(len(self.__orders)):
+            m.addConstrs(F[q, i, j, k, p] * (V(i, j, k) + shift[i, j, k] + X[q, i, j, k, p]) == (V(j, i, k) + shift[j, i, k]) * X[q, i, j, k, p]
+                         for i, j, k in self.__edges for p in range(self.__P))
+            for i, j, k in self.__edges:
+                shift[i, j, k] += X.sum(q, i, j, k, '*') - F.sum(q, j, i, k, '*')
+
+    # per order: nothing flows into o or out of d, o sells T0, mid currencies conserve flow
+    @Traced('flow')
+    def __SetFlowConstraint(self) -> None:
+        m, X, F = self.__m, self.__X, self.__F
+        for q, (o, d, T0, _) in enumerate(self.__orders):
+            m.addConstr(X.sum(q, '*', o, '*', '*') == 0)
+            m.addConstr(X.sum(q, o, '*', '*', '*') == T0)
+            m.addConstr(X.sum(q, d, '*', '*', '*') == 0)
+            m.addConstrs(F.sum(q, '*', j, '*', '*') == X.sum(q, j, '*', '*', '*') for j in self.__curr if j not in (o, d))
+
+    # gas fee of each order consists of two parts
+    @Traced('gas')
+    def __SetGasConstraint(self) -> None:
+        for q, (_, d, _, _) in enumerate(self.__orders):
+            rates = self.__EM.GetRatesTo(d)
+            self.__m.addConstr(self.__G[q] == self.__G1 * self.__Y.sum(q, '*', '*', '*', '*') +
+                               self.__G2 * gp.quicksum(rates[i] * self.__X.sum(q, i, '*', '*', '*') for i in self.__curr))
+
+    # linear big-M expression of binary variable Y
+    @Traced('Y')
+    def __SetYConstraint(self) -> None:
+        X, Y, M = self.__X, self.__Y, self.__M
+        self.__m.addConstrs(Y[key] <= M * X[key] for key in X)
+        self.__m.addConstrs(X[q, i, j, k, p] <= self.__flowBounds[q][i] * Y[q, i, j, k, p] for q, i, j, k, p in X)
+
+    # eliminate cycles of every order
+    @Traced('cycle elimination')
+    def __SetCycleEliminationConstraint(self) -> None:
+        X, Z, U, N = self.__X, self.__Z, self.__U, len(self.__curr)
+        self.__m.addConstrs(U[q, i] - U[q, j] + Z[q, i, j] * N <= N - 1 for q, i, j in Z)
+        self.__m.addConstrs(X.sum(q, i, j, '*', '*') <= self.__flowBounds[q][i] * Z[q, i, j] for q, i, j in Z)
+
+    # set objective function: weighted net output of all orders
+    @Traced('objective')
+    def __SetObjective(self) -> None:
+        obj = gp.quicksum(weight * (self.__F.sum(q, '*', d, '*', '*') - self.__G[q]) for q, (_, d, _, weight) in enumerate(self.__orders))
+        self.__m.setObjective(obj, sense=GRB.MAXIMIZE)
+
+    # update all constraints to model
+    @Traced('update')
+    def Update(self) -> None:
+        if not self.__orders:
+            raise Exception("No order to route.")
+
+        timeStart = time.time()
+        exchanges, currencies1, currencies2, self.__stocks1, _ = self.__EM.GetPoolArrays()
+        self.__curr1 = currencies1.tolist()
+        self.__edges = list(zip(self.__curr1, currencies2.tolist(), exchanges.tolist()))  # directed pools (i, j, k)
+        self.__curr = sorted(set(self.__curr1))
+        self.__DeriveBigM()
+        self.__DeclareDecisionVariables()
+        self.__SetObjective()
+        self.__SetFractionConstraint()
+        self.__SetFlowConstraint()
+        self.__SetGasConstraint()
+        self.__SetYConstraint()
+        self.__SetCycleEliminationConstraint()
+        self.__timeSetup = time.time() - timeStart
+
+    # start solving optimization
+    @Traced('optimize')
+    def Optimize(self) -> None:
+        timeStart = time.time()
+        self.__m.optimize()
+        self.__timeOptimization = time.time() - timeStart
+
+    # a feasible solution exists, e.g. after time limit was reached
+    def HasSolution(self) -> bool:
+        return self.__m.SolCount > 0
+
+    # get traded pools of every order in the order they were added, objective of a route is its net output
+    @Traced('route')
+    def GetRoutes(self) -> list:
+        if not self.HasSolution():
+            raise Exception("No feasible solution found.")
+
+        rates = [self.__EM.GetRatesTo(d) for _, d, _, _ in self.__orders]
+        keys = list(self.__X.keys())
+        valuesX, valuesF, valuesY = (self.__m.getAttr('X', [variables[key] for key in keys]) for variables in (self.__X, self.__F, self.__Y))
+        fees = self.__m.getAttr('X', self.__G)
+
+        routes = []
+        for o, d, T0, _ in self.__orders:
+            routes.append(Route(o, d, T0))
+        for (q, i, j, k, p), x, f, y in zip(keys, valuesX, valuesF, valuesY):
+            if x == 0: continue
+            routes[q].AddHop(i, j, k, x, f, self.__G1 * round(y) + self.__G2 * rates[q][i] * x, p)
+        for q, route in enumerate(routes):
+            route.SetObjective(route.GetAmountOut() - fees[q])
+        return routes
+
+    def GetObjective(self) -> float:
+        return self.__m.objVal
+
+    def GetOptTime(self) -> float:
+        return self.__timeOptimization
+
+    def GetSetupTime(self) -> float:
+        return self.__timeSetup
+
+    def GetStatus(self) -> int:
+        return self.__m.status
+
+    def GetMIPGap(self) -> float:
+        return self.__m.MIPGap
+
+    def GetNumVars(self) -> int:
+        return self.__m.NumVars
+
+    # linear and quadratic constraints
+    def GetNumConstrs(self) -> int:
+        return self.__m.NumConstrs + self.__m.NumQConstrs
@@ -1,10 +1,19 @@
+import os
+import sys
+import hashlib
+import numpy as np
 import pandas as pd
 from os.path import abspath
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Presolve
+from Profiler import Profiled, Traced, OptionalSpan
 
-class ExchangeManager:
+
+class ExchangeManager(Profiled):
 
     def __init__(self) -> None:
+        super().__init__()
         self.__initCurrency = None  # o
         self.__termCurrency = None  # d
         self.__initQuantity = None  # T0
@@ -12,12 +21,10 @@ class ExchangeManager:
         self.__currencies = set()
         self.__midCurrencies = set()
         self.__dataFrame = None
-        self.__R = {('ETH',   'UNI'): 118.8405,
-                    ('ETH',  'USDC'): 2189,
-                    ('ETH',  'USDT'): 2191,
-                    ('USDT', 'USDC'): 0.9975,
-                    ('UNI',  'USDT'): 17.58,
-                    ('UNI',  'USDC'): 17.54}
+        self.__V = {}  # (exchange, currency1, currency2) -> stock of currency1 in the pool
+        self.__snapshotHash = None  # digest of the pools, changes whenever reserves change
+        self.__R = np.zeros((0, 0))  # R[i, j]: reference rate, units of currency j per unit of currency i, nan if unconnected
+        self.__indR = {}  # currency -> row and column of R
 
     def GetO(self) -> str:
         return self.__initCurrency
@@ -40,13 +47,94 @@ class ExchangeManager:
     def GetData(self) -> pd.DataFrame:
         return self.__dataFrame
 
+    @Traced('load')
     def ImportData(self, pathData) -> None:
         pathData = abspath(pathData)
         self.__dataFrame = pd.read_csv(pathData)
         print('Import data: success.')
 
+        with OptionalSpan(self.GetProfiler(), 'index'):
+            self.__Index()
+
+    # derive exchanges, currencies and pools from data frame
+    def __Index(self, updateRates: bool = True) -> None:
         self.__exchanges = set(self.__dataFrame.loc[:, "Exchange"])
         self.__currencies = set.union(set(self.__dataFrame.loc[:, "Currency1"]), set(self.__dataFrame.loc[:, "Currency2"]))
+        self.__IndexPools()
+        if updateRates:
+            with OptionalSpan(self.GetProfiler(), 'rates'):
+                self.__UpdateRates()
+        if self.__initCurrency is not None and self.__termCurrency is not None: self.__UpdateMidCurrencies()
+
+    # hash every pool in both directions once, a row listing (currency1, currency2) wins over a reversed row
+    def __IndexPools(self) -> None:
+        df = self.__dataFrame
+        self.__V = {}
+        self.__V.update(zip(zip(df.Exchange, df.Currency2, df.Currency1), df.Stock2.astype(float)))
+        self.__V.update(zip(zip(df.Exchange, df.Currency1, df.Currency2), df.Stock1.astype(float)))
+        self.__UpdateSnapshotHash()
+
+    def __UpdateSnapshotHash(self) -> None:
+        self.__snapshotHash = hashlib.sha1(repr(sorted(self.__V.items())).encode()).hexdigest()
+
+    # reference rates from imported reserves: a traded pair gets its mid price weighted by liquidity, i.e. summed reserves of all its pools,
+    # other pairs multiply mid prices along the path of fewest hops, ties go to the path whose thinnest pair holds the largest share of its currencies' liquidity
+    def __UpdateRates(self) -> None:
+        exchanges, currencies1, currencies2, stocks1, stocks2 = self.GetPoolArrays()
+        currencies = sorted(self.__currencies)
+        N = len(currencies)
+        self.__indR = {currency: n for n, currency in enumerate(currencies)}
+        ind1 = np.array([self.__indR[i] for i in currencies1.tolist()], dtype=int)
+        ind2 = np.array([self.__indR[j] for j in currencies2.tolist()], dtype=int)
+
+        pooled1, pooled2 = np.zeros((N, N)), np.zeros((N, N))
+        np.add.at(pooled1, (ind1, ind2), stocks1)
+        np.add.at(pooled2, (ind1, ind2), stocks2)
+        totals = np.maximum(np.bincount(ind1, weights=stocks1, minlength=N), 1e-300)
+        direct = (pooled1 > 0) & (pooled2 > 0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            logRates = np.where(direct, np.log(pooled2) - np.log(pooled1), 0.0)
+        hops = np.where(direct, 1.0, np.inf)
+        widths = np.where(direct, np.minimum(pooled1 / totals[:, None], pooled2 / totals[None, :]), 0.0)
+        np.fill_diagonal(hops, 0.0)
+        np.fill_diagonal(widths, np.inf)
+        np.fill_diagonal(logRates, 0.0)
+
+        for n in range(N):  # Floyd-Warshall on (hops, -width), direct pairs are never replaced
+            viaHops = hops[:, n, None] + hops[None, n, :]
+            viaWidths = np.minimum(widths[:, n, None], widths[None, n, :])
+            better = (viaHops < hops) | ((viaHops == hops) & (viaWidths > widths))
+            hops = np.where(better, viaHops, hops)
+            widths = np.where(better, viaWidths, widths)
+            logRates = np.where(better, logRates[:, n, None] + logRates[None, n, :], logRates)
+
+        self.__R = np.where(np.isfinite(hops), np.exp(logRates), np.nan)
+
+    # identify the current market state, e.g. to key cached quotes
+    def GetSnapshotHash(self) -> str:
+        return self.__snapshotHash
+
+    # overwrite reserves of pools in place, patches: (exchange, currency1, currency2, stock1, stock2)
+    # unknown pools are added, return directed pools whose reserves changed; GetData still shows imported data,
+    # reference rates are derived again from the patched reserves
+    @Traced('patch')
+    def ApplyPatches(self, patches) -> list:
+        pools = []
+        for exchange, currency1, currency2, stock1, stock2 in patches:
+            stock1, stock2 = float(stock1), float(stock2)
+            if self.__V.get((exchange, currency1, currency2)) == stock1 and self.__V.get((exchange, currency2, currency1)) == stock2: continue
+            self.__V[exchange, currency1, currency2] = stock1
+            self.__V[exchange, currency2, currency1] = stock2
+            self.__exchanges.add(exchange)
+            self.__currencies.update((currency1, currency2))
+            pools.extend(((exchange, currency1, currency2), (exchange, currency2, currency1)))
+
+        if not pools: return pools
+        self.__UpdateRates()
+        if self.__initCurrency is not None and self.__termCurrency is not None: self.__UpdateMidCurrencies()
+        self.__UpdateSnapshotHash()
+        return pools
 
     def SetInitCurrency(self, initCurrency: str) -> None:
         self.__initCurrency = initCurrency
@@ -60,23 +148,87 @@ class ExchangeManager:
         self.__initQuantity = initCurrencyQuantity
         
     def GetV(self, currency1: str, currency2: str, exchange: str) -> float:
-        queryCondition1 = 'Exchange=="{}" & Currency1=="{}" & Currency2=="{}"'.format(exchange, currency1, currency2)
-        queryCondition2 = 'Exchange=="{}" & Currency2=="{}" & Currency1=="{}"'.format(exchange, currency1, currency2)
-        
-        query1 = self.__dataFrame.query(queryCondition1)
-        query2 = self.__dataFrame.query(queryCondition2)
-
-        if not query1.empty: return query1.Stock1.item()
-        if not query2.empty: return query2.Stock2.item()
-        
-        return -1  # if no pair exists
+        return self.__V.get((exchange, currency1, currency2), -1)  # -1 if no pair exists
+
+    # get all directed pools as arrays: exchange, currency1, currency2, stock of currency1, stock of currency2
+    def GetPoolArrays(self) -> tuple:
+        keys = list(self.__V)
+        exchanges = np.array([k for k, _, _ in keys])
+        currencies1 = np.array([i for _, i, _ in keys])
+        currencies2 = np.array([j for _, _, j in keys])
+        stocks1 = np.array([self.__V[key] for key in keys], dtype=float)
+        stocks2 = np.array([self.__V[k, j, i] for k, i, j in keys], dtype=float)
+        return exchanges, currencies1, currencies2, stocks1, stocks2
+
+    # upper bound on total quantity of each currency sold by any route, each division trades on the full pool,
+    # ModelSolver (13) caps what a mid currency sells at its pooled stock
+    @Traced('flow bounds')
+    def GetFlowBounds(self, numDivision: int = 1) -> dict:
+        exchanges, currencies1, currencies2, stocks1, stocks2 = self.GetPoolArrays()
+        currencies = sorted(self.__currencies)
+        indCurrency = {currency: n for n, currency in enumerate(currencies)}
+        ind1 = np.array([indCurrency[i] for i in currencies1.tolist()], dtype=int)
+        ind2 = np.array([indCurrency[j] for j in currencies2.tolist()], dtype=int)
+        o, d = indCurrency[self.__initCurrency], indCurrency[self.__termCurrency]
+
+        pooled = np.bincount(ind1, weights=stocks1, minlength=len(currencies))
+        bounds = Presolve.GetFlowBounds(ind1, ind2, stocks1, stocks2, o, d, self.__initQuantity, len(currencies), pooled, numDivision)
+        return dict(zip(currencies, bounds.tolist()))
+
+    # current pools between given currencies as rows of a pool file, one row per pool, patched reserves included
+    def __GetPoolFrame(self, currencies: set) -> pd.DataFrame:
+        rows, listed = [], set()
+        for (k, i, j), stock in self.__V.items():
+            if (k, j, i) in listed or i not in currencies or j not in currencies: continue
+            listed.add((k, i, j))
+            rows.append((k, i, j, stock, self.__V[k, j, i]))
+        return pd.DataFrame(rows, columns=['Exchange', 'Currency1', 'Currency2', 'Stock1', 'Stock2'])
+
+    # copy reduced to current pools between currencies Presolve.GetRouteCurrencies keeps (pools trade both ways), e.g. to shrink ModelSolver,
+    # dropDominated also drops pools dominated by a parallel pool at the flow bounds of numDivision divisions in both directions,
+    # which leaves the optimum unchanged: d never sells and o is never bought
+    @Traced('prune')
+    def GetPrunedManager(self, dropDominated: bool = False, numDivision: int = 1) -> 'ExchangeManager':
+        routeCurrencies = Presolve.GetRouteCurrencies(((i, j) for _, i, j in self.__V), self.__initCurrency, self.__termCurrency)
+        if self.__initCurrency not in routeCurrencies or self.__termCurrency not in routeCurrencies:
+            raise Exception("No route from {} to {} found.".format(self.__initCurrency, self.__termCurrency))
+
+        pruned = ExchangeManager()
+        pruned.__initCurrency, pruned.__termCurrency, pruned.__initQuantity = self.__initCurrency, self.__termCurrency, self.__initQuantity
+        pruned.__R, pruned.__indR = self.__R, self.__indR  # fees keep the rates of the full market
+        pruned.SetProfiler(self.GetProfiler())
+        pruned.__dataFrame = self.__GetPoolFrame(routeCurrencies)
+        pruned.__Index(updateRates=False)
+
+        if dropDominated:
+            bounds, pairs = pruned.GetFlowBounds(numDivision), {}
+            exchanges, currencies1, currencies2, stocks1, stocks2 = pruned.GetPoolArrays()
+            indPair = np.array([pairs.setdefault(pair, len(pairs)) for pair in zip(currencies1.tolist(), currencies2.tolist())], dtype=int)
+            supply = np.array([bounds[i] for i in currencies1.tolist()])
+            dominated = Presolve.GetDominatedEdges(indPair, np.arange(len(supply)), stocks1, stocks2, supply)
+            dominated |= (currencies1 == self.__termCurrency) | (currencies2 == self.__initCurrency)
+            isKept = dict(zip(zip(exchanges.tolist(), currencies1.tolist(), currencies2.tolist()), (~dominated).tolist()))
+            rows = [isKept[k, i, j] or isKept[k, j, i] for k, i, j in zip(pruned.__dataFrame.Exchange, pruned.__dataFrame.Currency1, pruned.__dataFrame.Currency2)]
+            pruned.__dataFrame = pruned.__dataFrame[rows].reset_index(drop=True)
+            pruned.__Index(updateRates=False)
+
+        return pruned
 
     def __UpdateMidCurrencies(self) -> None:
         self.__midCurrencies = set(currency for currency in self.__currencies if currency not in (self.GetO(), self.GetD()))
 
+    # units of currency2 per unit of currency1
     def GetR(self, currency1: str, currency2: str) -> float:
         if currency1 == currency2: return 1.0
-        if (currency1, currency2) in self.__R: return self.__R[(currency1, currency2)]
-        if (currency2, currency1) in self.__R: return 1 / self.__R[(currency2, currency1)]
+        if currency1 in self.__indR and currency2 in self.__indR:
+            rate = self.__R[self.__indR[currency1], self.__indR[currency2]]
+            if not np.isnan(rate): return float(rate)
 
         raise Exception("No public rate between {} and {} found.".format(currency1, currency2))
+
+    # rates of all currencies into one currency, e.g. to convert gas fees into d;
+    # 0.0 for a currency without path into it, none of its flow can end there
+    def GetRatesTo(self, currency: str) -> dict:
+        if currency not in self.__indR: raise Exception("No public rate into {} found.".format(currency))
+        column = np.nan_to_num(self.__R[:, self.__indR[currency]], nan=0.0)
+        return dict(zip(self.__indR, column.tolist()))
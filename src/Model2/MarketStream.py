@@ -0,0 +1,58 @@
+import csv
+from ExchangeManager import ExchangeManager
+
+
+# parse reserve patches from a csv path or an open file/pipe, rows: exchange, currency1, currency2, stock1, stock2
+# a header row as in pool files is skipped, rows are yielded as soon as they are read
+def ReadPatches(source):
+    patchFile = open(source, 'r', newline='') if isinstance(source, str) else source
+    try:
+        for row in csv.reader(patchFile):
+            if not row or row[0] == 'Exchange': continue
+            exchange, currency1, currency2, stock1, stock2 = row
+            yield exchange, currency1, currency2, float(stock1), float(stock2)
+    finally:
+        if isinstance(source, str): patchFile.close()
+
+
+class MarketStream:
+
+    def __init__(self, exchangeManager: ExchangeManager) -> None:
+        self.__EM = exchangeManager
+        self.__solvers = []
+        self.__batchSize = 1
+        self.__reoptimize = False
+        self.__numPatches = 0
+
+    # live ModelSolver whose coefficients follow the patches, a HeuristicRouter loaded from the market has to load it again
+    def AddSolver(self, solver) -> None:
+        self.__solvers.append(solver)
+
+    # patches applied together, solvers are updated once per batch
+    def SetBatchSize(self, batchSize: int) -> None:
+        if batchSize < 1: raise Exception("Batch size must be at least 1")
+        self.__batchSize = batchSize
+
+    # re-optimize every solver after each batch
+    def SetReoptimize(self, reoptimize: bool) -> None:
+        self.__reoptimize = reoptimize
+
+    def __ApplyBatch(self, batch: list) -> list:
+        pools = self.__EM.ApplyPatches(batch)
+        self.__numPatches += len(batch)
+        if pools:
+            for solver in self.__solvers: solver.UpdatePools(pools, self.__reoptimize)
+        return pools
+
+    # apply patches from any iterable, e.g. ReadPatches, yield directed pools changed by each batch
+    def Ingest(self, patches):
+        batch = []
+        for patch in patches:
+            batch.append(patch)
+            if len(batch) < self.__batchSize: continue
+            yield self.__ApplyBatch(batch)
+            batch = []
+        if batch: yield self.__ApplyBatch(batch)
+
+    def GetNumPatches(self) -> int:
+        return self.__numPatches
@@ -1,17 +1,29 @@
+import os
+import sys
 import time
+import numpy as np
 import gurobipy as gp
 from gurobipy import GRB
 from ExchangeManager import ExchangeManager
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Route import Route
+from Profiler import Profiled, Traced, OptionalCount
+from SolverCallback import AddLazyCycleCuts, IncumbentCallback
+from PiecewiseLinear import GetTangents, GetRefinementTangents, PropagateFlows
 
-class ModelSolver:
+
+class ModelSolver(Profiled):
 
     def __init__(self, exchangeManager: ExchangeManager, verbose=True) -> None:
+        super().__init__(exchangeManager.GetProfiler())
         self.__EM = exchangeManager
         self.__m = gp.Model("Model Solver")
         self.__m.Params.NonConvex = 2
         self.__m.Params.OutputFlag = verbose
-        self.__M = 1e4
+        self.__M = 1e4  # a used pool trades at least 1/M, also every big-M if bounds are not derived
+        self.__tightBigM = False  # derive big-M of (9), (10) and (12) and upper bounds of X from T0 and pool stocks
+        self.__flowBounds = None
         self.__P = 1
         self.__verbose = verbose
         self.__G1 = 43
@@ -19,6 +31,13 @@ class ModelSolver:
         self.__alpha = 1
         self.__beta = 1
         self.__timeOptimization = None
+        self.__incumbentCallback = None
+        self.__objIncumbent = None
+        self.__callback = IncumbentCallback(self.__OnIncumbent)
+        self.__lazyCycleElimination = False  # cut cycles of incumbents in callback instead of (10) (11)
+        self.__numBreakpoints = 0  # tangents bounding each pool output from above, 0: exact bilinear (5)
+        self.__numRefinements = 0
+        self.__refinementTolerance = 1e-6  # relative overestimate of a pool output that gets another tangent
 
     def SetG1(self, G1: float) -> None:
         self.__G1 = G1
@@ -32,22 +51,65 @@ class ModelSolver:
     def SetBigM(self, M: float) -> None:
         self.__M = M
 
+    # opt-in: at default numerics gurobi's spatial branching cut off the optimum of UNI -> USDT at T0 = 10000 on derived bounds,
+    # careful numerics keep the optimum of the loose model but cost time at large T0
+    def SetTightBigM(self, tightBigM: bool) -> None:
+        self.__tightBigM = tightBigM
+        self.__m.Params.NumericFocus = 2 if tightBigM else 0
+
     def SetMIPGap(self, MIPGap: float) -> None:
         self.__m.Params.MIPGap = MIPGap
 
+    def SetThreads(self, numThreads: int) -> None:
+        self.__m.Params.Threads = numThreads
+
+    def SetTimeLimit(self, timeLimit: float) -> None:
+        self.__m.Params.TimeLimit = timeLimit
+
+    # callback(route, gap, runtime) receives every improving incumbent, e.g. to serve the best route within a time limit
+    def SetIncumbentCallback(self, incumbentCallback) -> None:
+        self.__incumbentCallback = incumbentCallback
+
+    # omit MTZ order U with (10) (11), forbid cycles of used pairs by lazy cuts only when an incumbent contains one
+    def SetLazyCycleElimination(self, lazyCycleElimination: bool) -> None:
+        self.__lazyCycleElimination = lazyCycleElimination
+        self.__m.Params.LazyConstraints = int(lazyCycleElimination)
+
+    # replace bilinear (5) by tangents of the concave pool output at numBreakpoints inputs, which gives a MILP;
+    # each refinement adds tangents at the inputs of the last solution and solves again, routes are re-evaluated with exact outputs
+    def SetPiecewiseLinear(self, numBreakpoints: int, numRefinements: int = 0) -> None:
+        self.__numBreakpoints = numBreakpoints
+        self.__numRefinements = numRefinements
+
+    # flow bound of each sold currency bounds (9) and (12), MTZ (10) needs the number of currencies only
+    @Traced('big-M')
+    def __DeriveBigM(self) -> None:
+        if self.__tightBigM:
+            self.__flowBounds = self.__EM.GetFlowBounds(self.__P)
+            self.__MTZ = len(self.__EM.GetCurr())
+        else:
+            self.__flowBounds = dict.fromkeys(self.__EM.GetCurr(), self.__M)
+            self.__MTZ = self.__M
+
+    # report big-M values chosen by last update: flow bound of each currency and MTZ big-M
+    def GetBigM(self) -> dict:
+        return {'flow': self.__flowBounds, 'MTZ': self.__MTZ}
+
+    @Traced('variables')
     def __DeclareDecisionVariables(self) -> None:
         self.__G = self.__m.addVar(vtype=GRB.CONTINUOUS, lb=0, name="G")
         self.__X, self.__Y, self.__F, self.__U, self.__Z = {}, {}, {}, {}, {}
         self.__G1Fee = self.__m.addVar(vtype=GRB.CONTINUOUS, lb=0, name="G1Fee")
         self.__G2Fee = self.__m.addVar(vtype=GRB.CONTINUOUS, lb=0, name="G2Fee")
+        self.__modelCurr, self.__modelExch = set(self.__EM.GetCurr()), set(self.__EM.GetExch())  # patches may extend the market later
         
         for i in self.__EM.GetCurr():
-            self.__U[i] = self.__m.addVar(vtype=GRB.CONTINUOUS, lb=0, name="U({})".format(i))
+            if not self.__lazyCycleElimination: self.__U[i] = self.__m.addVar(vtype=GRB.CONTINUOUS, lb=0, ub=self.__MTZ - 1 if self.__tightBigM else GRB.INFINITY, name="U({})".format(i))
             for j in self.__EM.GetCurr():
                 self.__Z[i, j] = self.__m.addVar(vtype=GRB.BINARY, name="Z({},{})".format(i, j))
                 for k in self.__EM.GetExch():
                     for p in range(self.__P):
-                        self.__X[i, j, k, p] = self.__m.addVar(vtype=GRB.CONTINUOUS, lb=0, name="X({},{},{},Div{})".format(i, j, k, p))
+                        self.__X[i, j, k, p] = self.__m.addVar(vtype=GRB.CONTINUOUS, lb=0, ub=self.__flowBounds[i] if self.__tightBigM else GRB.INFINITY, name="X({},{},{},Div{})".format(i, j, k, p))
                         self.__F[i, j, k, p] = self.__m.addVar(vtype=GRB.CONTINUOUS, lb=0, name="F({},{},{},Div{})".format(i, j, k, p))  # value of fraction
                         self.__Y[i, j, k, p] = self.__m.addVar(vtype=GRB.BINARY,           name="Y({},{},{},Div{})".format(i, j, k, p))
 
@@ -63,16 +125,30 @@ class ModelSolver:
     def __GetOtherAlias(self) -> tuple:
         return self.__EM, self.__EM.GetV, self.__EM.GetR, self.__EM.GetCurr(), self.__EM.GetExch(), range(self.__P), self.__EM.GetMidCurr()
 
+    # (5) of one pool and division, a list of tangent constraints in piecewise linear mode
+    def __AddFractionConstraint(self, i: str, j: str, k: str, p: int):
+        m, X, F, V = self.__m, self.__X[i, j, k, p], self.__F[i, j, k, p], self.__EM.GetV
+        if self.__numBreakpoints == 0:
+            return m.addConstr(F * (V(i, j, k) + X) == V(j, i, k) * X)
+        slopes, intercepts = GetTangents(V(i, j, k), V(j, i, k), self.__flowBounds[i], self.__numBreakpoints)
+        return [m.addConstr(F <= slope * X + intercept) for slope, intercept in zip(slopes.tolist(), intercepts.tolist())]
+
     # replace value of fraction with F
+    @Traced('fraction')
     def __SetFractionConstraint(self) -> None:
         m, X, Y, F, U, Z, G = self.__GetDecisionVariableAlias()
         EM, V, R, curr, exch, div, midCurr = self.__GetOtherAlias()
-        m.addConstrs(F[i, j, k, p] * (V(i, j, k) + X[i, j, k, p]) == V(j, i, k) * X[i, j, k, p] for i in curr for j in curr for k in exch for p in div if V(i, j, k) != -1)
-        m.addConstrs(F[i, j, k, p] == 0 for i in curr for j in curr for k in exch for p in div if V(i, j, k) == -1)
+        if self.__numBreakpoints == 0:
+            self.__fractionConstrs = dict(m.addConstrs(F[i, j, k, p] * (V(i, j, k) + X[i, j, k, p]) == V(j, i, k) * X[i, j, k, p] for i in curr for j in curr for k in exch for p in div if V(i, j, k) != -1))
+        else:
+            self.__fractionConstrs = {(i, j, k, p): self.__AddFractionConstraint(i, j, k, p) for i in curr for j in curr for k in exch for p in div if V(i, j, k) != -1}
+        self.__fractionConstrs.update(m.addConstrs(F[i, j, k, p] == 0 for i in curr for j in curr for k in exch for p in div if V(i, j, k) == -1))
 
     # update all constraints to model
+    @Traced('update')
     def Update(self) -> None:
         timeStart = time.time()
+        self.__DeriveBigM()
         self.__DeclareDecisionVariables()
         self.__SetObjective()
         self.__SetFractionConstraint()
@@ -87,6 +163,7 @@ class ModelSolver:
         self.__timeSetup = time.time() - timeStart
 
     # set objective function (1)
+    @Traced('objective')
     def __SetObjective(self) -> None:
         o, d, a, b, M = self.__GetConstantAlias()
         m, X, Y, F, U, Z, G = self.__GetDecisionVariableAlias()
@@ -96,6 +173,7 @@ class ModelSolver:
         m.setObjective(obj, sense=GRB.MAXIMIZE)
 
     # flow into initial currency shoule be 0 (2) 
+    @Traced('init flow')
     def __SetInitFlowConstraint(self) -> None:
         o, d, a, b, M = self.__GetConstantAlias()
         m, X, Y, F, U, Z, G = self.__GetDecisionVariableAlias()
@@ -105,6 +183,7 @@ class ModelSolver:
         m.addConstr(initInFlow == 0)
 
     # flow out of terminal currency should be 0 (3)
+    @Traced('term flow')
     def __SetTermFlowConstraint(self) -> None:
         o, d, a, b, M = self.__GetConstantAlias()
         m, X, Y, F, U, Z, G = self.__GetDecisionVariableAlias()
@@ -114,15 +193,17 @@ class ModelSolver:
         m.addConstr(termOutFlow == 0)
 
     # flow out of initial currency should be same as quantity of initial currency (4)
+    @Traced('init quantity')
     def __SetInitQuantityConstraint(self) -> None:
         o, d, a, b, M = self.__GetConstantAlias()
         m, X, Y, F, U, Z, G = self.__GetDecisionVariableAlias()
         EM, V, R, curr, exch, div, midCurr = self.__GetOtherAlias()
         
         initOutFlow = gp.quicksum(X[o, j, k, p] for j in curr for k in exch for p in div)
-        m.addConstr(initOutFlow == EM.GetT0())
+        self.__initQuantityConstr = m.addConstr(initOutFlow == EM.GetT0())
 
     # flow into a currency must be the same as flow out of it (5) (6)
+    @Traced('conservation')
     def __SetConservationConstraint(self) -> None:
         m, X, Y, F, U, Z, G = self.__GetDecisionVariableAlias()
         EM, V, R, curr, exch, div, midCurr = self.__GetOtherAlias()
@@ -131,86 +212,236 @@ class ModelSolver:
         m.addConstrs(gp.quicksum(X[j, j, k, p] for k in exch for p in div) == 0 for j in curr)
     
     # gas fee constraints consist of two parts (7)
+    @Traced('gas')
     def __SetGasConstraint(self) -> None:
         o, d, a, b, M = self.__GetConstantAlias()
         m, X, Y, F, U, Z, G = self.__GetDecisionVariableAlias()
         EM, V, R, curr, exch, div, midCurr = self.__GetOtherAlias()
         G1, G1Fee = self.__G1, self.__G1Fee
         G2, G2Fee = self.__G2, self.__G2Fee
+        rates = EM.GetRatesTo(d)
 
         m.addConstr(G == G1Fee + G2Fee)
-        m.addConstr(G1Fee == G1 * gp.quicksum(Y[i, j, k, p] for i in curr for j in curr for k in exch for p in div))
-        m.addConstr(G2Fee == G2 * gp.quicksum(R(i, d) * X[i, j, k, p] for i in curr for j in curr for k in exch for p in div))
+        self.__G1Constr = m.addConstr(G1Fee == G1 * gp.quicksum(Y[i, j, k, p] for i in curr for j in curr for k in exch for p in div))
+        self.__G2Constr = m.addConstr(G2Fee == G2 * gp.quicksum(rates[i] * X[i, j, k, p] for i in curr for j in curr for k in exch for p in div))
 
     # linear big-M expression of binary variable Y (8) (9)
+    @Traced('Y')
     def __SetYConstraint(self) -> None:
         o, d, a, b, M = self.__GetConstantAlias()
         m, X, Y, F, U, Z, G = self.__GetDecisionVariableAlias()
         EM, V, R, curr, exch, div, midCurr = self.__GetOtherAlias()
 
         m.addConstrs(Y[i, j, k, p] <= M * X[i, j, k, p] for i in curr for j in curr for k in exch for p in div)
-        m.addConstrs(X[i, j, k, p] <= M * Y[i, j, k, p] for i in curr for j in curr for k in exch for p in div)
+        B = self.__flowBounds
+        self.__XYConstrs = m.addConstrs(X[i, j, k, p] <= B[i] * Y[i, j, k, p] for i in curr for j in curr for k in exch for p in div)
 
    # eliminate cycles inside currency-exchange graph (10) (11) (12)
+    @Traced('cycle elimination')
     def __SetCycleEliminationConstraint(self) -> None:
         o, d, a, b, M = self.__GetConstantAlias()
         m, X, Y, F, U, Z, G = self.__GetDecisionVariableAlias()
         EM, V, R, curr, exch, div, midCurr = self.__GetOtherAlias()
 
-        m.addConstrs(U[i] - U[j] + Z[i, j] * M <= M - 1 for i in curr for j in curr)
+        B, MTZ = self.__flowBounds, self.__MTZ
+        self.__XZConstrs = m.addConstrs(gp.quicksum(X[i, j, k, p] for k in exch for p in div) <= Z[i, j] * B[i] for i in curr for j in curr)
+        if self.__lazyCycleElimination: return  # (12) keeps Z on for used pairs, cycles are cut in callback
+        m.addConstrs(U[i] - U[j] + Z[i, j] * MTZ <= MTZ - 1 for i in curr for j in curr)
         m.addConstrs(Z[i, j] <= gp.quicksum(X[i, j, k, p] * M for k in exch for p in div) for i in curr for j in curr)
-        m.addConstrs(gp.quicksum(X[i, j, k, p] for k in exch for p in div) <= Z[i, j] * M for i in curr for j in curr)
 
     # add upper bound constraint to improve solving time (13)
+    @Traced('upper bound')
     def __AddUpperBound(self) -> None:
         o, d, a, b, M = self.__GetConstantAlias()
         m, X, Y, F, U, Z, G = self.__GetDecisionVariableAlias()
         EM, V, R, curr, exch, div, midCurr = self.__GetOtherAlias()
 
-        m.addConstrs(gp.quicksum(X[i, j, k, p] for j in curr for k in exch for p in div) <= gp.quicksum(V(i, j, k) for j in curr for k in exch) for i in midCurr)
+        self.__upperBoundConstrs = m.addConstrs(gp.quicksum(X[i, j, k, p] for j in curr for k in exch for p in div) <= gp.quicksum(V(i, j, k) for j in curr for k in exch) for i in midCurr)
 
     # start solving optimization
+    @Traced('optimize')
     def Optimize(self) -> None:
+        self.__objIncumbent = None
         timeStart = time.time()
-        self.__m.optimize()
+        callback = self.__callback if self.__incumbentCallback is not None or self.__lazyCycleElimination else None
+        self.__m.optimize(callback)
+        self.__callback.RaiseError()
+        for _ in range(self.__numRefinements if self.__numBreakpoints > 0 else 0):
+            if not self.HasSolution() or not self.__Refine(): break
+            self.__m.optimize(callback)
+            self.__callback.RaiseError()
         self.__timeOptimization = time.time() - timeStart
 
+    # add tangents at inputs of the current solution where F overestimates the pool output, return whether any was added
+    @Traced('refine')
+    def __Refine(self) -> bool:
+        keys = list(self.__X.keys())
+        valuesX, valuesF = (np.array(self.__m.getAttr('X', [variables[key] for key in keys])) for variables in (self.__X, self.__F))
+        refine, slopes, intercepts = GetRefinementTangents(*self.__GetPoolStocks(keys), valuesX, valuesF, self.__refinementTolerance)
+        for n, slope, intercept in zip(refine.tolist(), slopes.tolist(), intercepts.tolist()):
+            self.__fractionConstrs[keys[n]].append(self.__m.addConstr(self.__F[keys[n]] <= slope * self.__X[keys[n]] + intercept))
+        OptionalCount(self.GetProfiler(), 'tangent cuts', len(refine))
+        return len(refine) > 0
+
+    # cut cyclic incumbents, pass improving incumbents to incumbent callback
+    @Traced('incumbent')
+    def __OnIncumbent(self, model: gp.Model) -> None:
+        if self.__lazyCycleElimination and AddLazyCycleCuts(model, self.__Y, self.__Z, self.GetProfiler()): return
+        if self.__incumbentCallback is None: return
+        obj = model.cbGet(GRB.Callback.MIPSOL_OBJ)
+        if self.__objIncumbent is not None and obj <= self.__objIncumbent: return
+        self.__objIncumbent = obj
+
+        bound = model.cbGet(GRB.Callback.MIPSOL_OBJBND)
+        gap = abs(bound - obj) / abs(obj) if obj != 0 else float('inf')
+        keys = list(self.__X.keys())
+        values = (model.cbGetSolution([variables[key] for key in keys]) for variables in (self.__X, self.__F, self.__Y))
+        self.__incumbentCallback(self.__BuildRoute(keys, *values, obj), gap, model.cbGet(GRB.Callback.RUNTIME))
+
+    # flow bounds follow T0 and pool stocks, change upper bounds of X and their coefficients in (9) and (12) in place
+    @Traced('big-M')
+    def __RefreshBigM(self) -> None:
+        if not self.__tightBigM: return
+        self.__flowBounds = {i: bound for i, bound in self.__EM.GetFlowBounds(self.__P).items() if i in self.__modelCurr}
+        keys = list(self.__X.keys())
+        self.__m.setAttr('UB', [self.__X[key] for key in keys], [self.__flowBounds[i] for i, _, _, _ in keys])
+        for (i, j, k, p), constr in self.__XYConstrs.items():
+            self.__m.chgCoeff(constr, self.__Y[i, j, k, p], -self.__flowBounds[i])
+        for (i, j), constr in self.__XZConstrs.items():
+            self.__m.chgCoeff(constr, self.__Z[i, j], -self.__flowBounds[i])
+
+    # use current solution as MIP start of next optimization
+    def __SetMIPStart(self) -> None:
+        if self.__m.SolCount == 0: return
+        allVars = self.__m.getVars()
+        self.__m.setAttr('Start', allVars, self.__m.getAttr('X', allVars))
+
+    # change quantity of initial currency (4) in place, re-optimize from previous solution
+    @Traced('update T0')
+    def UpdateT0(self, T0: float, doOptimize: bool = True) -> None:
+        self.__EM.SetInitCurrencyQuantity(T0)
+        self.__initQuantityConstr.RHS = T0
+        self.__RefreshBigM()
+        self.__SetMIPStart()
+        if doOptimize: self.Optimize()
+
+    # change on-off gas fee coefficients (7) in place, re-optimize from previous solution
+    @Traced('update G1')
+    def UpdateG1(self, G1: float, doOptimize: bool = True) -> None:
+        self.__G1 = G1
+        for Y in self.__Y.values():
+            self.__m.chgCoeff(self.__G1Constr, Y, -G1)
+        self.__SetMIPStart()
+        if doOptimize: self.Optimize()
+
+    # change quantity based gas fee coefficients (7) in place, re-optimize from previous solution
+    @Traced('update G2')
+    def UpdateG2(self, G2: float, doOptimize: bool = True) -> None:
+        self.__G2 = G2
+        self.__RefreshG2Coefficients()
+        self.__SetMIPStart()
+        if doOptimize: self.Optimize()
+
+    # G2 fee per unit sold of each currency, converted into d at current reference rates
+    def __RefreshG2Coefficients(self) -> None:
+        rates = self.__EM.GetRatesTo(self.__EM.GetD())
+        for (i, j, k, p), X in self.__X.items():
+            self.__m.chgCoeff(self.__G2Constr, X, -self.__G2 * rates[i])
+
+    # replace fraction constraints of patched pools, refresh upper bounds (13) of their currencies and G2 fees at the patched rates,
+    # re-optimize from previous solution
+    # pools: (exchange, currency1, currency2) as returned by ExchangeManager.ApplyPatches
+    @Traced('update pools')
+    def UpdatePools(self, pools: list, doOptimize: bool = True) -> None:
+        m, X, Y, F, U, Z, G = self.__GetDecisionVariableAlias()
+        V, div = self.__EM.GetV, range(self.__P)
+
+        for k, i, j in pools:
+            if k not in self.__modelExch or i not in self.__modelCurr or j not in self.__modelCurr:
+                raise Exception("Pool ({}, {}, {}) is not part of the model, call Update() to rebuild it.".format(k, i, j))
+            for p in div:
+                m.remove(self.__fractionConstrs[i, j, k, p])
+                self.__fractionConstrs[i, j, k, p] = self.__AddFractionConstraint(i, j, k, p)
+
+        for i in set(i for _, i, _ in pools).intersection(self.__upperBoundConstrs):
+            self.__upperBoundConstrs[i].RHS = sum(V(i, j, k) for j in self.__modelCurr for k in self.__modelExch)
+        self.__RefreshBigM()
+        self.__RefreshG2Coefficients()
+
+        self.__SetMIPStart()
+        if doOptimize: self.Optimize()
+
     # export model information
     def ExportModel(self, pathExport: str) -> None:
         self.__m.write(pathExport)
 
-    # output optimization result
-    def ExportResult(self, pathResult: str) -> float:
+    # get traded pools of current solution, solution values are fetched once per variable family
+    @Traced('route')
+    def GetRoute(self) -> Route:
+        keys = list(self.__X.keys())
+        values = (self.__m.getAttr('X', [variables[key] for key in keys]) for variables in (self.__X, self.__F, self.__Y))
+        return self.__BuildRoute(keys, *values, self.__m.objVal)
+
+    # stocks of currency i and of currency j of the pool of each key (i, j, k, p), a missing pool holds no j and outputs nothing
+    def __GetPoolStocks(self, keys: list) -> tuple:
+        V = self.__EM.GetV
+        stockI = np.array([V(i, j, k) if V(i, j, k) != -1 else 1.0 for i, j, k, _ in keys])
+        stockJ = np.array([V(j, i, k) if V(i, j, k) != -1 else 0.0 for i, j, k, _ in keys])
+        return stockI, stockJ
+
+    # piecewise linear F overestimates outputs: keep split fractions of X and recompute every output along the used pairs, so that the route is feasible
+    def __BuildRoute(self, keys: list, valuesX: list, valuesF: list, valuesY: list, objective: float) -> Route:
         o, d, a, b, M = self.__GetConstantAlias()
-        m, X, Y, F, U, Z, G = self.__GetDecisionVariableAlias()
         EM, V, R, curr, exch, div, midCurr = self.__GetOtherAlias()
-
-        if self.__m.status != GRB.OPTIMAL:
-            raise Exception("Optimal solution not found.")
+        rates = EM.GetRatesTo(d)
+        if self.__numBreakpoints > 0:
+            valuesX, valuesF = PropagateFlows([(i, j) for i, j, _, _ in keys], valuesX, *self.__GetPoolStocks(keys), o, d, EM.GetT0())
+            fees = sum(self.__G1 * round(y) + self.__G2 * rates[i] * x for (i, _, _, _), x, y in zip(keys, valuesX, valuesY) if x > 0)
+            objective = a * sum(f for (_, j, _, _), f in zip(keys, valuesF) if j == d) - b * fees
+
+        route = Route(o, d, EM.GetT0())
+        route.SetObjective(objective)
+        for (i, j, k, p), x, f, y in zip(keys, valuesX, valuesF, valuesY):
+            if x == 0: continue
+            route.AddHop(i, j, k, x, f, self.__G1 * round(y) + self.__G2 * rates[i] * x, p)
+        return route
+
+    # a feasible solution exists, e.g. after time limit was reached
+    def HasSolution(self) -> bool:
+        return self.__m.SolCount > 0
+
+    # output optimization result, values of all decision variables are only written if dumpVariables
+    @Traced('export')
+    def ExportResult(self, pathResult: str, dumpVariables: bool = False) -> float:
+        if not self.HasSolution():
+            raise Exception("No feasible solution found.")
+
+        route = self.GetRoute()
 
         with open(pathResult, 'w') as f:
-            f.write('Optimal objective: {} {}\n'.format(self.__m.objVal, self.__EM.GetD()))
+            if self.__m.status == GRB.OPTIMAL:
+                f.write('Optimal objective: {} {}\n'.format(self.__m.objVal, self.__EM.GetD()))
+            else:
+                f.write('Best objective: {} {} (status {}, MIP gap {})\n'.format(self.__m.objVal, self.__EM.GetD(), self.__m.status, self.__m.MIPGap))
+            if self.__numBreakpoints > 0:
+                f.write('Objective of the piecewise linear model with {} breakpoints is an upper bound, exact route objective: {} {}\n'.format(self.__numBreakpoints, route.GetObjective(), self.__EM.GetD()))
             f.write('Modeling time: {} seconds\n'.format(self.__timeSetup))
             f.write('Solving time: {} seconds\n'.format(self.__timeOptimization))
-            f.write('Number of decision variables: {}\n'.format(len(self.__m.getVars())))
+            f.write('Number of decision variables: {}\n'.format(self.__m.NumVars))
 
             f.write('\nTransaction Strategy\n')
-            for i in curr:
-                for j in curr:
-                    for k in exch:
-                        for p in div:
-                            if X[i, j, k, p].x == 0: continue
-                            f.write('{:.2f} {} -> {:.2f} {} via {} by {}-div\n'.format(X[i, j, k, p].x, i, F[i, j, k, p].x, j, k, p))
+            f.writelines('{:.2f} {} -> {:.2f} {} via {} by {}-div\n'.format(hop['amountIn'], hop['initCurrency'], hop['amountOut'], hop['termCurrency'], hop['exchange'], hop['division'])
+                         for hop in route.GetHops())
+            if not dumpVariables: return self.__timeOptimization
 
+            variables = self.__m.getVars()
+            names, values = self.__m.getAttr('VarName', variables), self.__m.getAttr('X', variables)
             f.write('\nValues of non-zero decision variables:\n')
-            for var in self.__m.getVars():
-                if var.x == 0 : continue
-                f.write('%s = %g\n' % (var.varName, var.x))
-            
+            f.writelines('%s = %g\n' % (name, value) for name, value in zip(names, values) if value != 0)
+
             f.write('\nValues of all decision variables:\n')
-            for var in self.__m.getVars():
-                f.write('%s = %g\n' % (var.varName, var.x))
-        
+            f.writelines('%s = %g\n' % (name, value) for name, value in zip(names, values))
+
         return self.__timeOptimization
 
     def GetObjective(self) -> float:
@@ -226,4 +457,20 @@ class ModelSolver:
         return self.__m.objVal + self.__G1Fee.x
 
     def GetOptTime(self) ->float:
-        return self.__timeOptimization
\ No newline at end of file
+        return self.__timeOptimization
+
+    def GetSetupTime(self) -> float:
+        return self.__timeSetup
+
+    def GetStatus(self) -> int:
+        return self.__m.status
+
+    def GetMIPGap(self) -> float:
+        return self.__m.MIPGap
+
+    def GetNumVars(self) -> int:
+        return self.__m.NumVars
+
+    # linear and quadratic constraints
+    def GetNumConstrs(self) -> int:
+        return self.__m.NumConstrs + self.__m.NumQConstrs
@@ -0,0 +1,143 @@
+import json
+from collections import OrderedDict
+from gurobipy import GRB
+from ExchangeManager import ExchangeManager
+from ModelSolver import ModelSolver
+from Route import Route
+
+
+class QuoteCache:
+
+    def __init__(self, exchangeManager: ExchangeManager) -> None:
+        self.__EM = exchangeManager
+        self.__quotes = OrderedDict()  # key -> (route, size), least recently used first
+        self.__snapshotHash = exchangeManager.GetSnapshotHash()
+        self.__maxEntries = 1024
+        self.__maxMemory = 64 * 1024 ** 2  # bytes
+        self.__memory = 0
+        self.__T0BucketSize = None  # None: quantities are not bucketed
+        self.__timeLimit = None
+        self.__numHits = 0
+        self.__numMisses = 0
+        self.__solver = None  # model of the last solved quote, re-solved in place for another quantity
+        self.__solverKey = None  # (snapshot hash, initial currency, terminal currency, G1, G2, number of division) of that model
+
+    def SetMaxEntries(self, maxEntries: int) -> None:
+        self.__maxEntries = maxEntries
+        self.__Evict()
+
+    # approximate bytes held by cached routes
+    def SetMaxMemory(self, maxMemory: int) -> None:
+        self.__maxMemory = maxMemory
+        self.__Evict()
+
+    # quantities in the same bucket share one quote, solved at the bucket center
+    def SetT0BucketSize(self, T0BucketSize: float) -> None:
+        self.__T0BucketSize = T0BucketSize
+        self.Clear()
+
+    def SetTimeLimit(self, timeLimit: float) -> None:
+        self.__timeLimit = timeLimit
+
+    def __GetBucketT0(self, T0: float) -> float:
+        if self.__T0BucketSize is None: return T0
+        return (T0 // self.__T0BucketSize + 0.5) * self.__T0BucketSize
+
+    # size of a route as it would be serialized
+    def __GetSize(self, route: Route) -> int:
+        return len(json.dumps(route.ToDict()))
+
+    def __Evict(self) -> None:
+        while self.__quotes and (len(self.__quotes) > self.__maxEntries or self.__memory > self.__maxMemory):
+            _, (_, size) = self.__quotes.popitem(last=False)
+            self.__memory -= size
+
+    # drop all quotes, e.g. after reserves changed
+    def Clear(self) -> None:
+        self.__quotes.clear()
+        self.__memory = 0
+        self.__solver, self.__solverKey = None, None
+
+    # quotes of an older market snapshot are never served
+    def __Validate(self) -> None:
+        snapshotHash = self.__EM.GetSnapshotHash()
+        if snapshotHash == self.__snapshotHash: return
+        self.Clear()
+        self.__snapshotHash = snapshotHash
+
+    # market of one order with currencies off every route left out, the order of the caller's market is left as it was
+    def __GetPrunedManager(self, initCurrency: str, termCurrency: str, T0: float) -> ExchangeManager:
+        EM = self.__EM
+        order = (EM.GetO(), EM.GetD(), EM.GetT0())
+        try:
+            EM.SetInitCurrency(initCurrency)
+            EM.SetTermCurrency(termCurrency)
+            EM.SetInitCurrencyQuantity(T0)
+            return EM.GetPrunedManager()
+        finally:
+            EM.SetInitCurrency(order[0])
+            EM.SetTermCurrency(order[1])
+            EM.SetInitCurrencyQuantity(order[2])
+
+    # return route and whether it is optimal, the best incumbent is returned if time limit is reached;
+    # a quote of another quantity for the same pair, fees and snapshot re-solves the last model from its solution
+    def __Solve(self, initCurrency: str, termCurrency: str, T0: float, G1: float, G2: float, numDivision: int) -> tuple:
+        for currency in (initCurrency, termCurrency):
+            if currency not in self.__EM.GetCurr(): raise Exception("No pool trades {}.".format(currency))
+
+        solverKey = (self.__snapshotHash, initCurrency, termCurrency, G1, G2, numDivision)
+        if solverKey == self.__solverKey:
+            MS = self.__solver
+            if self.__timeLimit is not None: MS.SetTimeLimit(self.__timeLimit)
+            MS.UpdateT0(T0)
+        else:
+            self.__solver, self.__solverKey = None, None
+            MS = ModelSolver(self.__GetPrunedManager(initCurrency, termCurrency, T0), verbose=False)
+            MS.SetG1(G1)
+            MS.SetG2(G2)
+            MS.SetNumDivision(numDivision)
+            if self.__timeLimit is not None: MS.SetTimeLimit(self.__timeLimit)
+            MS.Update()
+            MS.Optimize()
+            self.__solver, self.__solverKey = MS, solverKey
+
+        if not MS.HasSolution():
+            raise Exception("No feasible solution found.")
+        return MS.GetRoute(), MS.GetStatus() == GRB.OPTIMAL
+
+    # get route of quantity T0 of initial currency into terminal currency, solved only if not cached
+    # routes not proven optimal within time limit are returned but not cached
+    def Quote(self, initCurrency: str, termCurrency: str, T0: float, G1: float = 43, G2: float = 0.003, numDivision: int = 1) -> Route:
+        self.__Validate()
+        T0 = self.__GetBucketT0(T0)
+        key = (self.__snapshotHash, initCurrency, termCurrency, T0, G1, G2, numDivision)
+
+        if key in self.__quotes:
+            self.__numHits += 1
+            self.__quotes.move_to_end(key)
+            return self.__quotes[key][0]
+
+        self.__numMisses += 1
+        route, isOptimal = self.__Solve(initCurrency, termCurrency, T0, G1, G2, numDivision)
+        if not isOptimal: return route
+        size = self.__GetSize(route)
+        self.__quotes[key] = (route, size)
+        self.__memory += size
+        self.__Evict()
+        return route
+
+    def GetNumHits(self) -> int:
+        return self.__numHits
+
+    def GetNumMisses(self) -> int:
+        return self.__numMisses
+
+    def GetHitRate(self) -> float:
+        numQuotes = self.__numHits + self.__numMisses
+        return self.__numHits / numQuotes if numQuotes else 0.0
+
+    def GetNumEntries(self) -> int:
+        return len(self.__quotes)
+
+    def GetMemory(self) -> int:
+        return self.__memory
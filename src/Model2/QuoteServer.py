@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from ExchangeManager import ExchangeManager
+from QuoteCache import QuoteCache
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from HeuristicRouter import HeuristicRouter
+
+
+workerCache = None  # quote cache over the market copy owned by each worker process
+workerRouter = None
+
+
+def InitWorker(exchangeManager: ExchangeManager) -> None:
+    global workerCache, workerRouter
+    workerCache = QuoteCache(exchangeManager)
+    workerRouter = HeuristicRouter()
+    workerRouter.LoadExchangeManager(exchangeManager)
+
+
+def SolveModel(request: dict) -> dict:
+    workerCache.SetTimeLimit(request['timeLimit'])
+    route = workerCache.Quote(request['initCurrency'], request['termCurrency'], request['T0'],
+                              request.get('G1', 43), request.get('G2', 0.003), request.get('numDivision', 1))
+    return route.ToDict()
+
+
+# the heuristic is fast and takes no time limit, only the group deadline of the server applies
+def SolveHeuristic(request: dict) -> dict:
+    workerRouter.SetG1(request.get('G1', 43))
+    workerRouter.SetG2(request.get('G2', 0.003))
+    workerRouter.Route(request['initCurrency'], request['termCurrency'], request['T0'])
+    return workerRouter.GetRoute().ToDict()
+
+
+# plain exceptions of the solvers carry a readable message, others, e.g. KeyError, are named
+def GetErrorMessage(e: Exception) -> str:
+    return str(e) if type(e) is Exception else '{}: {}'.format(type(e).__name__, e)
+
+
+# json true is a python bool, which is an int as well
+def IsPositiveNumber(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
+
+# answer requests differing only in T0 one after another in one worker, so the quote cache re-solves one model for every quantity;
+# the whole group shares one deadline of timeLimit seconds, later requests get what earlier ones left
+def SolveGroup(solver, requests: list, timeLimit: float) -> list:
+    results, timeStart = [], time.time()
+    for request in requests:
+        remaining = timeLimit - (time.time() - timeStart)
+        if remaining <= 0:
+            results.append({'error': 'Time limit of {} seconds exceeded'.format(timeLimit)})
+            continue
+        try:
+            results.append({'route': solver(dict(request, timeLimit=min(request['timeLimit'], remaining)))})
+        except Exception as e:
+            results.append({'error': GetErrorMessage(e)})
+    return results
+
+
+# newline delimited json over tcp, one request per line:
+# {"endpoint": "model" | "heuristic" | "stats", "initCurrency": ..., "termCurrency": ..., "T0": ..., "timeLimit": optional seconds}
+# timeLimit bounds the model solver, the heuristic endpoint accepts it for a uniform protocol but does not need it
+class QuoteServer:
+
+    def __init__(self, exchangeManager: ExchangeManager, host: str = '127.0.0.1', port: int = 8765) -> None:
+        self.__EM = exchangeManager
+        self.__host = host
+        self.__port = port
+        self.__numWorkers = os.cpu_count()
+        self.__batchWindow = 0.005  # seconds a batch waits for further requests
+        self.__maxBatchSize = 64
+        self.__timeLimit = 10.0  # default seconds per request
+        self.__solvers = {'model': SolveModel, 'heuristic': SolveHeuristic}
+        self.__latencies = {endpoint: [] for endpoint in self.__solvers}
+        self.__numSolved = 0  # distinct requests sent to workers, coalesced copies are not counted
+        self.__queue = None
+        self.__executor = None
+
+    def SetNumWorkers(self, numWorkers: int) -> None:
+        self.__numWorkers = numWorkers
+
+    def SetBatchWindow(self, batchWindow: float) -> None:
+        self.__batchWindow = batchWindow
+
+    def SetMaxBatchSize(self, maxBatchSize: int) -> None:
+        self.__maxBatchSize = maxBatchSize
+
+    def SetTimeLimit(self, timeLimit: float) -> None:
+        self.__timeLimit = timeLimit
+
+    # port 0 binds a free port, which is reported once serving
+    def GetPort(self) -> int:
+        return self.__port
+
+    # latency percentiles in seconds of answered requests per endpoint
+    def GetLatencyPercentiles(self, percentiles: tuple = (50, 90, 99)) -> dict:
+        return {endpoint: dict(zip(('p{}'.format(q) for q in percentiles), np.percentile(latencies, percentiles).tolist()) if latencies else {}, count=len(latencies))
+                for endpoint, latencies in self.__latencies.items()}
+
+    def __GetKey(self, request: dict) -> str:
+        return json.dumps(request, sort_keys=True)
+
+    # requests of one group only differ in T0
+    def __GetGroupKey(self, request: dict) -> str:
+        return json.dumps({field: value for field, value in request.items() if field != 'T0'}, sort_keys=True)
+
+    # solve a group of distinct requests in one worker and answer every coalesced copy of each, requests: key -> (request, futures);
+    # a timeout only stops waiting, the worker process cannot be cancelled and stays busy until its solver returns,
+    # the solvers stop themselves at the group deadline, so this only happens if one overruns it, e.g. while building a large model
+    async def __Dispatch(self, requests: dict) -> None:
+        loop = asyncio.get_running_loop()
+        group = sorted((request for request, _ in requests.values()), key=lambda request: request['T0'])
+        self.__numSolved += len(group)
+        timeLimit = max(request['timeLimit'] for request in group)
+        try:
+            results = await asyncio.wait_for(loop.run_in_executor(self.__executor, SolveGroup, self.__solvers[group[0]['endpoint']], group, timeLimit),
+                                             timeLimit + 1.0)  # the margin covers transfer
+        except asyncio.TimeoutError:
+            results = [{'error': 'Time limit of {} seconds exceeded'.format(timeLimit)}] * len(group)
+        except Exception as e:
+            results = [{'error': GetErrorMessage(e)}] * len(group)
+
+        for request, result in zip(group, results):
+            for future in requests[self.__GetKey(request)][1]:
+                if not future.done(): future.set_result(result)
+
+    # collect requests arriving within the batch window, identical requests are solved once,
+    # requests for the same pair and parameters that only differ in T0 go to the same worker
+    async def __Batch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.__queue.get()]
+            deadline = loop.time() + self.__batchWindow
+            while len(batch) < self.__maxBatchSize:
+                try:
+                    batch.append(await asyncio.wait_for(self.__queue.get(), max(deadline - loop.time(), 0)))
+                except asyncio.TimeoutError:
+                    break
+
+            groups = {}
+            for request, future in batch:
+                group = groups.setdefault(self.__GetGroupKey(request), {})
+                group.setdefault(self.__GetKey(request), (request, []))[1].append(future)
+            for group in groups.values():
+                asyncio.create_task(self.__Dispatch(group))
+
+    async def __Answer(self, request: dict) -> dict:
+        endpoint = request.get('endpoint')
+        if endpoint == 'stats': return {'latency': self.GetLatencyPercentiles(), 'numSolved': self.__numSolved}
+        if endpoint not in self.__solvers: return {'error': 'Unknown endpoint: {}'.format(endpoint)}
+        if not all(field in request for field in ('initCurrency', 'termCurrency', 'T0')):
+            return {'error': 'initCurrency, termCurrency and T0 are required'}
+        for field in ('initCurrency', 'termCurrency'):
+            if request[field] not in self.__EM.GetCurr(): return {'error': 'Unknown {}: {}, no pool trades it'.format(field, request[field])}
+        if request['initCurrency'] == request['termCurrency']: return {'error': 'initCurrency and termCurrency must differ'}
+        for field in ('T0', 'timeLimit'):
+            if field in request and not IsPositiveNumber(request[field]): return {'error': '{} must be a positive number'.format(field)}
+
+        request = dict(request, timeLimit=float(request.get('timeLimit', self.__timeLimit)))
+        timeStart = time.time()
+        future = asyncio.get_running_loop().create_future()
+        await self.__queue.put((request, future))
+        result = await future
+        self.__latencies[endpoint].append(time.time() - timeStart)
+        return result
+
+    async def __HandleClient(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        async def Respond(line: bytes) -> None:
+            try:
+                result = await self.__Answer(json.loads(line))
+            except ValueError:
+                result = {'error': 'Invalid json'}
+            writer.write((json.dumps(result) + '\n').encode())
+            await writer.drain()
+
+        tasks = []
+        try:
+            while line := await reader.readline():
+                tasks.append(asyncio.create_task(Respond(line)))  # requests of one connection are answered as they finish
+            await asyncio.gather(*tasks)
+        except (ConnectionError, asyncio.CancelledError):
+            pass  # client left or server shuts down
+        finally:
+            writer.close()
+
+    async def Serve(self) -> None:
+        self.__queue = asyncio.Queue()
+        self.__executor = ProcessPoolExecutor(max_workers=self.__numWorkers, initializer=InitWorker, initargs=(self.__EM,))
+        batcher = asyncio.create_task(self.__Batch())
+        server = await asyncio.start_server(self.__HandleClient, self.__host, self.__port)
+        self.__port = server.sockets[0].getsockname()[1]
+        print('Serving quotes on {}:{}'.format(self.__host, self.__port))
+        try:
+            async with server: await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.__executor.shutdown(cancel_futures=True)
+            print(json.dumps(self.GetLatencyPercentiles()))
+
+    def Run(self) -> None:
+        try:
+            asyncio.run(self.Serve())
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve routing quotes of one market on localhost')
+    parser.add_argument('pathData', help='pool csv, e.g. Data07011200.csv')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--timeLimit', type=float, default=10.0, help='default seconds per request')
+    args = parser.parse_args()
+
+    EM = ExchangeManager()
+    EM.ImportData(args.pathData)
+
+    QS = QuoteServer(EM, port=args.port)
+    QS.SetNumWorkers(args.workers)
+    QS.SetTimeLimit(args.timeLimit)
+    QS.Run()
@@ -0,0 +1,152 @@
+import os
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ModelSolver import ModelSolver
+from ExchangeManager import ExchangeManager
+
+
+workerEM = None  # exchange manager copy owned by each worker process
+
+
+def InitWorker(exchangeManager: ExchangeManager) -> None:
+    global workerEM
+    workerEM = exchangeManager
+
+
+# values of one solved grid point
+def GetPointResult(MS: ModelSolver) -> tuple:
+    if not MS.HasSolution():
+        raise Exception('No feasible solution found (status {}).'.format(MS.GetStatus()))
+    return MS.GetObjective(), MS.GetObjPlusG1Fee(), MS.GetG1Fee(), MS.GetG2Fee(), MS.GetOptTime()
+
+
+# solve a chain of grid points sharing pair and number of division inside a worker,
+# the model is built once and later points only update T0, G1 and G2 in place;
+# return (values, error) of every point, an error only fails its own point unless the model cannot be built
+def SolveChain(points: list, numThreads: int) -> list:
+    first = points[0]
+    try:
+        for currency in (first['o'], first['d']):
+            if currency not in workerEM.GetCurr(): raise Exception('No pool trades {}.'.format(currency))
+        workerEM.SetInitCurrency(first['o'])
+        workerEM.SetTermCurrency(first['d'])
+        workerEM.SetInitCurrencyQuantity(first['T0'])
+
+        MS = ModelSolver(workerEM, verbose=False)
+        MS.SetThreads(numThreads)
+        MS.SetNumDivision(first['P'])
+        MS.SetG1(first['G1'])
+        MS.SetG2(first['G2'])
+        MS.Update()
+    except Exception as e:
+        return [(None, 'error: {}'.format(e))] * len(points)
+
+    results = []
+    for prev, point in zip([None] + points[:-1], points):
+        try:
+            if prev is not None and point['T0'] != prev['T0']: MS.UpdateT0(point['T0'], doOptimize=False)
+            if prev is not None and point['G1'] != prev['G1']: MS.UpdateG1(point['G1'], doOptimize=False)
+            if prev is not None and point['G2'] != prev['G2']: MS.UpdateG2(point['G2'], doOptimize=False)
+            MS.Optimize()
+            results.append((GetPointResult(MS), None))
+        except Exception as e:
+            results.append((None, 'error: {}'.format(e)))
+
+    return results
+
+
+class SweepRunner:
+
+    def __init__(self, exchangeManager: ExchangeManager) -> None:
+        self.__EM = exchangeManager
+        self.__T0s = [exchangeManager.GetT0()]
+        self.__numDivisions = [1]
+        self.__G1s = [43]
+        self.__G2s = [0.003]
+        self.__pairs = [(exchangeManager.GetO(), exchangeManager.GetD())]
+        self.__numWorkers = os.cpu_count()
+        self.__numThreads = 1  # gurobi threads per worker
+        self.__chainLength = 1  # grid points solved by one warm-started model
+        self.__nameResults = ('objList', 'objPlusG1List', 'G1List', 'G2List', 'timeList')
+        self.__failures = []  # (number of division, (pair, T0, G1, G2), error) of every failed grid point of the last run
+
+    def SetT0s(self, T0s: list) -> None:
+        self.__T0s = list(T0s)
+
+    def SetNumDivisions(self, numDivisions: list) -> None:
+        self.__numDivisions = list(numDivisions)
+
+    def SetG1s(self, G1s: list) -> None:
+        self.__G1s = list(G1s)
+
+    def SetG2s(self, G2s: list) -> None:
+        self.__G2s = list(G2s)
+
+    # set (initial currency, terminal currency) pairs
+    def SetPairs(self, pairs: list) -> None:
+        self.__pairs = list(pairs)
+
+    def SetNumWorkers(self, numWorkers: int) -> None:
+        self.__numWorkers = numWorkers
+
+    def SetNumThreads(self, numThreads: int) -> None:
+        self.__numThreads = numThreads
+
+    # longer chains reuse one model for more points, shorter chains give more parallel tasks
+    def SetChainLength(self, chainLength: int) -> None:
+        if chainLength < 1:
+            raise Exception('Invalid chain length: {}'.format(chainLength))
+
+        self.__chainLength = chainLength
+
+    # get grid columns: every (pair, T0, G1, G2) combination, rows of result tables are numbers of division
+    def GetColumns(self) -> list:
+        return list(itertools.product(self.__pairs, self.__T0s, self.__G1s, self.__G2s))
+
+    def GetFailures(self) -> list:
+        return self.__failures
+
+    # solve every grid point in a process pool, save result tables after each finished chain unless pathResult is None;
+    # failed points stay nan in the tables and are listed in failures.csv
+    def Run(self, pathResult: str = 'Result/') -> dict:
+        columns = self.GetColumns()
+        results = {name: np.full((len(self.__numDivisions), len(columns)), np.nan) for name in self.__nameResults}
+        self.__failures = []
+        if pathResult is not None: os.makedirs(pathResult, exist_ok=True)
+
+        with ProcessPoolExecutor(max_workers=self.__numWorkers, initializer=InitWorker, initargs=(self.__EM,)) as executor:
+            futures = {}
+            for row, P in enumerate(self.__numDivisions):
+                for pair in self.__pairs:
+                    cols = [col for col, column in enumerate(columns) if column[0] == pair]
+                    for start in range(0, len(cols), self.__chainLength):
+                        chain = cols[start:start+self.__chainLength]
+                        points = [{'o': pair[0], 'd': pair[1], 'T0': columns[col][1], 'P': P, 'G1': columns[col][2], 'G2': columns[col][3]} for col in chain]
+                        futures[executor.submit(SolveChain, points, self.__numThreads)] = (row, chain)
+
+            for future in as_completed(futures):
+                row, chain = futures[future]
+                try:
+                    chainResults = future.result()
+                except Exception as e:  # worker died, e.g. out of memory
+                    chainResults = [(None, 'error: {}'.format(e))] * len(chain)
+
+                for col, (values, error) in zip(chain, chainResults):
+                    if error is not None:
+                        self.__failures.append((self.__numDivisions[row], columns[col], error))
+                        continue
+                    for name, value in zip(self.__nameResults, values):
+                        results[name][row, col] = value
+                if pathResult is None: continue
+                for name in self.__nameResults:
+                    np.savetxt(os.path.join(pathResult, name + '.csv'), results[name], delimiter=',')
+                self.__ExportFailures(pathResult)
+
+        return results
+
+    def __ExportFailures(self, pathResult: str) -> None:
+        with open(os.path.join(pathResult, 'failures.csv'), 'w') as f:
+            f.write('numDivision,initCurrency,termCurrency,T0,G1,G2,error\n')
+            for P, ((o, d), T0, G1, G2), error in self.__failures:
+                f.write('{},{},{},{},{},{},"{}"\n'.format(P, o, d, T0, G1, G2, error.replace('"', "'")))
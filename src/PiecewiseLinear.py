@@ -0,0 +1,49 @@
+import numpy as np
+
+
+# tangents of output b x / (a + x) at inputs x = a u / (1 - u), u evenly spaced over pool shares up to the flow bound:
+# F <= slope X + intercept with slope b (1 - u)^2 / a and intercept b u^2, one row per breakpoint and one column per pool
+def GetTangents(stockI: np.array, stockJ: np.array, bound: np.array, numBreakpoints: int) -> tuple:
+    shares = np.multiply.outer(np.linspace(0, 1, max(numBreakpoints, 1)), bound / (stockI + bound))
+    return stockJ * (1 - shares) ** 2 / stockI, stockJ * shares ** 2
+
+
+# tangents at the inputs X of a solution where F overestimates the exact output by more than tolerance relative to it:
+# return positions of those pools, slopes and intercepts
+def GetRefinementTangents(stockI: np.array, stockJ: np.array, X: np.array, F: np.array, tolerance: float) -> tuple:
+    outputs = stockJ * X / (stockI + X)
+    refine = np.flatnonzero((X > 0) & (F - outputs > tolerance * np.maximum(outputs, 1.0)))
+    shares = X[refine] / (stockI[refine] + X[refine])
+    return refine, stockJ[refine] * (1 - shares) ** 2 / stockI[refine], stockJ[refine] * shares ** 2
+
+
+# keep split fractions of X but recompute every quantity from T0 along the used pairs with exact outputs, so that flows are conserved;
+# pool n trades pairs[n] = (i, j) on stocks stockI[n], stockJ[n]; X is kept as it is if its used pairs contain a cycle
+def PropagateFlows(pairs: list, X: list, stockI: list, stockJ: list, o: str, d: str, T0: float) -> tuple:
+    outPools, predecessors = {}, {}
+    for n, ((i, j), x) in enumerate(zip(pairs, X)):
+        if x <= 0: continue
+        outPools.setdefault(i, []).append(n)
+        predecessors.setdefault(i, set())
+        predecessors.setdefault(j, set()).add(i)
+
+    order, queue = [], [i for i, before in predecessors.items() if not before]
+    while queue:
+        i = queue.pop()
+        order.append(i)
+        for j in set(pairs[n][1] for n in outPools.get(i, [])):
+            predecessors[j].discard(i)
+            if not predecessors[j]: queue.append(j)
+
+    X = list(X)
+    if len(order) == len(predecessors):
+        inFlow = {o: T0}
+        for i in order:
+            if i == d or i not in outPools: continue
+            outFlow = sum(X[n] for n in outPools[i])
+            for n in outPools[i]:
+                X[n] = inFlow.get(i, 0.0) * X[n] / outFlow
+                inFlow[pairs[n][1]] = inFlow.get(pairs[n][1], 0.0) + stockJ[n] * X[n] / (stockI[n] + X[n])
+
+    F = [b * x / (a + x) if x > 0 else 0.0 for a, b, x in zip(stockI, stockJ, X)]
+    return X, F
@@ -0,0 +1,66 @@
+import numpy as np
+
+
+# upper bound on total quantity of each currency sold by any route, indexed by currency index;
+# edge n trades currency indI[n] into indJ[n] on its own reserves stockI[n], stockJ[n], up to numDivision times:
+# o sells T0, d sells nothing, any other currency at most caps, what spot rates allow and what its in-edges can deliver
+def GetFlowBounds(indI: np.array, indJ: np.array, stockI: np.array, stockJ: np.array, o: int, d: int, T0: float,
+                  numCurrencies: int, caps: np.array = None, numDivision: int = 1) -> np.array:
+    # a pool never pays more than its spot rate: a currency holds at most T0 times the best rate product of a path from o
+    rates, reach = stockJ / np.maximum(stockI, 1e-300), np.zeros(numCurrencies)
+    usable = (indI != d) & (indJ != o)
+    reach[o] = 1.0
+    for _ in range(numCurrencies - 1):  # walks of up to N - 1 hops cover every simple path
+        nextReach = reach.copy()
+        np.maximum.at(nextReach, indJ[usable], reach[indI[usable]] * rates[usable])
+        if np.array_equal(nextReach, reach): break
+        reach = nextReach
+
+    bounds = T0 * reach if caps is None else np.minimum(caps, T0 * reach)
+    bounds[o], bounds[d] = T0, 0.0
+    for _ in range(numCurrencies):  # bounds only shrink, every pass keeps them valid
+        supply = bounds[indI]
+        inFlow = numDivision * np.bincount(indJ, weights=stockJ * supply / np.maximum(stockI + supply, 1e-300), minlength=numCurrencies)
+        inFlow[o], inFlow[d] = T0, 0.0
+        if np.all(inFlow >= bounds * (1 - 1e-9)): break
+        bounds = np.minimum(bounds, inFlow)
+
+    return bounds
+
+
+# currencies reachable from o without passing d that also reach d without passing o, pairs: (i, j) where i sells into j;
+# keeps every currency of an o -> d path but may keep more, e.g. a dead end hanging off a currency that is on such a path
+def GetRouteCurrencies(pairs, o: str, d: str) -> set:
+    successors, predecessors = {}, {}
+    for i, j in pairs:
+        successors.setdefault(i, set()).add(j)
+        predecessors.setdefault(j, set()).add(i)
+
+    def Reach(start: str, neighbors: dict, stop: str) -> set:
+        reached, stack = {start}, [start]
+        while stack:
+            i = stack.pop()
+            if i == stop: continue
+            for j in neighbors.get(i, ()):
+                if j not in reached:
+                    reached.add(j)
+                    stack.append(j)
+        return reached
+
+    return Reach(o, successors, d).intersection(Reach(d, predecessors, o))
+
+
+# edge n trades currency indI[n] on its own reserves stockI[n], stockJ[n] in parallel to the other edges of pair indPair[n];
+# an edge is dominated if its spot rate is at most the marginal rate of another edge of its pair at the flow bound of the sold currency:
+# moving its flow to that edge never lowers the output, so the optimum does not change without it; currencies bounded by 0 sell nothing at all
+def GetDominatedEdges(indPair: np.array, indI: np.array, stockI: np.array, stockJ: np.array, bounds: np.array) -> np.array:
+    supply = bounds[indI]
+    spots, marginals = stockJ / stockI, stockI * stockJ / (stockI + supply) ** 2
+    best = np.full(indPair.max() + 1 if len(indPair) else 0, -np.inf)
+    np.maximum.at(best, indPair, marginals)
+
+    # an edge never dominates itself, the first edge of highest marginal rate is kept against rounding
+    first = np.full(len(best), len(indPair))
+    isBest = marginals == best[indPair]
+    np.minimum.at(first, indPair[isBest], np.flatnonzero(isBest))
+    return (supply <= 0) | ((spots <= best[indPair]) & (np.arange(len(indPair)) != first[indPair]))
@@ -0,0 +1,147 @@
+import io
+import time
+import functools
+import pstats
+import cProfile
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+# run a method inside a span of the profiler returned by GetProfiler() of its object, untraced if that is None
+def Traced(name: str):
+    def Decorate(method):
+        @functools.wraps(method)
+        def TracedMethod(self, *args, **kwargs):
+            profiler = self.GetProfiler()
+            if profiler is None: return method(self, *args, **kwargs)
+            with profiler.Span(name):
+                return method(self, *args, **kwargs)
+        return TracedMethod
+    return Decorate
+
+
+# span of profiler, nothing is timed if profiler is None
+def OptionalSpan(profiler: 'Profiler', name: str):
+    return nullcontext() if profiler is None else profiler.Span(name)
+
+
+# count on profiler, nothing is counted if profiler is None
+def OptionalCount(profiler: 'Profiler', name: str, number: int = 1) -> None:
+    if profiler is not None: profiler.Count(name, number)
+
+
+# named timing spans and counters shared by data managers and solvers, one profiler can be handed to several of them
+# spans nest: span "fraction" opened inside span "update" is recorded as "update/fraction"
+class Profiler:
+
+    def __init__(self) -> None:
+        self.__times = {}  # span -> accumulated seconds
+        self.__numCalls = {}  # span -> number of times entered
+        self.__counts = {}  # counter -> value
+        self.__memoryPeaks = {}  # span -> peak traced bytes while open
+        self.__stack = []  # names of open spans
+        self.__peaks = []  # running peak traced bytes of each open span
+        self.__profile = None  # cProfile collecting while an outermost span is open
+        self.__traceMalloc = False
+
+    # collect function level statistics with cProfile while any span is open
+    def SetCProfile(self, enabled: bool) -> None:
+        self.__profile = cProfile.Profile() if enabled else None
+
+    # record peak traced memory of every span, tracing slows down allocation heavy code
+    def SetTraceMalloc(self, enabled: bool) -> None:
+        self.__traceMalloc = enabled
+        if enabled and not tracemalloc.is_tracing(): tracemalloc.start()
+
+    def __EnterMemory(self) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        if self.__peaks: self.__peaks[-1] = max(self.__peaks[-1], peak)
+        tracemalloc.reset_peak()
+        self.__peaks.append(current)
+
+    # a parent span keeps the peak of its children
+    def __ExitMemory(self, path: str) -> None:
+        peak = max(tracemalloc.get_traced_memory()[1], self.__peaks.pop())
+        self.__memoryPeaks[path] = max(self.__memoryPeaks.get(path, 0), peak)
+        if self.__peaks: self.__peaks[-1] = max(self.__peaks[-1], peak)
+        tracemalloc.reset_peak()
+
+    # time code inside a with block, e.g. with profiler.Span('fraction'): ...
+    @contextmanager
+    def Span(self, name: str):
+        self.__stack.append(name)
+        path = '/'.join(self.__stack)
+        self.__times.setdefault(path, 0.0)  # report spans in order of first entry
+        self.__numCalls.setdefault(path, 0)
+        traceMalloc = self.__traceMalloc and tracemalloc.is_tracing()
+        if traceMalloc: self.__EnterMemory()
+        if self.__profile is not None and len(self.__stack) == 1: self.__profile.enable()
+        timeStart = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.__times[path] += time.perf_counter() - timeStart
+            self.__numCalls[path] += 1
+            if self.__profile is not None and len(self.__stack) == 1: self.__profile.disable()
+            if traceMalloc: self.__ExitMemory(path)
+            self.__stack.pop()
+
+    # count events that are too frequent or too cheap for a span
+    def Count(self, name: str, number: int = 1) -> None:
+        self.__counts[name] = self.__counts.get(name, 0) + number
+
+    def GetTimes(self) -> dict:
+        return self.__times
+
+    def GetNumCalls(self) -> dict:
+        return self.__numCalls
+
+    def GetCounts(self) -> dict:
+        return self.__counts
+
+    def GetMemoryPeaks(self) -> dict:
+        return self.__memoryPeaks
+
+    # cProfile statistics of everything run inside spans, None if cProfile is not enabled
+    def GetStats(self, sortKey: str = 'cumulative') -> pstats.Stats:
+        if self.__profile is None: return None
+        return pstats.Stats(self.__profile, stream=io.StringIO()).sort_stats(sortKey)
+
+    def Clear(self) -> None:
+        self.__times, self.__numCalls, self.__counts, self.__memoryPeaks = {}, {}, {}, {}
+        if self.__profile is not None: self.__profile = cProfile.Profile()
+
+    # spans in order of first entry, counters and the hottest functions if cProfile is enabled
+    def Report(self, numFunctions: int = 20) -> str:
+        lines = ['{:<48} {:>10} {:>12} {:>12}'.format('Span', 'Calls', 'Seconds', 'Peak MiB')]
+        for path, seconds in self.__times.items():
+            peak = self.__memoryPeaks.get(path)
+            lines.append('{:<48} {:>10} {:>12.6f} {:>12}'.format(path, self.__numCalls[path], seconds, '' if peak is None else '{:.3f}'.format(peak / 1024 ** 2)))
+
+        if self.__counts:
+            lines.append('\n{:<48} {:>10}'.format('Counter', 'Value'))
+            lines.extend('{:<48} {:>10}'.format(name, value) for name, value in self.__counts.items())
+
+        stats = self.GetStats()
+        if stats is not None:
+            stats.print_stats(numFunctions)
+            lines.append('\n' + stats.stream.getvalue())
+        return '\n'.join(lines)
+
+    def ExportReport(self, pathReport: str, numFunctions: int = 20) -> None:
+        with open(pathReport, 'w') as f:
+            f.write(self.Report(numFunctions) + '\n')
+
+
+# base of data managers and solvers holding an optional profiler, None: nothing is profiled;
+# solvers start with the profiler of their market, so one profiler set on a market collects the spans of every solver built on it
+class Profiled:
+
+    def __init__(self, profiler: Profiler = None) -> None:
+        self.__profiler = profiler
+
+    def SetProfiler(self, profiler: Profiler) -> None:
+        self.__profiler = profiler
+
+    def GetProfiler(self) -> Profiler:
+        return self.__profiler
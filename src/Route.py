@@ -0,0 +1,72 @@
+import csv
+import json
+import numpy as np
+
+
+class Route:
+
+    def __init__(self, initCurrency: str, termCurrency: str, quantity: float) -> None:
+        self.__initCurrency = initCurrency
+        self.__termCurrency = termCurrency
+        self.__quantity = quantity
+        self.__objective = None
+        self.__hops = []
+        self.__fields = ('initCurrency', 'termCurrency', 'exchange', 'division', 'amountIn', 'amountOut', 'fee')
+
+    def GetInitCurrency(self) -> str:
+        return self.__initCurrency
+
+    def GetTermCurrency(self) -> str:
+        return self.__termCurrency
+
+    def GetQuantity(self) -> float:
+        return self.__quantity
+
+    # objective reported by the solver, may include fees
+    def SetObjective(self, objective: float) -> None:
+        self.__objective = objective
+
+    def GetObjective(self) -> float:
+        return self.__objective
+
+    # sell amountIn of initCurrency for amountOut of termCurrency via exchange
+    def AddHop(self, initCurrency: str, termCurrency: str, exchange: str, amountIn: float, amountOut: float, fee: float = 0.0, division: int = 0) -> None:
+        self.__hops.append({'initCurrency': initCurrency, 'termCurrency': termCurrency, 'exchange': exchange, 'division': int(division),
+                            'amountIn': float(amountIn), 'amountOut': float(amountOut), 'fee': float(fee)})
+
+    def GetHops(self) -> list:
+        return self.__hops
+
+    # quantity of terminal currency received
+    def GetAmountOut(self) -> float:
+        return sum(hop['amountOut'] for hop in self.__hops if hop['termCurrency'] == self.__termCurrency)
+
+    def GetFee(self) -> float:
+        return sum(hop['fee'] for hop in self.__hops)
+
+    def ToDict(self) -> dict:
+        return {'initCurrency': self.__initCurrency, 'termCurrency': self.__termCurrency, 'quantity': self.__quantity,
+                'objective': self.__objective, 'amountOut': self.GetAmountOut(), 'fee': self.GetFee(), 'hops': self.__hops}
+
+    # one array per hop field
+    def ToColumns(self) -> dict:
+        return {field: np.array([hop[field] for hop in self.__hops]) for field in self.__fields}
+
+    def ExportJSON(self, pathExport: str) -> None:
+        with open(pathExport, 'w') as f:
+            json.dump(self.ToDict(), f, indent=2)
+
+    def ExportCSV(self, pathExport: str) -> None:
+        with open(pathExport, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.__fields)
+            writer.writeheader()
+            writer.writerows(self.__hops)
+
+    # columnar npz, string columns are stored as unicode arrays so no pickle is needed to load them
+    def ExportColumns(self, pathExport: str) -> None:
+        np.savez(pathExport, **self.ToColumns())
+
+    def __str__(self) -> str:
+        lines = ['{:.6g} {} -> {:.6g} {} via {} by {}-div'.format(hop['amountIn'], hop['initCurrency'], hop['amountOut'], hop['termCurrency'], hop['exchange'], hop['division'])
+                 for hop in self.__hops]
+        return '\n'.join(lines)
@@ -0,0 +1,13 @@
+import os
+from glob import glob
+from GraphManager import GraphManager
+
+
+pathCases = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Cases')
+
+# convert every yaml case into a npz snapshot next to it
+for pathData in sorted(glob(os.path.join(pathCases, '*.yaml'))):
+    graphManager = GraphManager()
+    graphManager.LoadData(pathData)
+    graphManager.SaveSnapshot(os.path.splitext(pathData)[0] + '.npz')
+    print('Converted {}'.format(pathData))
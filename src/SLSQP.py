@@ -2,23 +2,29 @@ import csv
 import time
 import numpy as np
 from GraphManager import GraphManager
+from Profiler import Profiled, Traced, OptionalSpan, OptionalCount
+from scipy.sparse import csr_matrix
 from scipy.optimize import minimize, Bounds
 
 
-class SLSQPManager:
+class SLSQPManager(Profiled):
 
     def __init__(self, graphManager: GraphManager) -> None:
+        super().__init__(graphManager.GetProfiler())
         self.__G = graphManager
         self.__N = graphManager.GetNumCurrencies()
         self.__K = graphManager.GetNumExchanges()
         self.__initPoints = []
         self.__result = None
         self.__timeOptimization = None
-        self.__numX = self.__N * self.__N * self.__K
-        self.__numZ = self.__N * self.__N
+        self.__numEvaluations = {'iterations': 0, 'objective': 0, 'jacobian': 0}  # summed over init points of last Optimize
+        self.__numX = len(graphManager.GetEdges())  # one X per tradeable (i, j, k)
+        self.__numZ = len(graphManager.GetPairs())  # one Z per tradeable (i, j)
         self.__numDecisionVariable = self.__numX + self.__numZ
         self.__tolerance = 1e-8
-        self.__bigM = 1e2
+        self.__bigM = 1e2  # a used pair trades at least 1/bigM, also bounds pair flow if o, d or T0 are unknown
+        self.__numPatches = graphManager.GetNumPatches()  # stocks are copied into index arrays once
+        self.__BuildIndexArrays()
 
     def SetTolerance(self, tolerance: float) -> None:
         if tolerance > 0:
@@ -26,213 +32,154 @@ class SLSQPManager:
 
         self.__tolerance = tolerance
 
-    # convert str index to int index (for X)
-    def __GetInd(self, i: str, j: str, k: str) -> int:
-        i = self.__G.Currency2Index(i)
-        j = self.__G.Currency2Index(j)
-        k = self.__G.Exchange2Index(k)
-        return k * self.__N * self.__N + j * self.__N + i
-
-    def __GetZInd(self, i: str, j: str) -> int:
-        i = self.__G.Currency2Index(i)
-        j = self.__G.Currency2Index(j)
-        return self.__numX + j * self.__N + i
+    # precompute edge stocks and index arrays used by all callbacks
+    @Traced('index arrays')
+    def __BuildIndexArrays(self) -> None:
+        S = self.__G.GetStockMatrix()  # S[k, i]: stock of currency i in exchange k
+        self.__edgeI, self.__edgeJ, self.__edgeK = self.__G.GetEdgeArrays()
+        self.__stockI = S[self.__edgeK, self.__edgeI]  # stock of sold currency i in exchange k of each edge
+        self.__stockJ = S[self.__edgeK, self.__edgeJ]  # stock of bought currency j in exchange k of each edge
+
+        indPair = {pair: p for p, pair in enumerate(self.__G.GetPairs())}
+        self.__edgePair = np.array([indPair[i, j] for i, j, _ in self.__G.GetEdges()], dtype=int)
+
+        initCurrency, termCurrency = self.__G.GetInitCurrency(), self.__G.GetTermCurrency()
+        self.__o = None if initCurrency is None else self.__G.Currency2Index(initCurrency)
+        self.__d = None if termCurrency is None else self.__G.Currency2Index(termCurrency)
+        self.__indMid = np.array([self.__G.Currency2Index(j) for j in self.__G.GetMidCurrencies()], dtype=int)
+        self.__rowMid = np.full(self.__N, -1)  # rowMid[j]: row of mid currency j in flow conservation, -1 otherwise
+        self.__rowMid[self.__indMid] = np.arange(len(self.__indMid))
+        self.__edgeToD = np.flatnonzero(self.__edgeJ == self.__d)  # edges whose output counts in objective
+        self.__pairI = np.zeros(self.__numZ, dtype=int)  # currency index sold by each pair
+        self.__pairI[self.__edgePair] = self.__edgeI
+
+        if self.__o is None or self.__d is None or self.__G.GetT0() is None:
+            self.__flowBounds = np.full(self.__N, np.inf)
+        else:
+            self.__flowBounds = self.__G.GetFlowBounds()  # most of each currency any route can sell
+
+        self.__BuildLinearOperators()
+
+    # assemble sparse matrix from (row, col, value) triples, broadcasting them to a common shape
+    def __AssembleOperator(self, numRows: int, entries: list) -> csr_matrix:
+        rows, cols, vals = [], [], []
+        for row, col, val in entries:
+            row, col, val = np.broadcast_arrays(row, col, val)
+            rows.append(row.ravel())
+            cols.append(col.ravel())
+            vals.append(val.ravel().astype(float))
+        return csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(numRows, self.__numDecisionVariable))
+
+    # linear constraints do not depend on v: assemble their operators once, keep dense copies for SLSQP jacobians
+    def __BuildLinearOperators(self) -> None:
+        edges, numPairs = np.arange(self.__numX), self.__numZ
+        indZ = self.__numX + np.arange(numPairs)
+
+        self.__AInit, self.__ATerm = None, None
+        if self.__o is not None:
+            self.__AInit = self.__AssembleOperator(2, [(0, np.flatnonzero(self.__edgeJ == self.__o), 1),
+                                                       (1, np.flatnonzero(self.__edgeI == self.__o), 1)])
+        if self.__d is not None:
+            self.__ATerm = self.__AssembleOperator(1, [(0, np.flatnonzero(self.__edgeI == self.__d), 1)])
+        pairBounds = self.__flowBounds[self.__pairI]  # bigM only stands in where o, d or T0 leave the bound unknown
+        self.__AAcyclic = self.__AssembleOperator(2 * numPairs, [(self.__edgePair, edges, self.__bigM),
+                                                                 (np.arange(numPairs), indZ, -1),
+                                                                 (numPairs + self.__edgePair, edges, -1),
+                                                                 (numPairs + np.arange(numPairs), indZ, np.where(np.isfinite(pairBounds), pairBounds, self.__bigM))])
+
+        self.__JacInit = None if self.__AInit is None else self.__AInit.toarray()
+        self.__JacTerm = None if self.__ATerm is None else self.__ATerm.toarray().ravel()
+        self.__JacAcyclic = self.__AAcyclic.toarray()
+
+    # output of each edge under constant product: F = stock_j * X / (stock_i + X)
+    def __GetF(self, X: np.array) -> np.array:
+        return self.__stockJ * X / (self.__stockI + X)
+
+    # derivative of F with respect to X of each edge
+    def __GetDF(self, X: np.array) -> np.array:
+        return self.__stockI * self.__stockJ / (self.__stockI + X) ** 2
 
     def FlowConservation(self, v: np.array) -> np.array:
-        exchanges = self.__G.GetExchanges()
-        currencies = self.__G.GetCurrencies()
-
-        Mat = np.array([])
+        X = v[:self.__numX]
 
-        for j in self.__G.GetMidCurrencies():
-            inFlow = sum((self.__G.GetStock(k, j)*v[self.__GetInd(i, j, k)])/(self.__G.GetStock(k, i)+v[self.__GetInd(i, j, k)]) for i in currencies for k in exchanges)
-            outFlow = sum(v[self.__GetInd(j, i, k)] for i in currencies for k in exchanges)
-            Mat = np.append(Mat, inFlow-outFlow)
+        inFlow = np.bincount(self.__edgeJ, weights=self.__GetF(X), minlength=self.__N)
+        outFlow = np.bincount(self.__edgeI, weights=X, minlength=self.__N)
 
-        return Mat
+        return (inFlow - outFlow)[self.__indMid]
 
     def FlowConservationJacobian(self, v: np.array) -> np.array:
-        Jac = np.zeros((0, self.__numDecisionVariable))
-
-        for j in self.__G.GetMidCurrencies():
-            rowJac = np.zeros(self.__numDecisionVariable)
-            for i in self.__G.GetCurrencies():
-                for k in self.__G.GetExchanges():
-                    numerator = self.__G.GetStock(k, i) * self.__G.GetStock(k, j)
-                    denominator = (self.__G.GetStock(k, i) + v[self.__GetInd(i, j, k)]) ** 2
-                    rowJac[self.__GetInd(i, j, k)] = numerator / denominator
-                    rowJac[self.__GetInd(j, i, k)] = -1
-            Jac = np.vstack((Jac, rowJac))
+        X = v[:self.__numX]
+        rowIn, rowOut = self.__rowMid[self.__edgeJ], self.__rowMid[self.__edgeI]
+        edgeIn, edgeOut = np.flatnonzero(rowIn >= 0), np.flatnonzero(rowOut >= 0)
+
+        Jac = np.zeros((len(self.__indMid), self.__numDecisionVariable))
+        Jac[rowIn[edgeIn], edgeIn] = self.__GetDF(X)[edgeIn]
+        Jac[rowOut[edgeOut], edgeOut] = -1
 
         return Jac
 
     def InitCurrencyConstraint(self, v: np.array) ->np.array:
-        initCurrency = self.__G.GetInitCurrency()
-        
-        inFlow = 0
-        for i in self.__G.GetCurrencies():
-            for k in self.__G.GetExchanges():
-                inFlow += v[self.__GetInd(i, initCurrency, k)]
-
-        outFlow = 0
-        for j in self.__G.GetCurrencies():
-            for k in self.__G.GetExchanges():
-                outFlow += v[self.__GetInd(initCurrency, j, k)]
-
-        return np.array([inFlow, outFlow-self.__G.GetT0()])
+        return self.__AInit @ v - np.array([0, self.__G.GetT0()])
 
     def InitCurrencyConstraintJacobian(self, v: np.array) -> np.array:
-        initCurrency = self.__G.GetInitCurrency()
-
-        Jac = np.zeros((2, self.__numDecisionVariable))
-
-        for i in self.__G.GetCurrencies():
-            for k in self.__G.GetExchanges():
-                Jac[0, self.__GetInd(i, initCurrency, k)] = 1
-
-        for j in self.__G.GetCurrencies():
-            for k in self.__G.GetExchanges():
-                Jac[1, self.__GetInd(initCurrency, j, k)] = 1
-
-        return Jac
+        return self.__JacInit
 
     def TermCurrencyConstraint(self, v: np.array) ->np.array:
-        termCurrency = self.__G.GetTermCurrency()
-
-        outFlow = 0
-        for j in self.__G.GetCurrencies():
-            for k in self.__G.GetExchanges():
-                outFlow += v[self.__GetInd(termCurrency, j, k)]
-
-        return np.array([outFlow])
+        return self.__ATerm @ v
 
     def TermCurrencyConstraintJacobian(self, v: np.array) -> np.array:
-        termCurrency = self.__G.GetTermCurrency()
-
-        Jac = np.zeros(self.__numDecisionVariable)
-
-        for j in self.__G.GetCurrencies():
-            for k in self.__G.GetExchanges():
-                Jac[self.__GetInd(termCurrency, j, k)] = 1
-
-        return Jac
-
-    def SelfExchangeConstraint(self, v: np.array) -> np.array:
-        Mat = np.array([])
-
-        for j in self.__G.GetCurrencies():
-            Mat = np.append(Mat, sum(v[self.__GetInd(j, j, k)] for k in self.__G.GetExchanges()))
-
-        return Mat
-
-    def SelfExchangeConstraintJacobian(self, v: np.array) -> np.array:
-        Jac = np.zeros((0, self.__numDecisionVariable))
-
-        for j in self.__G.GetCurrencies():
-            rowJac = np.zeros(self.__numDecisionVariable)
-            for k in self.__G.GetExchanges():
-                rowJac[self.__GetInd(j, j, k)] = 1
-            Jac = np.vstack((Jac, rowJac))
-
-        return Jac
+        return self.__JacTerm
 
     def Objective(self, v: np.array) -> np.float64:
-        objective = 0
-        termCurrency = self.__G.GetTermCurrency()
-
-        for i in self.__G.GetCurrencies():
-            for k in self.__G.GetExchanges():
-                numerator = self.__G.GetStock(k, termCurrency) * v[self.__GetInd(i, termCurrency, k)]
-                denominator = self.__G.GetStock(k, i) + v[self.__GetInd(i, termCurrency, k)]
-                objective += numerator / denominator
-
-        return objective
+        return np.sum(self.__GetF(v[:self.__numX])[self.__edgeToD])
 
     def Jacobian(self, v: np.array) -> np.array:
         Jac = np.zeros(self.__numDecisionVariable)
-        termCurrency = self.__G.GetTermCurrency()
-
-        for i in self.__G.GetCurrencies():
-            for k in self.__G.GetExchanges():
-                numerator = self.__G.GetStock(k, i) * self.__G.GetStock(k, termCurrency)
-                denominator = (self.__G.GetStock(k, i) + v[self.__GetInd(i, termCurrency, k)]) ** 2
-                Jac[self.__GetInd(i, termCurrency, k)] = numerator / denominator
-
+        Jac[self.__edgeToD] = self.__GetDF(v[:self.__numX])[self.__edgeToD]
         return Jac
 
-    def AcyclicConstraint(self, v: np.array) -> np.array:  # todo: replace with linear constraint
-        Mat = np.zeros((0, self.__numDecisionVariable))
-
-        for i in self.__G.GetCurrencies():
-            for j in self.__G.GetCurrencies():
-                row = np.zeros((1, self.__numDecisionVariable))
-                row[0, self.__GetZInd(i, j)] = -1
-                for k in self.__G.GetExchanges():
-                    row[0, self.__GetInd(i, j, k)] = self.__bigM
-                Mat = np.vstack((Mat, row))
-
-        for i in self.__G.GetCurrencies():
-            for j in self.__G.GetCurrencies():
-                row = np.zeros((1, self.__numDecisionVariable))
-                row[0, self.__GetZInd(i, j)] = self.__bigM
-                for k in self.__G.GetExchanges():
-                    row[0, self.__GetInd(i, j, k)] = -1
-                Mat = np.vstack((Mat, row))
-
-        return Mat @ v
-
+    def AcyclicConstraint(self, v: np.array) -> np.array:
+        return self.__AAcyclic @ v
 
     def AcyclicJacobian(self, v: np.array) -> np.array:
-        Jac = np.zeros((0, self.__numDecisionVariable))
-
-        for i in self.__G.GetCurrencies():
-            for j in self.__G.GetCurrencies():
-                row = np.zeros((1, self.__numDecisionVariable))
-                row[0, self.__GetZInd(i, j)] = -1
-                for k in self.__G.GetExchanges():
-                    row[0, self.__GetInd(i, j, k)] = self.__bigM
-                Jac = np.vstack((Jac, row))
-
-        for i in self.__G.GetCurrencies():
-            for j in self.__G.GetCurrencies():
-                row = np.zeros((1, self.__numDecisionVariable))
-                row[0, self.__GetZInd(i, j)] = self.__bigM
-                for k in self.__G.GetExchanges():
-                    row[0, self.__GetInd(i, j, k)] = -1
-                Jac = np.vstack((Jac, row))
-
-        return Jac
-
+        return self.__JacAcyclic
 
+    @Traced('optimize')
     def Optimize(self, verbose=True) -> bool:
         initCurrencyConstraint =     {'type': 'eq',
-                                      'fun': lambda v: self.InitCurrencyConstraint(v),
-                                      'jac': lambda v: self.InitCurrencyConstraintJacobian(v)}
+                                      'fun': self.InitCurrencyConstraint,
+                                      'jac': self.InitCurrencyConstraintJacobian}
         termCurrencyConstraint =     {'type': 'eq',
-                                      'fun': lambda v: self.TermCurrencyConstraint(v),
-                                      'jac': lambda v: self.TermCurrencyConstraintJacobian(v)}
-        selfExchangeConstraint =     {'type': 'eq',
-                                      'fun': lambda v: self.SelfExchangeConstraint(v),
-                                      'jac': lambda v: self.SelfExchangeConstraintJacobian(v)}
+                                      'fun': self.TermCurrencyConstraint,
+                                      'jac': self.TermCurrencyConstraintJacobian}
         flowConservationConstraint = {'type': 'eq',
-                                      'fun': lambda v: self.FlowConservation(v),
-                                      'jac': lambda v: self.FlowConservationJacobian(v)}
+                                      'fun': self.FlowConservation,
+                                      'jac': self.FlowConservationJacobian}
         AcyclicConstraint =          {'type': 'ineq',
-                                      'fun': lambda v: self.AcyclicConstraint(v),
-                                      'jac': lambda v: self.AcyclicJacobian(v)}
+                                      'fun': self.AcyclicConstraint,
+                                      'jac': self.AcyclicJacobian}
+
+        if self.__o is None or self.__d is None or self.__G.GetT0() is None:  # index arrays and flow bounds are built once by the constructor
+            raise Exception("Initial currency, terminal currency and its quantity must be set before SLSQPManager is constructed")
+        if self.__numPatches != self.__G.GetNumPatches():
+            raise Exception("Stocks were patched after SLSQPManager was constructed, construct it again.")
 
         lb = np.concatenate((np.zeros(self.__numX), np.zeros(self.__numZ)))
-        ub = np.concatenate((np.full(self.__numX, np.inf), np.ones(self.__numZ)))
+        ub = np.concatenate((self.__flowBounds[self.__edgeI], np.ones(self.__numZ)))
         bounds = Bounds(lb, ub)
-
         startTime = time.time()
+        self.__numEvaluations = {'iterations': 0, 'objective': 0, 'jacobian': 0}
 
         for initPoint in self.__initPoints:
             self.__result = minimize(self.Objective, initPoint, method='SLSQP', jac=self.Jacobian,
                                      constraints=[initCurrencyConstraint, termCurrencyConstraint,
-                                                  selfExchangeConstraint, flowConservationConstraint, AcyclicConstraint],
+                                                  flowConservationConstraint, AcyclicConstraint],
                                      options={'ftol': self.__tolerance, 'disp': verbose},
                                      bounds=bounds)
+            for name, counter, number in (('iterations', 'SLSQP iterations', self.__result.nit), ('objective', 'SLSQP objective evaluations', self.__result.nfev),
+                                          ('jacobian', 'SLSQP Jacobian evaluations', self.__result.njev)):
+                self.__numEvaluations[name] += number
+                OptionalCount(self.GetProfiler(), counter, number)
 
             if not self.__result.success:
                 print('Fail to solve the model: {}'.format(self.__result.message))
@@ -245,41 +192,54 @@ class SLSQPManager:
         if v is None: v = np.zeros(self.__numDecisionVariable)
         self.__initPoints.append(v)
 
+    def GetObjective(self) -> float:
+        return self.__result.fun
+
+    def GetOptTime(self) -> float:
+        return self.__timeOptimization
+
+    # iterations, objective and Jacobian evaluations of last Optimize summed over init points
+    def GetNumEvaluations(self) -> dict:
+        return self.__numEvaluations
+
+    def GetNumVars(self) -> int:
+        return self.__numDecisionVariable
+
+    # init (2), term (1), flow conservation (#mid) and acyclic (2 per pair) constraints
+    def GetNumConstrs(self) -> int:
+        return 3 + len(self.__indMid) + 2 * self.__numZ
+
+    # get (i, j, k) -> quantity of last solution, e.g. to start ExactModelSolver
+    def GetX(self) -> dict:
+        return dict(zip(self.__G.GetEdges(), self.__result.x[:self.__numX]))
+
+    @Traced('export')
     def OutputResult(self, pathResult: str) -> float:
         if not self.__result.success:
             raise Exception('Fail to solve the model: {}'.format(self.__result.message))
 
-        exchanges = self.__G.GetExchanges()
-        currencies = self.__G.GetCurrencies()
+        x = np.round(self.__result.x, decimals=4)
+        X, Z = x[:self.__numX], x[self.__numX:]
 
         with open(pathResult, 'w') as f:
             f.write('Optimal objective: {} {}\n'.format(self.__result.fun, self.__G.GetTermCurrency()))
             f.write('Number of decision variables: {}\n'.format(len(self.__result.x)))
+            f.write('Iterations: {iterations}, objective evaluations: {objective}, Jacobian evaluations: {jacobian}\n'.format(**self.__numEvaluations))
 
             f.write('\nValues of non-zero decision variables:\n')
-            for i in currencies:
-                for j in currencies:
-                    for k in exchanges:
-                        value = np.round(self.__result.x[self.__GetInd(i, j, k)], decimals=4)
-                        if value == 0.0: continue
-                        f.write('X[{}, {}, {}] = {}\n'.format(i, j, k, value))
-
-            for i in currencies:
-                for j in currencies:
-                        value = np.round(self.__result.x[self.__GetZInd(i, j)], decimals=4)
-                        if value == 0.0: continue
-                        f.write('Z[{}, {}] = {}\n'.format(i, j, value))
+            for (i, j, k), value in zip(self.__G.GetEdges(), X):
+                if value == 0.0: continue
+                f.write('X[{}, {}, {}] = {}\n'.format(i, j, k, value))
+
+            for (i, j), value in zip(self.__G.GetPairs(), Z):
+                if value == 0.0: continue
+                f.write('Z[{}, {}] = {}\n'.format(i, j, value))
 
             f.write('\nValues of all decision variables:\n')
-            for i in currencies:
-                for j in currencies:
-                    for k in exchanges:
-                        value = np.round(self.__result.x[self.__GetInd(i, j, k)], decimals=4)
-                        f.write('X[{}, {}, {}] = {}\n'.format(i, j, k, value))
-
-            for i in currencies:
-                for j in currencies:
-                        value = np.round(self.__result.x[self.__GetZInd(i, j)], decimals=4)
-                        f.write('Z[{}, {}] = {}\n'.format(i, j, value))
+            for (i, j, k), value in zip(self.__G.GetEdges(), X):
+                f.write('X[{}, {}, {}] = {}\n'.format(i, j, k, value))
+
+            for (i, j), value in zip(self.__G.GetPairs(), Z):
+                f.write('Z[{}, {}] = {}\n'.format(i, j, value))
         
         return self.__timeOptimization
@@ -1,7 +1,13 @@
+import numpy as np
 from yaml import dump, Dumper
 from GraphManager import Exchange
 from random import uniform
 
+try:
+    from yaml import CDumper as FastDumper  # libyaml binding is much faster when available
+except ImportError:
+    FastDumper = Dumper
+
 
 class SampleDataGenerator:
 
@@ -10,6 +16,12 @@ class SampleDataGenerator:
         self.__numExchanges = None
         self.__currencies = None
         self.__data = []
+        self.__degree = None  # currencies listed per exchange, None: all currencies
+        self.__seed = None
+        self.__liquidityExponent = 1.5  # pareto tail index of exchange and pool liquidity
+        self.__popularityExponent = 1.0  # currency listed with probability ~ rank^-exponent
+        self.__mispricing = 0.01  # relative deviation of pool prices from reference prices
+        self.__maxDraws = 1000  # draws of exchange listings to find a market connecting o and d
 
     def SetNumCurrencies(self, numCurrencies: int) -> None:
         self.__numCurrencies = numCurrencies
@@ -17,6 +29,21 @@ class SampleDataGenerator:
     def SetNumExchanges(self, numExchanges: int) -> None:
         self.__numExchanges = numExchanges
 
+    def SetDegree(self, degree: int) -> None:
+        self.__degree = degree
+
+    def SetSeed(self, seed: int) -> None:
+        self.__seed = seed
+
+    def SetLiquidityExponent(self, liquidityExponent: float) -> None:
+        self.__liquidityExponent = liquidityExponent
+
+    def SetPopularityExponent(self, popularityExponent: float) -> None:
+        self.__popularityExponent = popularityExponent
+
+    def SetMispricing(self, mispricing: float) -> None:
+        self.__mispricing = mispricing
+
     def Rand(self, lb: float, ub: float) -> float:
         return uniform(lb, ub)
 
@@ -47,3 +74,70 @@ class SampleDataGenerator:
     def DumpData(self, pathData: str) -> None:
         with open(pathData, 'w') as dataFile:
             dump(self.__data, dataFile, Dumper=Dumper)
+
+    # draw reference prices and currency popularity, same seed gives same market
+    def __InitMarket(self) -> tuple:
+        rng = np.random.default_rng(self.__seed)
+        others = ['c'+str(i+1) for i in range(self.__numCurrencies-2)]
+        currencies = others[:2] + ['o', 'd'] + others[2:]  # by popularity: c1 and c2 are hubs, o and d are well listed
+        prices = np.exp(rng.normal(0.0, 2.0, len(currencies)))  # value of one unit of each currency
+        popularity = (1.0 + np.arange(len(currencies))) ** -self.__popularityExponent
+        return rng, currencies, prices, popularity / np.sum(popularity)
+
+    # listed currencies of every exchange as indices and exchange liquidity in value units,
+    # all listings are drawn again until exchanges sharing currencies connect o and d, so that every market has a route
+    def __DrawExchanges(self, rng: np.random.Generator, currencies: list, popularity: np.array) -> list:
+        degree = len(currencies) if self.__degree is None else min(self.__degree, len(currencies))
+        if degree < 2:
+            raise Exception('Invalid degree: {}, an exchange lists at least 2 currencies'.format(degree))
+
+        for _ in range(self.__maxDraws):
+            exchanges = []
+            for k in range(self.__numExchanges):
+                listed = rng.choice(len(currencies), size=degree, replace=False, p=popularity)
+                liquidity = 1e4 * (1.0 + rng.pareto(self.__liquidityExponent))
+                exchanges.append(('K'+str(k+1), listed, liquidity))
+            if self.__Connects([set(listed.tolist()) for _, listed, _ in exchanges], currencies.index('o'), currencies.index('d')):
+                return exchanges
+
+        raise Exception('No market connecting o and d in {} draws, raise degree or number of exchanges'.format(self.__maxDraws))
+
+    # an exchange trades between any two currencies it lists
+    def __Connects(self, listings: list, o: int, d: int) -> bool:
+        reached, grown = {o}, True
+        while grown:
+            grown = False
+            for listed in listings:
+                if listed.isdisjoint(reached) or listed.issubset(reached): continue
+                reached.update(listed)
+                grown = True
+        return d in reached
+
+    # stocks of currencies with values split by power law weights, priced close to reference prices
+    def __DrawStocks(self, rng: np.random.Generator, liquidity: float, prices: np.array) -> np.array:
+        shares = 1.0 + rng.pareto(self.__liquidityExponent, len(prices))
+        noise = np.exp(rng.normal(0.0, self.__mispricing, len(prices)))
+        return liquidity * shares / np.sum(shares) / prices * noise
+
+    # generate sparse market for GraphManager and write it exchange by exchange, zero processing fees are omitted
+    def DumpMarket(self, pathData: str) -> None:
+        rng, currencies, prices, popularity = self.__InitMarket()
+
+        with open(pathData, 'w') as dataFile:
+            for nameExchange, listed, liquidity in self.__DrawExchanges(rng, currencies, popularity):
+                stocks = self.__DrawStocks(rng, liquidity, prices[listed])
+                exchange = {'nameExchange': nameExchange, 'stocks': {currencies[i]: float(stock) for i, stock in zip(listed, stocks)}}
+                dataFile.write(dump([exchange], Dumper=FastDumper, default_flow_style=None, width=2**30))
+
+    # generate sparse market of pools for Model2 ExchangeManager and write it row by row as csv
+    def DumpPools(self, pathData: str) -> None:
+        rng, currencies, prices, popularity = self.__InitMarket()
+
+        with open(pathData, 'w') as dataFile:
+            dataFile.write('Exchange,Currency1,Currency2,Stock1,Stock2\n')
+            for nameExchange, listed, liquidity in self.__DrawExchanges(rng, currencies, popularity):
+                for a in range(len(listed)):
+                    for b in range(a+1, len(listed)):
+                        i, j = listed[a], listed[b]
+                        stocks = self.__DrawStocks(rng, liquidity / len(listed), prices[[i, j]])
+                        dataFile.write('{},{},{},{!r},{!r}\n'.format(nameExchange, currencies[i], currencies[j], float(stocks[0]), float(stocks[1])))
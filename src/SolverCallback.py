@@ -0,0 +1,69 @@
+import gurobipy as gp
+from gurobipy import GRB
+from Profiler import Profiler, OptionalSpan, OptionalCount
+
+
+# cycles among used pairs, a pair of every found cycle is dropped until the rest is acyclic
+def FindCycles(pairs: list) -> list:
+    successors = {}
+    for i, j in pairs: successors.setdefault(i, set()).add(j)
+
+    def FindCycle() -> list:
+        state = {}  # 1: on current path, 2: finished
+        for root in successors:
+            if root in state: continue
+            path, nexts = [root], [iter(successors[root])]
+            state[root] = 1
+            while path:
+                j = next(nexts[-1], None)
+                if j is None:
+                    state[path.pop()] = 2
+                    nexts.pop()
+                elif state.get(j) == 1:
+                    nodes = path[path.index(j):]
+                    return list(zip(nodes, nodes[1:] + [j]))
+                elif j not in state:
+                    state[j] = 1
+                    path.append(j)
+                    nexts.append(iter(successors.get(j, ())))
+        return None
+
+    cycles = []
+    while (cycle := FindCycle()) is not None:
+        cycles.append(cycle)
+        successors[cycle[0][0]].discard(cycle[0][1])
+    return cycles
+
+
+# reject incumbent whose used pairs contain a cycle: at most len(cycle) - 1 pairs of the cycle may be used;
+# Y: keys starting with the pair (i, j), e.g. (i, j, k) or (i, j, k, p), Z: (i, j) -> binary variable of the pair
+def AddLazyCycleCuts(model: gp.Model, Y: dict, Z: dict, profiler: Profiler = None) -> bool:
+    with OptionalSpan(profiler, 'lazy cuts'):
+        keys = list(Y.keys())
+        pairs = set(key[:2] for key, y in zip(keys, model.cbGetSolution([Y[key] for key in keys])) if y > 0.5)
+        cycles = FindCycles(list(pairs))
+        for cycle in cycles:
+            model.cbLazy(gp.quicksum(Z[pair] for pair in cycle) <= len(cycle) - 1)
+    OptionalCount(profiler, 'cycle cuts', len(cycles))
+    return len(cycles) > 0
+
+
+# MIPSOL callback passing every incumbent to onIncumbent(model);
+# gurobi ignores errors raised in callbacks: stop the solve and re-raise once optimize returns
+class IncumbentCallback:
+
+    def __init__(self, onIncumbent) -> None:
+        self.__onIncumbent = onIncumbent
+        self.__error = None
+
+    def __call__(self, model: gp.Model, where: int) -> None:
+        try:
+            if where == GRB.Callback.MIPSOL: self.__onIncumbent(model)
+        except Exception as error:
+            self.__error = error
+            model.terminate()
+
+    def RaiseError(self) -> None:
+        if self.__error is None: return
+        error, self.__error = self.__error, None
+        raise error
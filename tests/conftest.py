@@ -0,0 +1,143 @@
+import sys
+from os.path import abspath, dirname, join
+
+import pytest
+
+pathSrc = join(dirname(dirname(abspath(__file__))), 'src')
+sys.path[:0] = [pathSrc, join(pathSrc, 'Model2')]
+
+MARKET = """Exchange,Currency1,Currency2,Stock1,Stock2
+Uniswap,UNI,ETH,500000,4200
+Uniswap,ETH,USDT,20000,43800000
+Uniswap,ETH,USDC,30000,65700000
+Uniswap,USDT,USDC,1000000,997500
+Sushiswap,UNI,ETH,200000,1690
+Sushiswap,ETH,USDT,10000,21900000
+Sushiswap,UNI,USDT,50000,880000
+Balancer,UNI,USDC,80000,1400000
+Balancer,ETH,USDC,5000,10950000
+Balancer,DAI,WBTC,1000000,25
+"""
+
+
+# small pool file: DAI and WBTC only trade with each other
+@pytest.fixture
+def pathMarket(tmp_path) -> str:
+    pathData = tmp_path / 'market.csv'
+    pathData.write_text(MARKET)
+    return str(pathData)
+
+
+@pytest.fixture
+def exchangeManager(pathMarket):
+    from ExchangeManager import ExchangeManager
+    EM = ExchangeManager()
+    EM.ImportData(pathMarket)
+    return EM
+
+
+FEEDERS = """- nameExchange: K1
+  stocks:
+    a: 1000.0
+    b: 1000.0
+    i: 10.0
+- nameExchange: K2
+  stocks:
+    o: 10000.0
+    a: 1000000.0
+- nameExchange: K3
+  stocks:
+    o: 10000.0
+    b: 1000000.0
+- nameExchange: K4
+  stocks:
+    i: 1.0
+    d: 100.0
+"""
+
+
+# GraphManager market: a and b both sell into i through K1, o holds T0 = 10000
+@pytest.fixture
+def feeders(tmp_path):
+    from GraphManager import GraphManager
+    pathData = tmp_path / 'feeders.yaml'
+    pathData.write_text(FEEDERS)
+    graphManager = GraphManager()
+    graphManager.LoadData(str(pathData))
+    graphManager.SetInitCurrency('o')
+    graphManager.SetTermCurrency('d')
+    graphManager.SetInitCurrencyQuantity(10000.0)
+    return graphManager
+
+
+# quantity of i received by o -> a -> i and o -> b -> i with half of T0 each, every edge trades on its own copy of K1's stocks
+@pytest.fixture
+def feederFlow() -> float:
+    a = 1000000.0 * 5000.0 / (10000.0 + 5000.0)
+    return 2 * 10.0 * a / (1000.0 + a)
+
+
+@pytest.fixture
+def case3():
+    from GraphManager import GraphManager
+    graphManager = GraphManager()
+    graphManager.LoadData(join(pathSrc, 'Cases', 'DataCase3.yaml'))
+    graphManager.SetInitCurrency('o')
+    graphManager.SetTermCurrency('d')
+    graphManager.SetInitCurrencyQuantity(1.0)
+    graphManager.SetFeeLimit(float('inf'))
+    return graphManager
+
+
+CYCLE = """- nameExchange: K1
+  stocks:
+    o: 1000.0
+    a: 1000.0
+- nameExchange: K2
+  stocks:
+    a: 1000.0
+    b: 2000.0
+- nameExchange: K3
+  stocks:
+    b: 1000.0
+    a: 2000.0
+- nameExchange: K4
+  stocks:
+    a: 1000.0
+    d: 1000.0
+"""
+
+CYCLE_POOLS = """Exchange,Currency1,Currency2,Stock1,Stock2
+K1,O,A,1000,1000
+K1,A,D,1000,1000
+K2,A,B,1000,2000
+K3,B,A,1000,2000
+"""
+
+
+# GraphManager market: a -> b on K2 and b -> a on K3 both pay 2 per unit at spot, so a route wants to trade around a -> b -> a
+@pytest.fixture
+def cycleGraph(tmp_path):
+    from GraphManager import GraphManager
+    pathData = tmp_path / 'cycle.yaml'
+    pathData.write_text(CYCLE)
+    graphManager = GraphManager()
+    graphManager.LoadData(str(pathData))
+    graphManager.SetInitCurrency('o')
+    graphManager.SetTermCurrency('d')
+    graphManager.SetInitCurrencyQuantity(10.0)
+    return graphManager
+
+
+# the same cycle as Model2 pools from O to D, small enough for the size-limited license
+@pytest.fixture
+def cycleMarket(tmp_path):
+    from ExchangeManager import ExchangeManager
+    pathData = tmp_path / 'cycle.csv'
+    pathData.write_text(CYCLE_POOLS)
+    EM = ExchangeManager()
+    EM.ImportData(str(pathData))
+    EM.SetInitCurrency('O')
+    EM.SetTermCurrency('D')
+    EM.SetInitCurrencyQuantity(10.0)
+    return EM
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from ArbitrageDetector import ArbitrageDetector
+from ExchangeManager import ExchangeManager
+from GraphManager import GraphManager
+
+MARKET = """Exchange,Currency1,Currency2,Stock1,Stock2
+K1,A,B,1000,2000
+K2,B,C,3000,1500
+K3,C,A,1000,1000
+"""
+
+
+@pytest.fixture
+def detector(tmp_path) -> ArbitrageDetector:
+    pathData = tmp_path / 'market.csv'
+    pathData.write_text(MARKET)
+    EM = ExchangeManager()
+    EM.ImportData(str(pathData))
+    detector = ArbitrageDetector()
+    detector.LoadExchangeManager(EM)
+    return detector
+
+
+# trade x along pools given as (stock sold into, stock bought from)
+def Trade(pools: list, x: float) -> float:
+    for a, b in pools: x = b * x / (a + x)
+    return x
+
+
+def test_balanced_market_has_no_cycle(detector):
+    assert detector.Scan() == []
+
+
+def test_cycle_is_sized_at_its_best_input(detector):
+    detector.Scan()  # the scan after the patch starts from these potentials
+    detector.ApplyPatches([('K3', 'C', 'A', 1000, 1200)])  # A -> B -> C -> A now pays 1.2 per A at spot
+    routes = detector.Scan()
+    assert len(routes) == 1
+
+    route = routes[0]
+    pools = {('A', 'B'): (1000, 2000), ('B', 'C'): (3000, 1500), ('C', 'A'): (1000, 1200)}
+    hops = route.GetHops()
+    cycle = [pools[hop['initCurrency'], hop['termCurrency']] for hop in hops]
+    assert [hop['exchange'] for hop in hops] == [{'A': 'K1', 'B': 'K2', 'C': 'K3'}[hop['initCurrency']] for hop in hops]
+
+    inputs = np.linspace(0, route.GetQuantity() * 3, 30001)
+    bestProfit = max(Trade(cycle, x) - x for x in inputs)
+    assert route.GetObjective() == pytest.approx(Trade(cycle, route.GetQuantity()) - route.GetQuantity())
+    assert route.GetObjective() >= bestProfit - 1e-9
+    assert route.GetObjective() == pytest.approx(bestProfit, rel=1e-6)
+
+
+def test_min_gain_filters_cycles(detector):
+    detector.ApplyPatches([('K3', 'C', 'A', 1000, 1200)])
+    detector.SetMinGain(0.25)
+    assert detector.Scan() == []
+
+
+def test_patching_unknown_pool_raises(detector):
+    with pytest.raises(Exception, match='is not loaded'):
+        detector.ApplyPatches([('K4', 'A', 'C', 1, 1)])
+
+
+GRAPH = """- nameExchange: K1
+  stocks:
+    A: 100.0
+    B: 100.0
+    C: 100.0
+- nameExchange: K2
+  stocks:
+    B: 100.0
+    C: 300.0
+"""
+
+
+@pytest.fixture
+def graphManager(tmp_path) -> GraphManager:
+    pathData = tmp_path / 'market.yaml'
+    pathData.write_text(GRAPH)
+    graphManager = GraphManager()
+    graphManager.LoadData(str(pathData))
+    return graphManager
+
+
+# as in ExactModelSolver, every edge of a GraphManager exchange trades on its own copy of the stocks,
+# so a cycle through K1 twice is sized like a cycle of separate pools
+def test_graph_cycle_trades_on_stocks_of_its_edges(graphManager):
+    detector = ArbitrageDetector()
+    detector.LoadGraphManager(graphManager)
+    routes = detector.Scan()
+    assert routes
+
+    for route in routes:
+        hops = route.GetHops()
+        cycle = [(graphManager.GetStock(hop['exchange'], hop['initCurrency']), graphManager.GetStock(hop['exchange'], hop['termCurrency'])) for hop in hops]
+        x = route.GetQuantity()
+        assert route.GetObjective() == pytest.approx(Trade(cycle, x) - x)
+        assert route.GetObjective() == pytest.approx(max(Trade(cycle, y) - y for y in np.linspace(0, 3 * x, 30001)), rel=1e-6)
+    assert any(len({hop['exchange'] for hop in route.GetHops()}) < len(route.GetHops()) for route in routes)
+
+
+# a GraphManager patch reprices every edge of the exchange trading a patched currency
+def test_graph_patch_reprices_every_edge_of_exchange(graphManager):
+    detector = ArbitrageDetector()
+    detector.LoadGraphManager(graphManager)
+    assert detector.Scan()
+    detector.ApplyPatches([('K2', 'B', 'C', 300.0, 300.0)])
+    assert detector.Scan() == []
+    with pytest.raises(Exception, match='is not loaded'):
+        detector.ApplyPatches([('K2', 'A', 'B', 1, 1)])
@@ -0,0 +1,59 @@
+import pytest
+
+pytest.importorskip('gurobipy')
+from BatchModelSolver import BatchModelSolver
+
+
+# the Balancer DAI/WBTC pool has no rate into USDT and never joins a route
+def test_batch_on_market_with_unconnected_pool(exchangeManager):
+    BMS = BatchModelSolver(exchangeManager, verbose=False)
+    BMS.AddOrder('UNI', 'USDT', 100)
+    BMS.AddOrder('ETH', 'USDT', 1)
+    BMS.Update()
+    BMS.Optimize()
+
+    routes = BMS.GetRoutes()
+    assert [(route.GetInitCurrency(), route.GetTermCurrency()) for route in routes] == [('UNI', 'USDT'), ('ETH', 'USDT')]
+    for route in routes:
+        assert route.GetAmountOut() > 0
+        assert route.GetObjective() == pytest.approx(route.GetAmountOut() - route.GetFee(), rel=1e-6)
+        assert {hop['initCurrency'] for hop in route.GetHops()}.isdisjoint({'DAI', 'WBTC'})
+    assert BMS.GetObjective() == pytest.approx(sum(route.GetObjective() for route in routes), rel=1e-6)
+
+
+def test_unknown_currency_is_rejected(exchangeManager):
+    with pytest.raises(Exception, match='No pool trades BTC'):
+        BatchModelSolver(exchangeManager, verbose=False).AddOrder('UNI', 'BTC', 100)
+
+
+# two UNI -> USDT orders on the same two pools: the second order trades on reserves the first one moved,
+# so together they get less than two independent solves on the untouched pools
+def test_later_order_trades_on_reserves_moved_by_earlier_order(tmp_path):
+    from ExchangeManager import ExchangeManager
+    from ModelSolver import ModelSolver
+    pathData = tmp_path / 'pools.csv'
+    pathData.write_text("Exchange,Currency1,Currency2,Stock1,Stock2\nUniswap,UNI,USDT,50000,880000\nSushiswap,UNI,USDT,20000,350000\n")
+    EM = ExchangeManager()
+    EM.ImportData(str(pathData))
+
+    BMS = BatchModelSolver(EM, verbose=False)
+    BMS.AddOrder('UNI', 'USDT', 5000)
+    BMS.AddOrder('UNI', 'USDT', 5000)
+    BMS.Update()
+    BMS.Optimize()
+    first, second = BMS.GetRoutes()
+
+    moved = {hop['exchange']: (hop['amountIn'], hop['amountOut']) for hop in first.GetHops()}
+    assert moved
+    for hop in second.GetHops():
+        paidIn, takenOut = moved.get(hop['exchange'], (0.0, 0.0))
+        a, b = EM.GetV('UNI', 'USDT', hop['exchange']) + paidIn, EM.GetV('USDT', 'UNI', hop['exchange']) - takenOut
+        assert hop['amountOut'] == pytest.approx(b * hop['amountIn'] / (a + hop['amountIn']), rel=1e-6)
+
+    EM.SetInitCurrency('UNI')
+    EM.SetTermCurrency('USDT')
+    EM.SetInitCurrencyQuantity(5000)
+    MS = ModelSolver(EM, verbose=False)
+    MS.Update()
+    MS.Optimize()
+    assert BMS.GetObjective() < 2 * MS.GetObjective() * (1 - 1e-3)
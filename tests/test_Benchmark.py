@@ -0,0 +1,43 @@
+import csv
+
+from Benchmark import Benchmark
+
+FIELDS = ('case', 'solver', 'numVars', 'numConstrs', 'setupTime', 'solveTime', 'objective', 'MIPGap', 'status')
+
+
+def WriteResult(path, rows: list) -> str:
+    with open(path, 'w', newline='') as resultFile:
+        writer = csv.DictWriter(resultFile, fieldnames=FIELDS, restval='')
+        writer.writeheader()
+        writer.writerows(dict(zip(FIELDS, row)) for row in rows)
+    return str(path)
+
+
+def Compare(tmp_path, baseline: list, current: list) -> list:
+    B = Benchmark(str(tmp_path))
+    B.ImportResult(WriteResult(tmp_path / 'current.csv', current))
+    return B.Compare(WriteResult(tmp_path / 'baseline.csv', baseline), timeTolerance=0.5)
+
+
+def test_unchanged_records_pass(tmp_path):
+    rows = [('Tiny', 'ModelSolver', 10, 20, 0.1, 1.0, 5.0, 0.0, 2), ('Tiny', 'SLSQPManager', 4, 3, 0.1, 0.2, 'nan', 'nan', 'success')]
+    assert Compare(tmp_path, rows, rows) == []
+
+
+def test_status_change_is_a_regression(tmp_path):
+    regressions = Compare(tmp_path, [('Small', 'ExactModelSolver', 10, 20, 0.1, 1.0, 5.0, 0.0, 2)],
+                          [('Small', 'ExactModelSolver', 10, 20, 0.1, 1.0, 5.0, 0.0, 9)])
+    assert regressions == ['Small ExactModelSolver: status 2 -> 9']
+
+
+def test_slower_solve_is_a_regression_above_tolerance_only(tmp_path):
+    baseline = [('Medium', 'ModelSolver', 10, 20, 0.5, 1.5, 5.0, 0.0, 2), ('Large', 'ModelSolver', 10, 20, 0.5, 1.5, 5.0, 0.0, 2)]
+    current = [('Medium', 'ModelSolver', 10, 20, 0.5, 3.5, 5.0, 0.0, 2), ('Large', 'ModelSolver', 10, 20, 0.5, 2.4, 5.0, 0.0, 2)]
+    assert Compare(tmp_path, baseline, current) == ['Medium ModelSolver: time 2.0000 -> 4.0000 seconds']
+
+
+# an error record has neither times nor objective: status and lost objective are reported, times are not compared
+def test_missing_objective_is_a_regression(tmp_path):
+    baseline = [('Huge', 'ModelSolver', 10, 20, 0.5, 1.5, 5.0, 0.0, 2), ('Huge', 'ExactModelSolver', 10, 20, 0.5, 1.5, 'nan', 'nan', 9)]
+    current = [('Huge', 'ModelSolver', '', '', '', '', '', '', 'error: out of memory'), ('Huge', 'ExactModelSolver', 10, 20, 0.5, 1.5, 'nan', 'nan', 9)]
+    assert Compare(tmp_path, baseline, current) == ['Huge ModelSolver: status 2 -> error: out of memory', 'Huge ModelSolver: objective 5.0 -> nan']
@@ -0,0 +1,111 @@
+import pytest
+
+pytest.importorskip('gurobipy')
+from ExactModelSolver import ExactModelSolver
+from Profiler import Profiler
+
+
+def Solve(graphManager, **options) -> ExactModelSolver:
+    EMS = ExactModelSolver(graphManager, verbose=False)
+    if options.get('lazy'): EMS.SetLazyCycleElimination(True)
+    if options.get('matrix'): EMS.SetMatrixBuild(True)
+    if options.get('piecewise'): EMS.SetPiecewiseLinear(*options['piecewise'])
+    EMS.Update()
+    EMS.Optimize()
+    return EMS
+
+
+# derived big-M must not cut off i selling what both feeders deliver into d
+@pytest.mark.parametrize('options', [{}, {'matrix': True}])
+def test_tight_big_m_keeps_route_through_shared_exchange(feeders, feederFlow, options):
+    assert Solve(feeders, **options).GetObjective() >= 100.0 * feederFlow / (1.0 + feederFlow) * (1 - 1e-3)  # default MIP gap
+
+
+# lazy cuts reject incumbents trading around a -> b -> a and end at the MTZ optimum
+@pytest.mark.parametrize('options', [{'lazy': True}, {'matrix': True, 'lazy': True}])
+def test_lazy_cycle_cuts_match_mtz_on_cycle(cycleGraph, options):
+    reference = Solve(cycleGraph).GetObjective()
+    profiler = Profiler()
+    cycleGraph.SetProfiler(profiler)
+    assert Solve(cycleGraph, **options).GetObjective() == pytest.approx(reference, rel=1e-3)
+    assert profiler.GetCounts()['cycle cuts'] > 0
+
+
+@pytest.mark.parametrize('options', [{'lazy': True}, {'matrix': True, 'lazy': True}])
+def test_lazy_cycle_elimination_matches_mtz(case3, options):
+    assert Solve(case3, **options).GetObjective() == pytest.approx(Solve(case3).GetObjective(), rel=1e-3)
+
+
+# tangents bound the exact output from above: the route re-evaluated with exact outputs stays below the model objective,
+# refinement brings it close to the exact optimum
+def test_piecewise_route_is_bounded_by_model_objective(case3):
+    exact = Solve(case3).GetObjective()
+    EMS = Solve(case3, piecewise=(4, 3))
+    objective = EMS.GetRoute().GetObjective()
+    assert objective <= EMS.GetObjective() * (1 + 1e-9)
+    assert EMS.GetObjective() >= exact * (1 - 1e-4)  # default MIP gap
+    assert objective == pytest.approx(exact, rel=1e-3)
+
+
+def test_matrix_build_matches_expression_build(case3):
+    reference, EMS = Solve(case3), Solve(case3, matrix=True)
+    assert (EMS.GetNumVars(), EMS.GetNumConstrs()) == (reference.GetNumVars(), reference.GetNumConstrs())
+    assert EMS.GetObjective() == pytest.approx(reference.GetObjective(), rel=1e-3)
+
+
+# the optimal X as MIP start is feasible and worth the optimum, both compared solves reach it
+def test_mip_start_from_solution_keeps_optimum(case3):
+    reference = Solve(case3)
+    EMS = ExactModelSolver(case3, verbose=False)
+    EMS.Update()
+    EMS.SetMIPStart(reference.GetX())
+    assert EMS.GetStartObjective() == pytest.approx(reference.GetObjective(), rel=1e-6)
+
+    comparison = EMS.CompareMIPStart()
+    assert set(comparison) == {'without start', 'with start'}
+    assert comparison['with start']['objective'] == pytest.approx(comparison['without start']['objective'], rel=1e-3)
+    assert comparison['with start']['objective'] == pytest.approx(reference.GetObjective(), rel=1e-3)
+
+
+def test_compare_without_mip_start_raises(case3):
+    EMS = ExactModelSolver(case3, verbose=False)
+    EMS.Update()
+    with pytest.raises(Exception, match='No MIP start set'):
+        EMS.CompareMIPStart()
+
+
+# the callback sees strictly improving incumbents only, the last one is the optimum
+def test_incumbent_callback_streams_improving_routes(case3):
+    incumbents = []
+    EMS = ExactModelSolver(case3, verbose=False)
+    EMS.SetIncumbentCallback(lambda route, gap, runtime: incumbents.append((route.GetObjective(), gap)))
+    EMS.SetTimeLimit(60)
+    EMS.Update()
+    EMS.Optimize()
+
+    assert EMS.HasSolution() and incumbents
+    objectives = [objective for objective, _ in incumbents]
+    assert objectives == sorted(set(objectives))
+    assert objectives[-1] == pytest.approx(EMS.GetObjective(), rel=1e-6)
+    assert all(gap >= 0 for _, gap in incumbents)
+
+
+def test_incumbent_callback_error_is_raised(case3):
+    def Fail(route, gap, runtime):
+        raise ValueError('callback failed')
+
+    EMS = ExactModelSolver(case3, verbose=False)
+    EMS.SetIncumbentCallback(Fail)
+    EMS.Update()
+    with pytest.raises(ValueError, match='callback failed'):
+        EMS.Optimize()
+
+
+# no exchange of the feeder market lists every currency: X, F, Y exist per listed edge, Z per traded pair and U per currency only
+@pytest.mark.parametrize('options', [{}, {'matrix': True}])
+def test_variables_exist_on_listed_edges_only(feeders, options):
+    assert any(len(exchange.GetStocks()) < feeders.GetNumCurrencies() for exchange in feeders.GetExchanges().values())
+    EMS = Solve(feeders, **options)
+    assert EMS.GetNumVars() == 3 * len(feeders.GetEdges()) + len(feeders.GetPairs()) + feeders.GetNumCurrencies()
+    assert EMS.HasSolution()
+    assert set(EMS.GetX()) == set(feeders.GetEdges())
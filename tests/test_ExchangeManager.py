@@ -0,0 +1,181 @@
+import pytest
+
+
+def test_reserves_are_indexed_in_both_directions(exchangeManager):
+    for exchange, currency1, currency2, stock1, stock2 in exchangeManager.GetData().itertuples(index=False):
+        assert exchangeManager.GetV(currency1, currency2, exchange) == stock1
+        assert exchangeManager.GetV(currency2, currency1, exchange) == stock2
+    assert exchangeManager.GetV('UNI', 'WBTC', 'Balancer') == -1
+    assert exchangeManager.GetV('UNI', 'ETH', 'Balancer') == -1
+
+
+def test_pool_arrays_match_index_after_patch(exchangeManager):
+    exchangeManager.ApplyPatches([('Sushiswap', 'UNI', 'USDT', 60000, 900000), ('Curve', 'USDT', 'LINK', 100000, 7000)])
+    exchanges, currencies1, currencies2, stocks1, stocks2 = exchangeManager.GetPoolArrays()
+
+    assert len(exchanges) == 2 * (len(exchangeManager.GetData()) + 1)
+    for k, i, j, stockI, stockJ in zip(exchanges, currencies1, currencies2, stocks1, stocks2):
+        assert (exchangeManager.GetV(i, j, k), exchangeManager.GetV(j, i, k)) == (stockI, stockJ)
+    assert exchangeManager.GetV('LINK', 'USDT', 'Curve') == 7000
+
+
+def test_patch_overwrites_reserves_in_both_directions(exchangeManager):
+    snapshotHash = exchangeManager.GetSnapshotHash()
+    pools = exchangeManager.ApplyPatches([('Sushiswap', 'UNI', 'USDT', 60000, 900000)])
+
+    assert sorted(pools) == [('Sushiswap', 'UNI', 'USDT'), ('Sushiswap', 'USDT', 'UNI')]
+    assert exchangeManager.GetV('UNI', 'USDT', 'Sushiswap') == 60000
+    assert exchangeManager.GetV('USDT', 'UNI', 'Sushiswap') == 900000
+    assert exchangeManager.GetSnapshotHash() != snapshotHash
+
+
+def test_unchanged_patch_keeps_snapshot(exchangeManager):
+    snapshotHash = exchangeManager.GetSnapshotHash()
+    assert exchangeManager.ApplyPatches([('Sushiswap', 'USDT', 'UNI', 880000, 50000)]) == []
+    assert exchangeManager.GetSnapshotHash() == snapshotHash
+
+
+def test_patch_adds_unknown_pool(exchangeManager):
+    exchangeManager.ApplyPatches([('Curve', 'USDT', 'LINK', 100000, 7000)])
+    assert 'Curve' in exchangeManager.GetExch()
+    assert 'LINK' in exchangeManager.GetCurr()
+    assert exchangeManager.GetR('LINK', 'USDT') == pytest.approx(100000 / 7000)
+
+
+def test_patched_market_hashes_like_imported_market(exchangeManager, tmp_path):
+    from ExchangeManager import ExchangeManager
+    exchangeManager.ApplyPatches([('Sushiswap', 'UNI', 'USDT', 60000, 900000)])
+
+    df = exchangeManager.GetData().copy()
+    df.loc[(df.Exchange == 'Sushiswap') & (df.Currency1 == 'UNI') & (df.Currency2 == 'USDT'), ['Stock1', 'Stock2']] = [60000, 900000]
+    df.to_csv(tmp_path / 'patched.csv', index=False)
+    EM = ExchangeManager()
+    EM.ImportData(str(tmp_path / 'patched.csv'))
+    assert EM.GetSnapshotHash() == exchangeManager.GetSnapshotHash()
+
+
+def test_quote_changes_after_patch(exchangeManager):
+    pytest.importorskip('gurobipy')
+    from ModelSolver import ModelSolver
+
+    def Solve() -> float:
+        exchangeManager.SetInitCurrency('UNI')
+        exchangeManager.SetTermCurrency('USDT')
+        exchangeManager.SetInitCurrencyQuantity(100)
+        MS = ModelSolver(exchangeManager.GetPrunedManager(), verbose=False)
+        MS.Update()
+        MS.Optimize()
+        return MS.GetRoute().GetObjective()
+
+    before = Solve()
+    exchangeManager.ApplyPatches([('Sushiswap', 'UNI', 'USDT', 50000, 1760000)])
+    assert Solve() > before
+
+
+def SetOrder(exchangeManager, initCurrency: str, termCurrency: str, T0: float) -> None:
+    exchangeManager.SetInitCurrency(initCurrency)
+    exchangeManager.SetTermCurrency(termCurrency)
+    exchangeManager.SetInitCurrencyQuantity(T0)
+
+
+def test_pruning_drops_currencies_off_every_route(exchangeManager):
+    SetOrder(exchangeManager, 'UNI', 'USDT', 100)
+    pruned = exchangeManager.GetPrunedManager()
+    assert pruned.GetCurr() == {'UNI', 'ETH', 'USDT', 'USDC'}
+    assert pruned.GetExch() == {'Uniswap', 'Sushiswap', 'Balancer'}
+    assert (pruned.GetO(), pruned.GetD(), pruned.GetT0()) == ('UNI', 'USDT', 100)
+    assert pruned.GetR('ETH', 'USDT') == exchangeManager.GetR('ETH', 'USDT')
+
+
+def test_pruning_keeps_patched_reserves_and_pools(exchangeManager):
+    SetOrder(exchangeManager, 'UNI', 'USDT', 100)
+    exchangeManager.ApplyPatches([('Sushiswap', 'UNI', 'USDT', 60000, 900000), ('Curve', 'USDT', 'DAI', 1000000, 1000000)])
+    pruned = exchangeManager.GetPrunedManager()
+
+    assert pruned.GetV('UNI', 'USDT', 'Sushiswap') == 60000
+    assert pruned.GetV('USDT', 'UNI', 'Sushiswap') == 900000
+    assert 'DAI' not in pruned.GetCurr()  # DAI reaches USDT but never leaves UNI
+
+    SetOrder(exchangeManager, 'WBTC', 'USDT', 1)
+    assert exchangeManager.GetPrunedManager().GetV('DAI', 'USDT', 'Curve') == 1000000
+
+
+def test_pruning_without_route_raises(exchangeManager):
+    SetOrder(exchangeManager, 'UNI', 'WBTC', 100)
+    with pytest.raises(Exception, match='No route from UNI to WBTC'):
+        exchangeManager.GetPrunedManager()
+
+
+# Curve1 pays at most 16 USDT per UNI, Sushiswap still pays about 17.5 for the last of 100 UNI; Curve2 starts at Sushiswap's spot rate
+def test_pruning_drops_dominated_pools_only(exchangeManager):
+    SetOrder(exchangeManager, 'UNI', 'USDT', 100)
+    exchangeManager.ApplyPatches([('Curve1', 'UNI', 'USDT', 5, 80), ('Curve2', 'UNI', 'USDT', 50, 880)])
+    assert exchangeManager.GetPrunedManager().GetV('UNI', 'USDT', 'Curve1') == 5
+    pruned = exchangeManager.GetPrunedManager(dropDominated=True)
+    assert pruned.GetV('UNI', 'USDT', 'Curve1') == -1
+    assert pruned.GetV('UNI', 'USDT', 'Curve2') == 50
+    assert pruned.GetV('UNI', 'USDT', 'Sushiswap') == 50000
+
+
+def test_pruning_dominated_pools_keeps_optimum(exchangeManager):
+    pytest.importorskip('gurobipy')
+    from ModelSolver import ModelSolver
+    SetOrder(exchangeManager, 'UNI', 'USDT', 100)
+    exchangeManager.ApplyPatches([('Balancer', 'UNI', 'USDT', 5, 80)])
+
+    def Solve(EM) -> float:
+        MS = ModelSolver(EM, verbose=False)
+        MS.SetG1(0)
+        MS.SetMIPGap(1e-9)
+        MS.Update()
+        MS.Optimize()
+        return MS.GetObjective()
+
+    pruned = exchangeManager.GetPrunedManager(dropDominated=True)
+    assert len(pruned.GetData()) < len(exchangeManager.GetPrunedManager().GetData())
+    assert Solve(pruned) == pytest.approx(Solve(exchangeManager.GetPrunedManager()), rel=1e-6)
+
+
+def test_flow_bounds_cover_every_single_pool_trade(exchangeManager):
+    SetOrder(exchangeManager, 'UNI', 'USDT', 100)
+    bounds = exchangeManager.GetFlowBounds()
+    assert (bounds['UNI'], bounds['USDT']) == (100, 0)
+
+    # all of T0 through the best UNI -> ETH pool, then all of that ETH through the best ETH -> USDC pool
+    V = exchangeManager.GetV
+    ETH = max(V('ETH', 'UNI', k) * 100 / (V('UNI', 'ETH', k) + 100) for k in ('Uniswap', 'Sushiswap'))
+    USDC = max(V('USDC', 'ETH', k) * ETH / (V('ETH', 'USDC', k) + ETH) for k in ('Uniswap', 'Balancer'))
+    assert ETH <= bounds['ETH'] <= 100 * max(V('ETH', 'UNI', k) / V('UNI', 'ETH', k) for k in ('Uniswap', 'Sushiswap'))
+    assert USDC <= bounds['USDC']
+
+
+def test_flow_bounds_grow_with_divisions(exchangeManager):
+    SetOrder(exchangeManager, 'UNI', 'USDT', 1000000)
+    bounds, divided = exchangeManager.GetFlowBounds(), exchangeManager.GetFlowBounds(numDivision=3)
+    assert all(divided[currency] >= bounds[currency] for currency in bounds)
+    _, currencies1, _, stocks1, _ = exchangeManager.GetPoolArrays()
+    assert divided['ETH'] <= stocks1[currencies1 == 'ETH'].sum()  # a mid currency never sells more than its pooled stock
+
+
+def test_rates_weight_pools_by_liquidity(exchangeManager):
+    assert exchangeManager.GetR('ETH', 'USDT') == pytest.approx((43800000 + 21900000) / (20000 + 10000))
+    assert exchangeManager.GetR('USDT', 'ETH') == pytest.approx(1 / exchangeManager.GetR('ETH', 'USDT'))
+    assert exchangeManager.GetR('WBTC', 'DAI') == pytest.approx(40000)
+
+
+def test_rates_follow_fewest_hops(exchangeManager):
+    exchangeManager.ApplyPatches([('Curve', 'DAI', 'LINK', 1000000, 50000), ('Curve', 'LINK', 'USDT', 50000, 1000000)])  # LINK is new
+    assert exchangeManager.GetR('WBTC', 'USDT') == pytest.approx(40000)
+    assert exchangeManager.GetRatesTo('USDT')['WBTC'] == pytest.approx(40000)
+    assert exchangeManager.GetR('UNI', 'USDT') == pytest.approx(880000 / 50000)  # a traded pair keeps its own mid price
+
+
+def test_rates_follow_patched_reserves(exchangeManager):
+    exchangeManager.ApplyPatches([('Sushiswap', 'UNI', 'USDT', 50000, 1760000)])
+    assert exchangeManager.GetR('UNI', 'USDT') == pytest.approx(1760000 / 50000)
+
+
+def test_missing_rate_raises(exchangeManager):
+    with pytest.raises(Exception, match='No public rate between UNI and WBTC'):
+        exchangeManager.GetR('UNI', 'WBTC')
+    assert exchangeManager.GetRatesTo('USDT')['WBTC'] == 0.0
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from GraphManager import GraphManager
+
+MARKET = """- nameExchange: K1
+  stocks:
+    o: 8.0
+    d: 2.0
+    c: 5.0
+  B1:
+    o:
+      d: 0.1
+  B2:
+    d:
+      c: 0.02
+- nameExchange: K2
+  stocks:
+    o: 10.0
+    c: 2.5
+"""
+
+
+@pytest.fixture
+def graphManager(tmp_path) -> GraphManager:
+    pathData = tmp_path / 'market.yaml'
+    pathData.write_text(MARKET)
+    graphManager = GraphManager()
+    graphManager.LoadData(str(pathData))
+    return graphManager
+
+
+def test_snapshot_round_trip(graphManager, tmp_path):
+    graphManager.SaveSnapshot(str(tmp_path / 'market.npz'))
+    loaded = GraphManager()
+    loaded.LoadSnapshot(str(tmp_path / 'market.npz'))
+
+    assert loaded.indCurrency == graphManager.indCurrency
+    assert loaded.indExchange == graphManager.indExchange
+    assert sorted(loaded.GetEdges()) == sorted(graphManager.GetEdges())
+    np.testing.assert_array_equal(loaded.GetStockMatrix(), graphManager.GetStockMatrix())
+    for nameExchange in graphManager.GetExchanges():
+        assert loaded.GetExchange(nameExchange).GetStocks() == graphManager.GetExchange(nameExchange).GetStocks()
+    for i, j, k in graphManager.GetEdges():
+        assert (loaded.GetB1(i, j, k), loaded.GetB2(i, j, k)) == (graphManager.GetB1(i, j, k), graphManager.GetB2(i, j, k))
+    assert (loaded.GetB1('o', 'd', 'K1'), loaded.GetB2('d', 'c', 'K1')) == (0.1, 0.02)
+
+
+def test_snapshot_needs_no_pickle(graphManager, tmp_path):
+    graphManager.SaveSnapshot(str(tmp_path / 'market.npz'))
+    with np.load(tmp_path / 'market.npz', allow_pickle=False) as snapshot:
+        assert snapshot['currencies'].dtype.kind == 'U'
+
+
+def test_patch_updates_stock_matrix(graphManager):
+    graphManager.ApplyPatch('K1', 'o', 'd', 9.0, 1.5)
+    S = graphManager.GetStockMatrix()
+    assert graphManager.GetStock('K1', 'o') == 9.0
+    assert S[graphManager.Exchange2Index('K1'), graphManager.Currency2Index('d')] == 1.5
+    with pytest.raises(Exception, match='No currency named d found in exchange named K2'):
+        graphManager.ApplyPatch('K2', 'o', 'd', 1.0, 1.0)
+    assert graphManager.GetStock('K2', 'o') == 10.0  # a rejected patch changes nothing
+    assert graphManager.GetNumPatches() == 1
+
+
+# solvers copy stocks when built: after a patch they refuse to solve on stale stocks until they are built again
+def test_solvers_built_before_patch_refuse_to_solve(case3):
+    from HeuristicRouter import HeuristicRouter
+    from SLSQP import SLSQPManager
+    router, SM = HeuristicRouter(), SLSQPManager(case3)
+    router.LoadGraphManager(case3)
+    k, i, j = next((k, i, j) for i, j, k in case3.GetEdges())
+    case3.ApplyPatch(k, i, j, 2 * case3.GetStock(k, i), case3.GetStock(k, j))
+
+    with pytest.raises(Exception, match='Market was patched after it was loaded'):
+        router.Route('o', 'd', 1.0)
+    with pytest.raises(Exception, match='Stocks were patched after SLSQPManager was constructed'):
+        SM.Optimize(verbose=False)
+    router.LoadGraphManager(case3)
+    assert router.Route('o', 'd', 1.0) > 0
+
+
+def test_exact_model_built_before_patch_refuses_to_solve(case3):
+    pytest.importorskip('gurobipy')
+    from ExactModelSolver import ExactModelSolver
+    EMS = ExactModelSolver(case3, verbose=False)
+    EMS.Update()
+    k, i, j = next((k, i, j) for i, j, k in case3.GetEdges())
+    case3.ApplyPatch(k, i, j, 2 * case3.GetStock(k, i), case3.GetStock(k, j))
+    with pytest.raises(Exception, match=r'Stocks were patched after Update\(\)'):
+        EMS.Optimize()
+
+    EMS = ExactModelSolver(case3, verbose=False)
+    EMS.Update()
+    EMS.Optimize()
+    assert EMS.HasSolution()
+
+
+def test_fees_are_stored_sparsely(graphManager):
+    assert graphManager.GetExchange('K1').GetB1s() == {('o', 'd'): 0.1}
+    assert (graphManager.GetB1('d', 'o', 'K1'), graphManager.GetB2('o', 'c', 'K2')) == (0.0, 0.0)
+    with pytest.raises(KeyError):
+        graphManager.GetB1('o', 'd', 'K2')
+
+
+# K1 still pays about 0.49 c for the last o, K2 never pays more than 0.25
+def test_pruning_drops_dominated_edges(graphManager):
+    graphManager.SetInitCurrency('o')
+    graphManager.SetTermCurrency('d')
+    graphManager.SetInitCurrencyQuantity(1.0)
+    assert ('o', 'c', 'K2') in graphManager.GetPrunedGraph().GetEdges()
+    assert sorted(graphManager.GetPrunedGraph(dropDominated=True).GetEdges()) == [('c', 'd', 'K1'), ('o', 'c', 'K1'), ('o', 'd', 'K1')]
+
+
+def test_flow_bounds_exceed_stock_fed_by_one_exchange(feeders, feederFlow):
+    i = feeders.Currency2Index('i')
+    assert feederFlow > feeders.GetStockMatrix()[:, i].sum()
+    assert feeders.GetFlowBounds()[i] >= feederFlow
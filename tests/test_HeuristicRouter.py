@@ -0,0 +1,38 @@
+import pytest
+
+from HeuristicRouter import HeuristicRouter
+
+
+@pytest.fixture
+def router(exchangeManager) -> HeuristicRouter:
+    router = HeuristicRouter()
+    router.LoadExchangeManager(exchangeManager)
+    return router
+
+
+# the Balancer DAI/WBTC pool has no rate into USDT and never joins a route
+def test_route_on_market_with_unconnected_pool(router):
+    objective = router.Route('UNI', 'USDT', 100)
+    route = router.GetRoute()
+    assert objective == pytest.approx(route.GetAmountOut() - route.GetFee())
+    assert {hop['initCurrency'] for hop in route.GetHops()}.isdisjoint({'DAI', 'WBTC'})
+    assert sum(hop['amountIn'] for hop in route.GetHops() if hop['initCurrency'] == 'UNI') == pytest.approx(100)
+
+
+def test_route_inside_unconnected_pool(router):
+    router.SetG1(0)
+    assert router.Route('DAI', 'WBTC', 1000) == pytest.approx(25 * 1000 / 1001000 - 0.003 * 1000 * 25 / 1000000)
+
+
+def test_route_without_path_raises(router):
+    with pytest.raises(Exception, match='No path from UNI to WBTC'):
+        router.Route('UNI', 'WBTC', 100)
+
+
+
+def test_route_after_patch_needs_reload(router, exchangeManager):
+    exchangeManager.ApplyPatches([('Sushiswap', 'UNI', 'USDT', 50000, 1760000)])
+    with pytest.raises(Exception, match='Market was patched after it was loaded'):
+        router.Route('UNI', 'USDT', 100)
+    router.LoadExchangeManager(exchangeManager)
+    assert router.Route('UNI', 'USDT', 100) > 0
@@ -0,0 +1,131 @@
+import pytest
+
+pytest.importorskip('gurobipy')
+from ModelSolver import ModelSolver
+from Profiler import Profiler
+
+
+def SetOrder(exchangeManager, initCurrency: str, termCurrency: str, T0: float) -> None:
+    exchangeManager.SetInitCurrency(initCurrency)
+    exchangeManager.SetTermCurrency(termCurrency)
+    exchangeManager.SetInitCurrencyQuantity(T0)
+
+
+def Solve(exchangeManager, **options) -> ModelSolver:
+    MS = ModelSolver(exchangeManager, verbose=False)
+    if 'G1' in options: MS.SetG1(options['G1'])
+    if 'G2' in options: MS.SetG2(options['G2'])
+    if options.get('lazy'): MS.SetLazyCycleElimination(True)
+    if options.get('tight'): MS.SetTightBigM(True)
+    if 'M' in options: MS.SetBigM(options['M'])
+    if options.get('piecewise'): MS.SetPiecewiseLinear(*options['piecewise'])
+    MS.Update()
+    MS.Optimize()
+    return MS
+
+
+# the Balancer DAI/WBTC pool has no rate into USDT, its gas fee coefficient is 0;
+# the piecewise model stays within the size-limited license on the unpruned market
+def test_route_on_market_with_unconnected_pool(exchangeManager):
+    SetOrder(exchangeManager, 'UNI', 'USDT', 100)
+    route = Solve(exchangeManager, piecewise=(4, 3)).GetRoute()
+    assert route.GetObjective() == pytest.approx(route.GetAmountOut() - route.GetFee(), rel=1e-6)
+    assert {hop['initCurrency'] for hop in route.GetHops()}.isdisjoint({'DAI', 'WBTC'})
+
+
+# gas fees G2 follow the rates of the patched market, as in a model built after the patch
+def test_updated_pools_match_fresh_model(exchangeManager):
+    SetOrder(exchangeManager, 'UNI', 'USDT', 100)
+    EM = exchangeManager.GetPrunedManager()
+    MS = ModelSolver(EM, verbose=False)
+    MS.SetG2(0.05)
+    MS.Update()
+    MS.Optimize()
+
+    MS.UpdatePools(EM.ApplyPatches([('Sushiswap', 'UNI', 'USDT', 50000, 1760000)]))
+    fresh = ModelSolver(EM, verbose=False)
+    fresh.SetG2(0.05)
+    fresh.Update()
+    fresh.Optimize()
+    assert MS.GetRoute().GetObjective() == pytest.approx(fresh.GetRoute().GetObjective(), rel=1e-4)
+
+
+# in-place updates re-optimize from the previous solution and end where a model built with the new parameters ends
+def test_updates_match_fresh_model(exchangeManager):
+    SetOrder(exchangeManager, 'UNI', 'USDT', 100)
+    EM = exchangeManager.GetPrunedManager()
+    MS = Solve(EM, G1=1, G2=0.05)
+
+    MS.UpdateT0(1000)
+    assert MS.GetObjective() == pytest.approx(Solve(EM, G1=1, G2=0.05).GetObjective(), rel=1e-4)
+    MS.UpdateG1(5)
+    assert MS.GetObjective() == pytest.approx(Solve(EM, G1=5, G2=0.05).GetObjective(), rel=1e-4)
+    MS.UpdateG2(0.01)
+    assert MS.GetObjective() == pytest.approx(Solve(EM, G1=5, G2=0.01).GetObjective(), rel=1e-4)
+    assert EM.GetT0() == 1000
+
+
+# derived bounds keep the optimum of a big-M that bounds no flow, USDC may sell about 185000 at T0 = 10000
+@pytest.mark.parametrize('T0', [100, 10000])
+def test_tight_big_m_matches_loose_big_m(exchangeManager, T0):
+    SetOrder(exchangeManager, 'UNI', 'USDT', T0)
+    EM = exchangeManager.GetPrunedManager()
+    MS = Solve(EM, G2=0, tight=True)
+    assert max(MS.GetBigM()['flow'].values()) < 1e6
+    assert MS.GetObjective() == pytest.approx(Solve(EM, G2=0, M=1e6).GetObjective(), rel=1e-4)
+
+
+# UpdateT0 raises upper bounds of X with the flow bounds
+def test_tight_big_m_follows_updated_t0(exchangeManager):
+    SetOrder(exchangeManager, 'UNI', 'USDT', 100)
+    EM = exchangeManager.GetPrunedManager()
+    MS = Solve(EM, G2=0, tight=True)
+    MS.UpdateT0(10000)
+    assert MS.GetBigM()['flow']['UNI'] == 10000
+    assert MS.GetObjective() == pytest.approx(Solve(EM, G2=0, M=1e6).GetObjective(), rel=1e-4)
+
+
+# lazy cuts reject incumbents trading around A -> B -> A and end at the MTZ optimum, gas fees would keep the cycle unused
+def test_lazy_cycle_cuts_match_mtz_on_cycle(cycleMarket):
+    reference = Solve(cycleMarket, G1=0, G2=0).GetObjective()
+    profiler = Profiler()
+    cycleMarket.SetProfiler(profiler)
+    assert Solve(cycleMarket, G1=0, G2=0, lazy=True).GetObjective() == pytest.approx(reference, rel=1e-3)
+    assert profiler.GetCounts()['cycle cuts'] > 0
+
+
+def test_lazy_cycle_elimination_matches_mtz(exchangeManager):
+    SetOrder(exchangeManager, 'UNI', 'USDT', 1000)
+    EM = exchangeManager.GetPrunedManager()
+    MS = Solve(EM, lazy=True)
+    assert MS.GetObjective() == pytest.approx(Solve(EM).GetObjective(), rel=1e-3)
+    MS.UpdateT0(2000)
+    assert MS.HasSolution()
+
+
+# tangents bound the exact pool outputs from above: the route re-evaluated with exact outputs stays below the model objective,
+# refinement brings it close to the exact optimum
+def test_piecewise_route_is_bounded_by_model_objective(exchangeManager):
+    SetOrder(exchangeManager, 'UNI', 'USDT', 1000)
+    EM = exchangeManager.GetPrunedManager()
+    exact = Solve(EM).GetObjective()
+    MS = Solve(EM, piecewise=(4, 3))
+    objective = MS.GetRoute().GetObjective()
+    assert objective <= MS.GetObjective() + 1e-9 * abs(MS.GetObjective())
+    assert MS.GetObjective() >= exact - 1e-4 * abs(exact)  # default MIP gap
+    assert objective == pytest.approx(exact, rel=1e-3)
+
+
+# the callback sees strictly improving incumbents only, the last one is the route of the optimum
+def test_incumbent_callback_streams_improving_routes(exchangeManager):
+    SetOrder(exchangeManager, 'UNI', 'USDT', 1000)
+    incumbents = []
+    MS = ModelSolver(exchangeManager.GetPrunedManager(), verbose=False)
+    MS.SetIncumbentCallback(lambda route, gap, runtime: incumbents.append(route.GetObjective()))
+    MS.SetTimeLimit(60)
+    MS.Update()
+    MS.Optimize()
+
+    assert MS.HasSolution() and incumbents
+    assert incumbents == sorted(set(incumbents))
+    assert incumbents[-1] == pytest.approx(MS.GetRoute().GetObjective(), rel=1e-6)
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import PiecewiseLinear
+
+
+# every tangent touches b x / (a + x) at its breakpoint and lies above it elsewhere
+def test_tangents_bound_output_from_above():
+    stockI, stockJ, bound = np.array([100.0]), np.array([200.0]), np.array([50.0])
+    slopes, intercepts = PiecewiseLinear.GetTangents(stockI, stockJ, bound, 3)
+    X = np.linspace(0, 50, 101)
+    outputs = 200.0 * X / (100.0 + X)
+    assert np.all(slopes * X + intercepts >= outputs - 1e-9)
+    assert (slopes[-1] * 50 + intercepts[-1])[0] == pytest.approx(200.0 * 50 / 150)
+
+
+def test_refinement_tangents_only_where_output_is_overestimated():
+    stockI, stockJ = np.array([100.0, 100.0, 100.0]), np.array([200.0, 200.0, 200.0])
+    X, F = np.array([50.0, 50.0, 0.0]), np.array([200.0 * 50 / 150, 80.0, 1.0])
+    refine, slopes, intercepts = PiecewiseLinear.GetRefinementTangents(stockI, stockJ, X, F, 1e-6)
+    assert refine.tolist() == [1]
+    assert slopes[0] * 50 + intercepts[0] == pytest.approx(200.0 * 50 / 150)
+
+
+# o splits T0 = 10 evenly between a and b, both sell all they receive into d
+def test_propagated_flows_are_conserved():
+    pairs = [('o', 'a'), ('o', 'b'), ('a', 'd'), ('b', 'd')]
+    X, F = PiecewiseLinear.PropagateFlows(pairs, [6.0, 6.0, 9.0, 1.0], [100.0] * 4, [100.0] * 4, 'o', 'd', 10.0)
+    assert X[:2] == [5.0, 5.0]
+    assert X[2] == pytest.approx(F[0]) and X[3] == pytest.approx(F[1])
+
+
+def test_cyclic_flows_are_kept():
+    pairs = [('o', 'a'), ('a', 'b'), ('b', 'a'), ('a', 'd')]
+    X, _ = PiecewiseLinear.PropagateFlows(pairs, [6.0, 1.0, 1.0, 5.0], [100.0] * 4, [100.0] * 4, 'o', 'd', 10.0)
+    assert X == [6.0, 1.0, 1.0, 5.0]
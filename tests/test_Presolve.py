@@ -0,0 +1,21 @@
+import numpy as np
+
+import Presolve
+
+
+def test_route_currencies_leave_out_dead_ends_of_o_and_d():
+    pairs = [('o', 'a'), ('a', 'd'), ('x', 'o'), ('d', 'y'), ('z', 'a')]
+    assert Presolve.GetRouteCurrencies(pairs, 'o', 'd') == {'o', 'a', 'd'}
+
+
+# e hangs off a and is on no simple o -> d path, but it is reached from o and reaches d
+def test_route_currencies_keep_branch_off_a_route_currency():
+    pairs = [('o', 'a'), ('a', 'd'), ('a', 'e'), ('e', 'a')]
+    assert Presolve.GetRouteCurrencies(pairs, 'o', 'd') == {'o', 'a', 'd', 'e'}
+
+
+def test_dominated_edges():
+    indPair, indI = np.array([0, 0, 0, 1]), np.array([0, 0, 0, 1])
+    stockI, stockJ = np.array([1000.0, 10.0, 10.0, 10.0]), np.array([2000.0, 15.0, 20.0, 20.0])
+    # first edge pays about 1.98 for the last of 10 units, second at most 1.5, third starts at 2
+    assert Presolve.GetDominatedEdges(indPair, indI, stockI, stockJ, np.array([10.0, 0.0])).tolist() == [False, True, False, True]
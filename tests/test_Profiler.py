@@ -0,0 +1,105 @@
+import pytest
+
+pytest.importorskip('gurobipy')
+from GraphManager import GraphManager
+from ExactModelSolver import ExactModelSolver
+from SLSQP import SLSQPManager
+from ExchangeManager import ExchangeManager
+from ModelSolver import ModelSolver
+
+
+# profiling is opt-in: markets start without profiler and solvers inherit it
+@pytest.fixture
+def graphManager(case3) -> GraphManager:
+    return case3
+
+
+@pytest.fixture
+def market(exchangeManager) -> ExchangeManager:
+    exchangeManager.SetInitCurrency('UNI')
+    exchangeManager.SetTermCurrency('USDT')
+    exchangeManager.SetInitCurrencyQuantity(1000)
+    return exchangeManager.GetPrunedManager()
+
+
+def test_markets_start_without_profiler(graphManager, market):
+    assert graphManager.GetProfiler() is None
+    assert market.GetProfiler() is None
+    assert graphManager.GetPrunedGraph().GetProfiler() is None
+
+
+# a profiler set on a market reaches its pruned copies and every solver built on them
+def test_solvers_inherit_profiler_of_market(exchangeManager):
+    from Profiler import Profiler
+    profiler = Profiler()
+    exchangeManager.SetProfiler(profiler)
+    exchangeManager.SetInitCurrency('UNI')
+    exchangeManager.SetTermCurrency('USDT')
+    exchangeManager.SetInitCurrencyQuantity(1000)
+    solver = ModelSolver(exchangeManager.GetPrunedManager(), verbose=False)
+    assert solver.GetProfiler() is profiler
+    solver.Update()
+    assert 'update' in profiler.GetTimes() and 'prune' in profiler.GetTimes()
+
+
+def SolveExact(graphManager: GraphManager) -> ExactModelSolver:
+    solver = ExactModelSolver(graphManager, verbose=False)
+    assert solver.GetProfiler() is None
+    solver.Update()
+    solver.Optimize()
+    return solver
+
+
+def SolveModel2(exchangeManager: ExchangeManager) -> ModelSolver:
+    solver = ModelSolver(exchangeManager, verbose=False)
+    assert solver.GetProfiler() is None
+    solver.Update()
+    solver.Optimize()
+    return solver
+
+
+def test_exact_solver_without_profiler(graphManager):
+    assert SolveExact(graphManager).HasSolution()
+
+
+def test_model2_solver_without_profiler(market):
+    solver = SolveModel2(market)
+    assert solver.HasSolution()
+    solver.UpdateT0(2000)
+    assert solver.HasSolution()
+
+
+def test_slsqp_without_profiler(graphManager):
+    SM = SLSQPManager(graphManager)
+    assert SM.GetProfiler() is None
+    SM.AddInitPoint()
+    SM.Optimize(verbose=False)
+    assert SM.GetObjective() > 0
+
+
+def test_slsqp_reports_evaluations(graphManager):
+    from Profiler import Profiler
+    profiler = Profiler()
+    SM = SLSQPManager(graphManager)
+    SM.SetProfiler(profiler)
+    SM.AddInitPoint()
+    SM.AddInitPoint()
+    SM.Optimize(verbose=False)
+
+    numEvaluations = SM.GetNumEvaluations()
+    assert numEvaluations['iterations'] > 0 and numEvaluations['objective'] >= numEvaluations['iterations'] and numEvaluations['jacobian'] > 0
+    counts = profiler.GetCounts()
+    assert (counts['SLSQP iterations'], counts['SLSQP objective evaluations'], counts['SLSQP Jacobian evaluations']) == \
+        (numEvaluations['iterations'], numEvaluations['objective'], numEvaluations['jacobian'])
+    assert profiler.GetNumCalls()['optimize'] == 1
+
+
+def test_batch_solver_without_profiler(market):
+    from BatchModelSolver import BatchModelSolver
+    BMS = BatchModelSolver(market, verbose=False)
+    assert BMS.GetProfiler() is None
+    BMS.AddOrder('UNI', 'USDT', 1000)
+    BMS.AddOrder('USDT', 'UNI', 1000)
+    BMS.Update()
+    BMS.Optimize()
+    assert all(route.GetAmountOut() > 0 for route in BMS.GetRoutes())
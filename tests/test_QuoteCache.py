@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip('gurobipy')
+from QuoteCache import QuoteCache
+
+
+def test_repeated_quote_is_served_from_cache(exchangeManager):
+    cache = QuoteCache(exchangeManager)
+    route = cache.Quote('UNI', 'USDT', 100)
+    assert cache.Quote('UNI', 'USDT', 100) is route
+    assert (cache.GetNumHits(), cache.GetNumMisses(), cache.GetNumEntries()) == (1, 1, 1)
+
+
+def test_least_recently_used_quote_is_evicted(exchangeManager):
+    cache = QuoteCache(exchangeManager)
+    cache.SetMaxEntries(2)
+    cache.Quote('UNI', 'USDT', 100)
+    cache.Quote('UNI', 'USDT', 200)
+    cache.Quote('UNI', 'USDT', 100)  # 200 is now least recently used
+    cache.Quote('UNI', 'USDT', 300)
+    assert cache.GetNumEntries() == 2
+
+    cache.Quote('UNI', 'USDT', 100)
+    assert cache.GetNumHits() == 2
+    cache.Quote('UNI', 'USDT', 200)
+    assert cache.GetNumMisses() == 4
+
+
+def test_memory_limit_evicts_quotes(exchangeManager):
+    cache = QuoteCache(exchangeManager)
+    cache.Quote('UNI', 'USDT', 100)
+    cache.SetMaxMemory(cache.GetMemory() - 1)
+    assert (cache.GetNumEntries(), cache.GetMemory()) == (0, 0)
+
+
+def test_quantities_in_one_bucket_share_a_quote(exchangeManager):
+    cache = QuoteCache(exchangeManager)
+    cache.SetT0BucketSize(100)
+    route = cache.Quote('UNI', 'USDT', 110)
+    assert cache.Quote('UNI', 'USDT', 190) is route
+    assert route.GetQuantity() == 150
+
+
+def test_patched_reserves_invalidate_quotes(exchangeManager):
+    cache = QuoteCache(exchangeManager)
+    before = cache.Quote('UNI', 'USDT', 100)
+    exchangeManager.ApplyPatches([('Sushiswap', 'UNI', 'USDT', 50000, 1760000)])
+    after = cache.Quote('UNI', 'USDT', 100)
+
+    assert cache.GetNumMisses() == 2
+    assert cache.GetNumEntries() == 1
+    assert after.GetObjective() > before.GetObjective()
+
+
+def test_quote_of_another_quantity_matches_fresh_solve(exchangeManager, pathMarket):
+    from ExchangeManager import ExchangeManager
+    cache = QuoteCache(exchangeManager)
+    cache.Quote('UNI', 'USDT', 100)
+    warm = cache.Quote('UNI', 'USDT', 400)
+
+    EM = ExchangeManager()
+    EM.ImportData(pathMarket)
+    fresh = QuoteCache(EM).Quote('UNI', 'USDT', 400)
+    assert warm.GetObjective() == pytest.approx(fresh.GetObjective(), rel=1e-6)
+
+
+def test_unknown_currency_is_rejected(exchangeManager):
+    with pytest.raises(Exception, match='No pool trades BTC'):
+        QuoteCache(exchangeManager).Quote('UNI', 'BTC', 100)
+
+
+def test_quote_leaves_order_of_market_unchanged(exchangeManager):
+    exchangeManager.SetInitCurrency('USDT')
+    exchangeManager.SetTermCurrency('UNI')
+    exchangeManager.SetInitCurrencyQuantity(5)
+    QuoteCache(exchangeManager).Quote('UNI', 'USDT', 100)
+    assert (exchangeManager.GetO(), exchangeManager.GetD(), exchangeManager.GetT0()) == ('USDT', 'UNI', 5)
@@ -0,0 +1,90 @@
+import json
+import time
+import asyncio
+import pytest
+
+import QuoteServer
+
+
+def test_heuristic_endpoint(exchangeManager):
+    QuoteServer.InitWorker(exchangeManager)
+    route = QuoteServer.SolveHeuristic({'initCurrency': 'UNI', 'termCurrency': 'USDT', 'T0': 100, 'timeLimit': 1})
+    assert route['amountOut'] > 0
+
+
+# a group shares one deadline, each request is solved within what is left of it
+def test_group_shares_one_deadline():
+    timeLimits = []
+
+    def Solver(request: dict) -> dict:
+        timeLimits.append(request['timeLimit'])
+        time.sleep(0.2)
+        return {}
+
+    requests = [{'T0': T0, 'timeLimit': 0.3} for T0 in (1, 2, 3)]
+    results = QuoteServer.SolveGroup(Solver, requests, 0.3)
+    assert timeLimits[0] == pytest.approx(0.3, abs=0.05)
+    assert timeLimits[1] == pytest.approx(0.1, abs=0.05)
+    assert results[:2] == [{'route': {}}] * 2
+    assert 'Time limit' in results[2]['error']
+
+
+# run the server on a free port and pass one connection to Client(reader, writer)
+def Serve(exchangeManager, Client, batchWindow: float = 0.005) -> None:
+    async def Main() -> None:
+        QS = QuoteServer.QuoteServer(exchangeManager, port=0)
+        QS.SetNumWorkers(1)
+        QS.SetBatchWindow(batchWindow)
+        serve = asyncio.create_task(QS.Serve())
+        while QS.GetPort() == 0:
+            await asyncio.sleep(0.01)
+        reader, writer = await asyncio.open_connection('127.0.0.1', QS.GetPort())
+        try:
+            await asyncio.wait_for(Client(reader, writer), 60)
+        finally:
+            writer.close()
+            serve.cancel()
+            await asyncio.gather(serve, return_exceptions=True)
+
+    asyncio.run(Main())
+
+
+async def Ask(reader, writer, request) -> dict:
+    writer.write(((request if isinstance(request, str) else json.dumps(request)) + '\n').encode())
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+# identical requests within the batch window are solved once and every copy is answered
+def test_identical_requests_are_coalesced(exchangeManager):
+    async def Client(reader, writer) -> None:
+        request = json.dumps({'endpoint': 'heuristic', 'initCurrency': 'UNI', 'termCurrency': 'USDT', 'T0': 100})
+        writer.write(((request + '\n') * 3).encode())
+        await writer.drain()
+        answers = [json.loads(await reader.readline()) for _ in range(3)]
+        assert answers[0]['route']['amountOut'] > 0
+        assert answers == [answers[0]] * 3
+
+        stats = await Ask(reader, writer, {'endpoint': 'stats'})
+        assert stats['numSolved'] == 1
+        assert stats['latency']['heuristic']['count'] == 3
+        assert stats['latency']['model'] == {'count': 0}
+
+    Serve(exchangeManager, Client, batchWindow=0.5)
+
+
+@pytest.mark.parametrize('message, error', [
+    ('{"endpoint": ', 'Invalid json'),
+    ({'endpoint': 'quote'}, 'Unknown endpoint: quote'),
+    ({'endpoint': 'heuristic', 'initCurrency': 'UNI', 'T0': 1}, 'initCurrency, termCurrency and T0 are required'),
+    ({'endpoint': 'heuristic', 'initCurrency': 'UNI', 'termCurrency': 'BTC', 'T0': 1}, 'Unknown termCurrency: BTC, no pool trades it'),
+    ({'endpoint': 'heuristic', 'initCurrency': 'UNI', 'termCurrency': 'USDT', 'T0': True}, 'T0 must be a positive number'),
+    ({'endpoint': 'heuristic', 'initCurrency': 'UNI', 'termCurrency': 'USDT', 'T0': -1}, 'T0 must be a positive number'),
+    ({'endpoint': 'model', 'initCurrency': 'UNI', 'termCurrency': 'USDT', 'T0': 1, 'timeLimit': 'soon'}, 'timeLimit must be a positive number'),
+])
+def test_malformed_request_is_answered_with_error(exchangeManager, message, error):
+    async def Client(reader, writer) -> None:
+        assert await Ask(reader, writer, message) == {'error': error}
+        assert (await Ask(reader, writer, {'endpoint': 'stats'}))['numSolved'] == 0
+
+    Serve(exchangeManager, Client)
@@ -0,0 +1,49 @@
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from Route import Route
+
+
+@pytest.fixture
+def route() -> Route:
+    route = Route('UNI', 'USDT', 100)
+    route.SetObjective(1700)
+    route.AddHop('UNI', 'ETH', 'Uniswap', 60, 0.5, fee=1.5)
+    route.AddHop('ETH', 'USDT', 'Uniswap', 0.5, 1000, fee=2.5, division=1)
+    route.AddHop('UNI', 'USDT', 'Sushiswap', 40, 700)
+    return route
+
+
+def test_amount_out_and_fee_sum_hops(route):
+    assert route.GetAmountOut() == 1700
+    assert route.GetFee() == 4
+    assert len(route.GetHops()) == 3
+
+
+def test_dict_holds_summary_and_hops(route):
+    data = route.ToDict()
+    assert (data['initCurrency'], data['termCurrency'], data['quantity'], data['objective']) == ('UNI', 'USDT', 100, 1700)
+    assert (data['amountOut'], data['fee']) == (1700, 4)
+    assert data['hops'][1] == {'initCurrency': 'ETH', 'termCurrency': 'USDT', 'exchange': 'Uniswap', 'division': 1,
+                               'amountIn': 0.5, 'amountOut': 1000.0, 'fee': 2.5}
+
+
+def test_exports_round_trip(route, tmp_path):
+    route.ExportJSON(tmp_path / 'route.json')
+    with open(tmp_path / 'route.json') as f:
+        assert json.load(f) == route.ToDict()
+
+    route.ExportCSV(tmp_path / 'route.csv')
+    with open(tmp_path / 'route.csv', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['exchange'] for row in rows] == ['Uniswap', 'Uniswap', 'Sushiswap']
+    assert [float(row['amountOut']) for row in rows] == [0.5, 1000, 700]
+
+    route.ExportColumns(tmp_path / 'route.npz')
+    with np.load(tmp_path / 'route.npz', allow_pickle=False) as columns:
+        assert columns['initCurrency'].tolist() == ['UNI', 'ETH', 'UNI']
+        assert columns['division'].tolist() == [0, 1, 0]
+        np.testing.assert_array_equal(columns['fee'], [1.5, 2.5, 0])
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from SLSQP import SLSQPManager
+
+
+# central differences of fun at v, one column per decision variable
+def GetNumericJacobian(fun, v: np.array, step: float = 1e-6) -> np.array:
+    columns = []
+    for n in range(len(v)):
+        dv = np.zeros(len(v))
+        dv[n] = step
+        columns.append((np.atleast_1d(fun(v + dv)) - np.atleast_1d(fun(v - dv))) / (2 * step))
+    return np.array(columns).T
+
+
+@pytest.fixture
+def point(case3) -> np.array:
+    SM = SLSQPManager(case3)
+    return np.random.default_rng(0).uniform(0.1, 1.0, SM.GetNumVars())
+
+
+# vectorized callbacks must match the derivatives of the functions SLSQP evaluates
+@pytest.mark.parametrize('names', [('Objective', 'Jacobian'), ('FlowConservation', 'FlowConservationJacobian')])
+def test_nonlinear_jacobians_match_finite_differences(case3, point, names):
+    SM = SLSQPManager(case3)
+    fun, jac = (getattr(SM, name) for name in names)
+    assert np.atleast_2d(jac(point)) == pytest.approx(np.atleast_2d(GetNumericJacobian(fun, point)), abs=1e-6)
+
+
+# linear constraints keep one Jacobian, assembled once, that matches their derivatives anywhere
+@pytest.mark.parametrize('names', [('InitCurrencyConstraint', 'InitCurrencyConstraintJacobian'), ('TermCurrencyConstraint', 'TermCurrencyConstraintJacobian'),
+                                   ('AcyclicConstraint', 'AcyclicJacobian')])
+def test_linear_jacobians_are_constant(case3, point, names):
+    SM = SLSQPManager(case3)
+    fun, jac = (getattr(SM, name) for name in names)
+    assert jac(point) is jac(2 * point)
+    assert np.atleast_2d(jac(point)) == pytest.approx(np.atleast_2d(GetNumericJacobian(fun, point)), abs=1e-6)
@@ -0,0 +1,42 @@
+import pytest
+
+from GraphManager import GraphManager
+from Presolve import GetRouteCurrencies
+from SampleDataGenerator import SampleDataGenerator
+
+
+def Generate(seed: int, numCurrencies: int = 12, numExchanges: int = 20, degree: int = 5) -> SampleDataGenerator:
+    SDG = SampleDataGenerator()
+    SDG.SetNumCurrencies(numCurrencies)
+    SDG.SetNumExchanges(numExchanges)
+    SDG.SetDegree(degree)
+    SDG.SetSeed(seed)
+    return SDG
+
+
+def test_same_seed_gives_same_market(tmp_path):
+    for name, Dump in (('market.yaml', SampleDataGenerator.DumpMarket), ('pools.csv', SampleDataGenerator.DumpPools)):
+        texts = []
+        for n, seed in enumerate((7, 7, 8)):
+            pathData = tmp_path / '{}{}'.format(n, name)
+            Dump(Generate(seed), str(pathData))
+            texts.append(pathData.read_text())
+        assert texts[0] == texts[1]
+        assert texts[0] != texts[2]
+
+
+# two currencies per exchange over few exchanges often leave o and d apart, such listings are drawn again
+@pytest.mark.parametrize('seed', range(20))
+def test_sparse_market_has_route(tmp_path, seed):
+    pathData = tmp_path / 'market.yaml'
+    Generate(seed, numCurrencies=8, numExchanges=4, degree=2).DumpMarket(str(pathData))
+    GM = GraphManager()
+    GM.LoadData(str(pathData))
+
+    assert all(len(exchange.GetStocks()) == 2 for exchange in GM.GetExchanges().values())
+    assert {'o', 'd'} <= GetRouteCurrencies([(i, j) for i, j, _ in GM.GetEdges()], 'o', 'd')
+
+
+def test_degree_below_two_is_rejected(tmp_path):
+    with pytest.raises(Exception, match='Invalid degree: 1'):
+        Generate(0, degree=1).DumpMarket(str(tmp_path / 'market.yaml'))
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('gurobipy')
+from ModelSolver import ModelSolver
+from SweepRunner import SweepRunner
+
+
+@pytest.fixture
+def market(exchangeManager):
+    exchangeManager.SetInitCurrency('UNI')
+    exchangeManager.SetTermCurrency('USDT')
+    exchangeManager.SetInitCurrencyQuantity(100)
+    return exchangeManager.GetPrunedManager()
+
+
+# UNI -> BTC fails at every point since no pool trades BTC, the UNI -> USDT points still get solved
+def Run(market, chainLength: int, pathResult: str = None) -> tuple:
+    SR = SweepRunner(market)
+    SR.SetPairs([('UNI', 'USDT'), ('UNI', 'BTC')])
+    SR.SetT0s([100, 1000])
+    SR.SetG1s([0, 43])
+    SR.SetNumWorkers(1)
+    SR.SetChainLength(chainLength)
+    return SR, SR.Run(pathResult)
+
+
+def test_sweep_matches_single_solves(market, tmp_path):
+    SR, results = Run(market, 1, str(tmp_path))
+    for col, ((o, d), T0, G1, G2) in enumerate(SR.GetColumns()):
+        if d == 'BTC':
+            assert np.isnan(results['objList'][0, col])
+            continue
+        market.SetInitCurrency(o)
+        market.SetTermCurrency(d)
+        market.SetInitCurrencyQuantity(T0)
+        MS = ModelSolver(market, verbose=False)
+        MS.SetG1(G1)
+        MS.SetG2(G2)
+        MS.Update()
+        MS.Optimize()
+        assert results['objList'][0, col] == pytest.approx(MS.GetObjective(), rel=1e-3)
+        assert results['G1List'][0, col] == pytest.approx(MS.GetG1Fee(), abs=1e-6)
+    np.testing.assert_allclose(np.loadtxt(tmp_path / 'objList.csv', delimiter=','), results['objList'].reshape(-1))
+
+
+def test_failed_points_are_reported(market, tmp_path):
+    SR, _ = Run(market, 1, str(tmp_path))
+    failures = SR.GetFailures()
+    assert sorted(column for _, column, _ in failures) == sorted(column for column in SR.GetColumns() if column[0] == ('UNI', 'BTC'))
+    assert all('No pool trades BTC' in error for _, _, error in failures)
+
+    lines = (tmp_path / 'failures.csv').read_text().splitlines()
+    assert lines[0] == 'numDivision,initCurrency,termCurrency,T0,G1,G2,error'
+    assert len(lines) == 1 + len(failures)
+    assert all(',UNI,BTC,' in line for line in lines[1:])
+
+
+# warm-started chains update T0 and G1 in place and end where single solves end
+def test_chains_match_single_points(market):
+    _, single = Run(market, 1)
+    SR, chained = Run(market, 4)
+    assert SR.GetFailures()
+    for name in ('objList', 'objPlusG1List', 'G1List'):
+        np.testing.assert_allclose(chained[name], single[name], rtol=1e-3, atol=1e-6)